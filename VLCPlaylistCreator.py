@@ -1,180 +1,3043 @@
 import os
+import sys
+import errno
 import re
+import json
+import hashlib
+import io
+import time
+import fnmatch
+import select
+import struct
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+from itertools import chain, repeat
+from contextlib import contextmanager
 import threading
 import queue
-from tkinter import filedialog, messagebox, Tk, Button, Label, Entry, StringVar, BooleanVar, Checkbutton, Frame, LabelFrame, Toplevel, Text, Scrollbar
+from collections import Counter, deque, namedtuple
 from urllib.parse import quote, unquote
-from xml.etree.ElementTree import Element, SubElement, tostring
-from xml.dom import minidom
+
+
+MEDIA_EXTENSIONS = ('.mp4', '.mp3', '.mkv', '.avi', '.flac', '.wav', '.m4a')
+PLAYLIST_EXTENSIONS = ('.xspf', '.m3u', '.m3u8')
+SKIP_DIRS = {'extras', 'bonus', 'trailer', 'sample', 'backup'}
+# Ignorier-Regeln: werden gar nicht erst eingelesen (Thumbnail- und Papierkorb-Ordner von NAS-Systemen)
+IGNORE_FILENAME = '.playlistignore'
+DEFAULT_IGNORE_PATTERNS = ('@eaDir/', '.@__thumb/', '#recycle/', '@Recycle/', '$RECYCLE.BIN/',
+                           'System Volume Information/', '.Trash-*/')
+STORYLINE_FILENAME = 'Storyline.txt'
+MANIFEST_FILENAME = '.vlcplaylists-manifest.json'
+MANIFEST_VERSION = 2  # 2: mit --probe fließen Größe und mtime der Mediendateien ein
+
+# Exakt das Format, das ElementTree + minidom.toprettyxml(indent='  ') bisher erzeugt haben
+XSPF_HEADER = '<?xml version="1.0" ?>\n<playlist xmlns="http://xspf.org/ns/0/" version="1">\n'
+XSPF_FOOTER = '  </trackList>\n</playlist>\n'
+WRITE_BUFFER_SIZE = 1 << 16
+
+# Fortschrittsfenster: Bildrate der Anzeige und Größe des sichtbaren Protokolls
+PROGRESS_FRAME_INTERVAL_MS = 50
+PROGRESS_LOG_MAX_LINES = 2000
+PROGRESS_LOG_FILENAME = 'VLCPlaylistCreator.log'
+
+# Anzahl der langsamsten Ordner bzw. Speicher-Verursacher in den Laufzeit-Kennzahlen
+METRICS_TOP_COUNT = 10
+
+# Watch-Modus: Ruhezeit vor dem Verarbeiten, Polling-Intervall und maximale Verzögerung (Sekunden)
+WATCH_DEBOUNCE_SECONDS = 2.0
+WATCH_POLL_INTERVAL = 10.0
+WATCH_MAX_DELAY = 30.0
+
+# Server-Modus: Standard-Port, Obergrenzen des Caches gerenderter Playlists und Latenz-Stichproben
+SERVE_HOST = '127.0.0.1'
+SERVE_PORT = 8765
+SERVE_CACHE_ENTRIES = 1024
+SERVE_CACHE_BYTES = 64 * 1024 * 1024
+SERVE_LATENCY_SAMPLES = 1000
+SERVE_KINDS = ('folder', 'combined', 'storyline')
+SERVE_CONTENT_TYPES = {'xspf': 'application/xspf+xml; charset=utf-8', 'm3u8': 'audio/x-mpegurl; charset=utf-8'}
+
+# Pipeline-Modus: so viele bereite Aufgaben dürfen auf einen Worker warten, bevor das Einlesen pausiert
+PIPELINE_QUEUE_SIZE = 256
+
+# Prüfmodus: so viele tote Einträge werden je Playlist namentlich gemeldet
+VALIDATE_REPORT_LIMIT = 5
+
+# Batch-Modus: Größe des gemeinsamen Worker-Pools und gleichzeitige Aufgaben je Laufwerk (st_dev)
+BATCH_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+BATCH_DEVICE_WORKERS = 4
+
+
+def xml_escape(text):
+    """Maskiert Text wie minidom beim Schreiben von Textknoten."""
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('"', '&quot;').replace('>', '&gt;')
+
+
+# Format-neutrales Track-Modell: Pfad und file:///-URL werden einmal berechnet und von allen Writern
+# geteilt. title, duration (Sekunden) und number (Tracknummer) sind optional und werden nur geschrieben,
+# wenn sie bekannt sind (Medien-Analyse).
+Track = namedtuple('Track', ('path', 'url', 'title', 'duration', 'number'), defaults=(None, None, None))
+NO_TRACK_INFO = (None, None, None)
+
+
+def write_xspf(f, title, tracks):
+    """
+    Schreibt eine XSPF-Playlist zeilenweise in die geöffnete Datei f.
+    Die Tracks werden direkt aus dem Iterator geschrieben, ohne XML-Baum im Speicher.
+    """
+    f.write(XSPF_HEADER)
+    f.write(f'  <title>{xml_escape(title)}</title>\n' if title else '  <title/>\n')
+    f.write('  <trackList>\n')
+    f.writelines(
+        f'    <track>\n      <location>{xml_escape(track.url)}</location>\n    </track>\n'
+        if track.title is None and track.duration is None and track.number is None
+        else xspf_track_with_metadata(track)
+        for track in tracks
+    )
+    f.write(XSPF_FOOTER)
+
+
+def xspf_track_with_metadata(track):
+    """XSPF-Eintrag mit <title>, <trackNum> und <duration> (Millisekunden) in der Reihenfolge der Spezifikation."""
+    entry = f'    <track>\n      <location>{xml_escape(track.url)}</location>\n'
+    if track.title is not None:
+        entry += f'      <title>{xml_escape(track.title)}</title>\n'
+    if track.number is not None:
+        entry += f'      <trackNum>{track.number}</trackNum>\n'
+    if track.duration is not None:
+        entry += f'      <duration>{round(track.duration * 1000)}</duration>\n'
+    return entry + '    </track>\n'
+
+
+def write_m3u8(f, title, tracks):
+    """
+    Schreibt eine erweiterte M3U-Playlist (UTF-8) mit Dateipfaden.
+    #EXTINF steht nur vor Tracks, deren Titel oder Dauer bekannt ist (-1 = unbekannte Dauer).
+    """
+    f.write('#EXTM3U\n')
+    if title:
+        f.write(f'#PLAYLIST:{title}\n')
+    for track in tracks:
+        if track.title is not None or track.duration is not None:
+            duration = round(track.duration) if track.duration is not None else -1
+            f.write(f'#EXTINF:{duration},{track.title or os.path.splitext(os.path.basename(track.path))[0]}\n')
+        f.write(f'{track.path}\n')
+
+
+# Verfügbare Ausgabeformate (Dateiendung ohne Punkt -> Writer)
+PLAYLIST_WRITERS = {
+    'xspf': write_xspf,
+    'm3u8': write_m3u8,
+}
+DEFAULT_PLAYLIST_FORMATS = ('xspf',)
+
+
+# Medien-Analyse: es werden nur Kopf- bzw. Endbereiche und Metadaten-Blöcke gelesen (begrenzte Lesezugriffe)
+PROBE_HEAD_SIZE = 64 * 1024        # Kopfbereich für MKV-Info, MP3-Frame-Header usw.
+PROBE_MAX_READ = 4 * 1024 * 1024   # Obergrenze für einzelne Metadaten-Blöcke (moov, Vorbis-Kommentare, hdrl)
+PROBE_MAX_ENTRIES = 4096           # Obergrenze für Boxen/Elemente/Chunks je Datei (Schutz vor defekten Dateien)
+PROBE_WORKERS = 8                  # Lesezugriffe laufen parallel (I/O-gebunden, v.a. über SMB)
+PROBE_CACHE_FILENAME = '.vlcplaylists-probe-cache.json'
+PROBE_CACHE_VERSION = 1
+
+# Duplikate in kombinierten Playlists: path (gleicher Pfad), inode (zusätzlich Hardlinks und Symlinks
+# auf dieselbe Datei) oder content (zusätzlich Kopien mit gleichem Inhalt, per Stichproben-Hash)
+DEDUP_MODES = ('path', 'inode', 'content')
+DEFAULT_DEDUP_MODE = 'path' if os.name == 'nt' else 'inode'  # Windows liefert Inode-Nummern nur per stat
+HASH_SAMPLE_SIZE = 64 * 1024  # Je Stichprobe (Anfang, Mitte, Ende) gelesene Bytes
+HASH_CACHE_FILENAME = '.vlcplaylists-hash-cache.json'
+HASH_CACHE_VERSION = 1
+
+MKV_SEGMENT = 0x18538067
+MKV_SEEKHEAD = 0x114D9B74
+MKV_SEEK = 0x4DBB
+MKV_SEEK_ID = 0x53AB
+MKV_SEEK_POSITION = 0x53AC
+MKV_INFO = 0x1549A966
+MKV_TIMECODE_SCALE = 0x2AD7B1
+MKV_DURATION = 0x4489
+MKV_TITLE = 0x7BA9
+
+MP3_BITRATES = {  # (MPEG-1, Layer) -> kbit/s je Bitraten-Index
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+MP3_SAMPLE_RATES = (44100, 48000, 32000)
+
+
+def _clean_text(value):
+    """Titel aus Metadaten: erster Wert (Nullbyte-getrennt), ohne Leerraum; leer ergibt None."""
+    value = value.split('\x00')[0].strip()
+    return value or None
+
+
+def _parse_track_number(value):
+    """'3/12' -> 3; fehlende oder ungültige Angaben ergeben None."""
+    try:
+        number = int(value.split('\x00')[0].split('/')[0].strip())
+    except ValueError:
+        return None
+    return number if number > 0 else None
+
+
+def _mp4_boxes(data, start, end):
+    """Iteriert (Typ, Anfang der Nutzdaten, Ende) der MP4-Boxen in data[start:end]."""
+    pos = start
+    for _ in range(PROBE_MAX_ENTRIES):
+        if pos + 8 > end:
+            return
+        size, kind = struct.unpack_from('>I4s', data, pos)
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                return
+            size = struct.unpack_from('>Q', data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return
+        yield kind, pos + header, min(pos + size, end)
+        pos += size
+
+
+def _mp4_tags(data, start, end):
+    """Titel und Tracknummer aus udta/meta/ilst (iTunes-Tags)."""
+    title = number = None
+    for kind, meta_start, meta_end in _mp4_boxes(data, start, end):
+        if kind != b'meta':
+            continue
+        # meta ist eine "full box" (4 Byte Version/Flags), QuickTime-Dateien lassen diese weg
+        if data[meta_start + 4:meta_start + 8] != b'hdlr':
+            meta_start += 4
+        for list_kind, list_start, list_end in _mp4_boxes(data, meta_start, meta_end):
+            if list_kind != b'ilst':
+                continue
+            for tag, tag_start, tag_end in _mp4_boxes(data, list_start, list_end):
+                for value_kind, value_start, value_end in _mp4_boxes(data, tag_start, tag_end):
+                    if value_kind != b'data' or value_end - value_start < 8:
+                        continue
+                    value = data[value_start + 8:value_end]
+                    if tag == b'\xa9nam':
+                        title = _clean_text(value.decode('utf-8', 'replace'))
+                    elif tag == b'trkn' and len(value) >= 4:
+                        number = struct.unpack_from('>H', value, 2)[0] or None
+    return title, number
+
+
+def _probe_mp4(f, size):
+    """MP4/M4A: Dauer aus moov/mvhd, Tags aus moov/udta. mdat wird nur übersprungen, nie gelesen."""
+    pos = 0
+    moov = None
+    for _ in range(PROBE_MAX_ENTRIES):
+        if pos + 8 > size:
+            break
+        f.seek(pos)
+        header = f.read(16)
+        if len(header) < 8:
+            break
+        box_size, kind = struct.unpack_from('>I4s', header)
+        header_size = 8
+        if box_size == 1:
+            if len(header) < 16:
+                break
+            box_size = struct.unpack_from('>Q', header, 8)[0]
+            header_size = 16
+        elif box_size == 0:
+            box_size = size - pos
+        if box_size < header_size:
+            break
+        if kind == b'moov':
+            if box_size - header_size > PROBE_MAX_READ:
+                return None
+            f.seek(pos + header_size)
+            moov = f.read(box_size - header_size)
+            break
+        pos += box_size
+    if moov is None:
+        return None
+    
+    title = duration = number = None
+    for kind, start, end in _mp4_boxes(moov, 0, len(moov)):
+        if kind == b'mvhd' and end - start >= 20:
+            if moov[start] == 1 and end - start >= 32:
+                timescale, length = struct.unpack_from('>IQ', moov, start + 20)
+            else:
+                timescale, length = struct.unpack_from('>II', moov, start + 12)
+            if timescale and length not in (0xFFFFFFFF, 0xFFFFFFFFFFFFFFFF):
+                duration = length / timescale
+        elif kind == b'udta':
+            title, number = _mp4_tags(moov, start, end)
+    return title, duration, number
+
+
+def _ebml_elements(data, start, end):
+    """Iteriert (ID, Anfang der Nutzdaten, Ende) der EBML-Elemente in data[start:end] (Matroska)."""
+    pos = start
+    for _ in range(PROBE_MAX_ENTRIES):
+        if pos >= end:
+            return
+        first = data[pos]
+        id_length = 9 - first.bit_length()
+        if not first or id_length > 4 or pos + id_length >= end:
+            return
+        element_id = int.from_bytes(data[pos:pos + id_length], 'big')
+        pos += id_length
+        
+        first = data[pos]
+        size_length = 9 - first.bit_length()
+        if not first or pos + size_length > end:
+            return
+        size = int.from_bytes(data[pos:pos + size_length], 'big') & ((1 << (7 * size_length)) - 1)
+        pos += size_length
+        # Alle Bits gesetzt: unbekannte Größe (reicht bis zum Ende des übergeordneten Elements)
+        element_end = end if size == (1 << (7 * size_length)) - 1 else pos + size
+        yield element_id, pos, min(element_end, end)
+        pos = element_end
+
+
+def _mkv_info(data, start, end):
+    """Titel und Dauer aus dem Info-Element eines Matroska-Segments."""
+    scale = 1000000
+    raw_duration = title = None
+    for element_id, value_start, value_end in _ebml_elements(data, start, end):
+        value = data[value_start:value_end]
+        if element_id == MKV_TIMECODE_SCALE:
+            scale = int.from_bytes(value, 'big') or scale
+        elif element_id == MKV_DURATION and len(value) in (4, 8):
+            raw_duration = struct.unpack('>f' if len(value) == 4 else '>d', value)[0]
+        elif element_id == MKV_TITLE:
+            title = _clean_text(value.decode('utf-8', 'replace'))
+    duration = raw_duration * scale / 1e9 if raw_duration else None
+    return title, duration, None
+
+
+def _mkv_seek_position(data, start, end, target_id):
+    """Position eines Elements relativ zum Segment-Anfang laut SeekHead."""
+    for element_id, seek_start, seek_end in _ebml_elements(data, start, end):
+        if element_id != MKV_SEEK:
+            continue
+        seek_id = position = None
+        for child_id, child_start, child_end in _ebml_elements(data, seek_start, seek_end):
+            if child_id == MKV_SEEK_ID:
+                seek_id = int.from_bytes(data[child_start:child_end], 'big')
+            elif child_id == MKV_SEEK_POSITION:
+                position = int.from_bytes(data[child_start:child_end], 'big')
+        if seek_id == target_id and position is not None:
+            return position
+    return None
+
+
+def _probe_mkv(f, size):
+    """Matroska: Info-Element (Dauer, Titel) im Kopfbereich oder gezielt über den SeekHead."""
+    head = f.read(PROBE_HEAD_SIZE)
+    for element_id, segment_start, _ in _ebml_elements(head, 0, len(head)):
+        if element_id == MKV_SEGMENT:
+            break
+    else:
+        return None
+    
+    info_position = None
+    for element_id, start, end in _ebml_elements(head, segment_start, len(head)):
+        if element_id == MKV_INFO:
+            return _mkv_info(head, start, end)
+        if element_id == MKV_SEEKHEAD:
+            info_position = _mkv_seek_position(head, start, end, MKV_INFO)
+    if info_position is None:
+        return None
+    
+    f.seek(segment_start + info_position)
+    data = f.read(PROBE_HEAD_SIZE)
+    for element_id, start, end in _ebml_elements(data, 0, len(data)):
+        return _mkv_info(data, start, end) if element_id == MKV_INFO else None
+    return None
+
+
+def _vorbis_comments(data):
+    """Vorbis-Kommentare (FLAC) als Dict mit Schlüsseln in Großbuchstaben (erster Wert gewinnt)."""
+    comments = {}
+    pos = 4 + struct.unpack_from('<I', data, 0)[0]  # Hersteller-Kennung überspringen
+    count = struct.unpack_from('<I', data, pos)[0]
+    pos += 4
+    for _ in range(min(count, PROBE_MAX_ENTRIES)):
+        length = struct.unpack_from('<I', data, pos)[0]
+        pos += 4
+        key, _, value = data[pos:pos + length].decode('utf-8', 'replace').partition('=')
+        comments.setdefault(key.upper(), value)
+        pos += length
+    return comments
+
+
+def _probe_flac(f, size):
+    """FLAC: Dauer aus STREAMINFO, Titel und Tracknummer aus VORBIS_COMMENT (Bilder werden übersprungen)."""
+    if f.read(4) != b'fLaC':
+        return None
+    title = duration = number = None
+    for _ in range(PROBE_MAX_ENTRIES):
+        header = f.read(4)
+        if len(header) < 4:
+            break
+        block_type = header[0] & 0x7F
+        length = int.from_bytes(header[1:4], 'big')
+        if block_type == 0 and length >= 18:
+            block = f.read(length)
+            sample_rate = (block[10] << 12) | (block[11] << 4) | (block[12] >> 4)
+            samples = ((block[13] & 0x0F) << 32) | struct.unpack_from('>I', block, 14)[0]
+            if sample_rate and samples:
+                duration = samples / sample_rate
+        elif block_type == 4 and length <= PROBE_MAX_READ:
+            comments = _vorbis_comments(f.read(length))
+            title = _clean_text(comments.get('TITLE', ''))
+            number = _parse_track_number(comments.get('TRACKNUMBER', ''))
+        else:
+            f.seek(length, os.SEEK_CUR)
+        if header[0] & 0x80:  # letzter Metadaten-Block
+            break
+    return title, duration, number
+
+
+def _syncsafe(data):
+    """ID3v2-Größenangabe (je Byte 7 Bit)."""
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def _id3_text(data):
+    """Inhalt eines ID3v2-Textframes (erstes Byte: Kodierung)."""
+    if not data:
+        return ''
+    encoding = ('latin-1', 'utf-16', 'utf-16-be', 'utf-8')[data[0]] if data[0] < 4 else 'latin-1'
+    return data[1:].decode(encoding, 'replace')
+
+
+def _id3v2_frames(f):
+    """
+    Liest die Textframes eines ID3v2-Tags am Dateianfang; Bilder und andere Frames
+    werden übersprungen. Gibt (Frame-ID -> Text, Ende des Tags) zurück.
+    """
+    header = f.read(10)
+    if len(header) < 10 or header[:3] != b'ID3':
+        return {}, 0
+    version, flags = header[3], header[5]
+    tag_end = 10 + _syncsafe(header[6:10])
+    pos = 10
+    if flags & 0x40:  # erweiterter Header
+        extended = f.read(4)
+        pos += _syncsafe(extended) if version == 4 else 4 + struct.unpack('>I', extended)[0]
+    id_length, header_length = (3, 6) if version == 2 else (4, 10)
+    
+    frames = {}
+    for _ in range(PROBE_MAX_ENTRIES):
+        if pos + header_length > tag_end:
+            break
+        f.seek(pos)
+        frame = f.read(header_length)
+        if len(frame) < header_length or not frame[0]:  # Padding
+            break
+        if version == 2:
+            size = int.from_bytes(frame[3:6], 'big')
+        elif version == 4:
+            size = _syncsafe(frame[4:8])
+        else:
+            size = struct.unpack_from('>I', frame, 4)[0]
+        frame_id = frame[:id_length].decode('latin-1')
+        if frame_id.startswith('T') and size <= PROBE_HEAD_SIZE:
+            frames[frame_id] = _id3_text(f.read(size))
+        pos += header_length + size
+    return frames, tag_end + (10 if flags & 0x10 else 0)  # optionaler Footer
+
+
+def _mp3_frame_header(header):
+    """Zerlegt einen MPEG-Audio-Frame-Header; gibt (MPEG-1, kbit/s, Abtastrate, mono, Samples) oder None zurück."""
+    if header & 0xFFE00000 != 0xFFE00000:
+        return None
+    version_bits = (header >> 19) & 3   # 0: MPEG-2.5, 2: MPEG-2, 3: MPEG-1
+    layer_bits = (header >> 17) & 3     # 1: Layer III, 2: Layer II, 3: Layer I
+    bitrate_index = (header >> 12) & 15
+    rate_index = (header >> 10) & 3
+    if version_bits == 1 or layer_bits == 0 or bitrate_index == 15 or rate_index == 3:
+        return None
+    mpeg1 = version_bits == 3
+    layer = 4 - layer_bits
+    sample_rate = MP3_SAMPLE_RATES[rate_index] >> (0 if mpeg1 else 1 if version_bits == 2 else 2)
+    mono = (header >> 6) & 3 == 3
+    samples = 384 if layer == 1 else 1152 if mpeg1 or layer == 2 else 576
+    return mpeg1, MP3_BITRATES[(mpeg1, layer)][bitrate_index], sample_rate, mono, samples
+
+
+def _probe_mp3(f, size):
+    """
+    MP3: Titel/Tracknummer aus ID3v2 (sonst ID3v1 am Dateiende), Dauer aus dem
+    Xing/Info- bzw. VBRI-Header des ersten Frames, sonst TLEN oder Schätzung über die Bitrate.
+    """
+    frames, audio_start = _id3v2_frames(f)
+    title = _clean_text(frames.get('TIT2') or frames.get('TT2') or '')
+    number = _parse_track_number(frames.get('TRCK') or frames.get('TRK') or '')
+    
+    audio_end = size
+    if size >= 128:
+        f.seek(size - 128)
+        tail = f.read(128)
+        if tail[:3] == b'TAG':
+            audio_end -= 128
+            title = title or _clean_text(tail[3:33].decode('latin-1'))
+            if number is None and tail[125] == 0 and tail[126]:
+                number = tail[126]
+    
+    f.seek(audio_start)
+    head = f.read(PROBE_HEAD_SIZE)
+    frame = None
+    pos = head.find(b'\xff')
+    while 0 <= pos <= len(head) - 4:
+        frame = _mp3_frame_header(struct.unpack_from('>I', head, pos)[0])
+        if frame is not None:
+            break
+        pos = head.find(b'\xff', pos + 1)
+    
+    duration = None
+    if frame is not None:
+        mpeg1, bitrate, sample_rate, mono, samples = frame
+        xing = pos + 4 + (32 if mpeg1 and not mono else 17 if mpeg1 or not mono else 9)
+        frame_count = None
+        if head[xing:xing + 4] in (b'Xing', b'Info') and len(head) >= xing + 12:
+            if struct.unpack_from('>I', head, xing + 4)[0] & 1:
+                frame_count = struct.unpack_from('>I', head, xing + 8)[0]
+        elif head[pos + 36:pos + 40] == b'VBRI' and len(head) >= pos + 54:
+            frame_count = struct.unpack_from('>I', head, pos + 50)[0]
+        if frame_count:
+            duration = frame_count * samples / sample_rate
+        elif not frames.get('TLEN') and bitrate:
+            duration = (audio_end - audio_start - pos) * 8 / (bitrate * 1000)
+    if duration is None and frames.get('TLEN'):
+        try:
+            duration = int(_clean_text(frames['TLEN']) or 0) / 1000 or None
+        except ValueError:
+            pass
+    return title, duration, number
+
+
+def _riff_chunks(data, start):
+    """Iteriert (ID, Anfang, Ende) der Chunks in einem eingelesenen RIFF-LIST-Block."""
+    pos = start
+    for _ in range(PROBE_MAX_ENTRIES):
+        if pos + 8 > len(data):
+            return
+        chunk_id, chunk_size = struct.unpack_from('<4sI', data, pos)
+        yield chunk_id, pos + 8, min(pos + 8 + chunk_size, len(data))
+        pos += 8 + chunk_size + (chunk_size & 1)
+
+
+def _probe_riff(f, size):
+    """WAV/AVI: Dauer aus fmt/data bzw. avih, Titel und Tracknummer aus LIST/INFO. Audio-/Videodaten werden übersprungen."""
+    header = f.read(12)
+    if len(header) < 12 or header[:4] != b'RIFF':
+        return None
+    title = duration = number = None
+    byte_rate = data_size = None
+    pos = 12
+    for _ in range(PROBE_MAX_ENTRIES):
+        if pos + 8 > size:
+            break
+        f.seek(pos)
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            break
+        chunk_id, chunk_size = struct.unpack('<4sI', chunk)
+        if chunk_id == b'fmt ' and chunk_size >= 16:
+            byte_rate = struct.unpack_from('<I', f.read(16), 8)[0]
+        elif chunk_id == b'data':
+            data_size = min(chunk_size, size - pos - 8)
+        elif chunk_id == b'LIST' and chunk_size <= PROBE_MAX_READ:
+            body = f.read(chunk_size)
+            if body[:4] == b'INFO':
+                for info_id, start, end in _riff_chunks(body, 4):
+                    value = body[start:end]
+                    try:
+                        text = value.decode('utf-8')
+                    except UnicodeDecodeError:
+                        text = value.decode('latin-1')
+                    if info_id == b'INAM':
+                        title = _clean_text(text)
+                    elif info_id in (b'ITRK', b'IPRT'):
+                        number = _parse_track_number(text)
+            elif body[:4] == b'hdrl':
+                for header_id, start, end in _riff_chunks(body, 4):
+                    if header_id == b'avih' and end - start >= 20:
+                        micro_seconds, = struct.unpack_from('<I', body, start)
+                        total_frames, = struct.unpack_from('<I', body, start + 16)
+                        duration = micro_seconds * total_frames / 1e6 or None
+                        break
+        pos += 8 + chunk_size + (chunk_size & 1)
+    
+    if duration is None and byte_rate and data_size:
+        duration = data_size / byte_rate
+    return title, duration, number
+
+
+# Dateiendung -> Analyse-Funktion (Rückgabe: (title, duration, number) oder None)
+MEDIA_PROBES = {
+    '.mp4': _probe_mp4,
+    '.m4a': _probe_mp4,
+    '.mkv': _probe_mkv,
+    '.flac': _probe_flac,
+    '.mp3': _probe_mp3,
+    '.wav': _probe_riff,
+    '.avi': _probe_riff,
+}
+
+
+def probe_media_file(path, size):
+    """
+    Liest Titel, Dauer (Sekunden) und Tracknummer aus Kopf-/Endbereich einer Mediendatei.
+    Gibt (title, duration, number) zurück; nicht erkannte Werte sind None.
+    """
+    probe = MEDIA_PROBES.get(os.path.splitext(path)[1].lower())
+    info = None
+    if probe is not None:
+        try:
+            with open(path, 'rb', buffering=0) as f:
+                info = probe(f, size)
+        except (OSError, ValueError, IndexError, OverflowError, struct.error):
+            info = None
+    if not info:
+        return None, None, None
+    title, duration, number = info
+    if duration is not None:
+        duration = round(duration, 3) if 0 < duration < 1e7 else None  # auch NaN aus defekten Headern
+    return title, duration, number
+
+
+def sample_file_hash(path, size):
+    """
+    Inhalts-Kennung einer Datei aus ihrer Größe und drei Stichproben (Anfang, Mitte, Ende)
+    zu je HASH_SAMPLE_SIZE Bytes; kleine Dateien werden ganz gelesen.
+    Gibt (Hexdigest, gelesene Bytes) zurück, bei Lesefehlern ist der Digest None.
+    """
+    digest = hashlib.blake2b(str(size).encode('ascii'), digest_size=16)
+    if size <= 3 * HASH_SAMPLE_SIZE:
+        samples = [(0, size)]
+    else:
+        samples = [(0, HASH_SAMPLE_SIZE), ((size - HASH_SAMPLE_SIZE) // 2, HASH_SAMPLE_SIZE),
+                   (size - HASH_SAMPLE_SIZE, HASH_SAMPLE_SIZE)]
+    read = 0
+    try:
+        with open(path, 'rb', buffering=0) as f:
+            for offset, length in samples:
+                f.seek(offset)
+                chunk = f.read(length)
+                read += len(chunk)
+                digest.update(chunk)
+    except OSError:
+        return None, read
+    return digest.hexdigest(), read
+
+
+# Sortierschlüssel: Muster werden einmal beim Import kompiliert
+EPISODE_PATTERN = re.compile(r'^(?:S(\d+)[Ee](\d+)|(\d+)[\.\s-]+)(.*)')
+YEAR_PATTERN = re.compile(r'\((\d{4})\)')
+YEAR_STRIP_PATTERN = re.compile(r'\s*\(\d{4}\)')
+PART_NUMBER_PATTERN = re.compile(r'(\d+)$')
+PART_NUMBER_STRIP_PATTERN = re.compile(r'\s*\d+$')
+LEADING_SEPARATOR_PATTERN = re.compile(r'^[:\-\s]+')
+ROMAN_NUMERALS = {
+    'I': 1, 'II': 2, 'III': 3, 'IV': 4, 'V': 5,
+    'VI': 6, 'VII': 7, 'VIII': 8, 'IX': 9, 'X': 10,
+    'XI': 11, 'XII': 12, 'XIII': 13, 'XIV': 14, 'XV': 15
+}
+# Ein einziges Muster statt 15 Suchen nacheinander. Die frühere Schleife nahm die erste
+# Zahl in der Reihenfolge I, II, ..., XV, deren Muster am Namensende passte - ohne
+# Wortgrenze gewinnen dabei nur I, IV, V, IX und X. Die Alternativen hier liefern
+# genau diese Auswahl und denselben zu entfernenden Bereich.
+ROMAN_PATTERN = re.compile(r'\s*(?:Teil|Part|Teil\s+)?(IV|IX|I|V|X)\s*$', re.IGNORECASE)
+SORT_KEY_CACHE_SIZE = 1 << 16
+
+
+def file_url_to_path(url):
+    """Wandelt eine file:///-URL aus einer Playlist zurück in einen Dateipfad."""
+    return unquote(url.replace('file:///', ''))
+
+
+def path_to_file_url(path):
+    """Kodiert einen Dateipfad als file:///-URL, wie sie in den Playlists steht."""
+    return 'file:///' + quote(path.replace('\\', '/'), safe=':/')
+
+
+def playlist_location_to_path(location, base_directory):
+    """
+    Dateipfad eines Playlist-Eintrags, None für andere URLs (http:// usw.). file:///-URLs werden
+    wie in extract_sort_key_from_path mit file_url_to_path dekodiert; fehlt danach unter POSIX
+    der führende / (URLs aus VLC oder von Hand), wird er ergänzt. file://server/... ist eine
+    Netzwerkfreigabe, Einträge ohne Schema gelten relativ zum Ordner der Playlist.
+    """
+    if location.startswith('file://'):
+        if location.startswith('file:///'):
+            path = file_url_to_path(location)
+            if not os.path.isabs(path):
+                path = os.sep + path
+        else:
+            path = '//' + unquote(location[len('file://'):])
+    elif '://' in location:
+        return None
+    else:
+        path = os.path.join(base_directory, location)
+    return os.path.normpath(path)
+
+
+def iter_playlist_locations(path):
+    """
+    Liefert die Einträge einer Playlist als Datenstrom, mit konstantem Speicher auch für große
+    kombinierte Playlists: <location> aus XSPF per iterparse (bereits gelesene Tracks werden
+    verworfen), Pfad- bzw. URL-Zeilen aus M3U/M3U8 (UTF-8, sonst cp1252).
+    Wirft xml.etree.ElementTree.ParseError bei defekten XSPF-Dateien.
+    """
+    if path.lower().endswith('.xspf'):
+        from xml.etree.ElementTree import iterparse
+        
+        track_list = None
+        for event, element in iterparse(path, events=('start', 'end')):
+            tag = element.tag.rpartition('}')[2]
+            if event == 'start':
+                if tag == 'trackList':
+                    track_list = element
+            elif tag == 'location':
+                if element.text and element.text.strip():
+                    yield element.text.strip()
+            elif tag == 'track' and track_list is not None:
+                track_list.clear()
+        return
+    with open(path, 'rb') as f:
+        for line in f:
+            try:
+                line = line.decode('utf-8')
+            except UnicodeDecodeError:
+                line = line.decode('cp1252', errors='replace')
+            line = line.strip().lstrip('\ufeff')
+            if line and not line.startswith('#'):
+                yield line
+
+
+@lru_cache(maxsize=SORT_KEY_CACHE_SIZE)
+def natural_sort_key(filename):
+    """
+    Sortierschlüssel eines Dateinamens (ohne Pfad) für die natürliche Sortierung.
+    Erkennt S01E01, "01 - Titel", "Titel Teil II (2023)", "Movie 3" usw.
+    """
+    # Entferne Dateierweiterung
+    name_without_ext = os.path.splitext(filename)[0]
+    
+    # 1. Erkennung von Episodenformat: "1 - Titel" oder "01. Titel" oder "S01E01"
+    episode_match = EPISODE_PATTERN.match(name_without_ext)
+    if episode_match:
+        # Fall: S01E01 Format
+        if episode_match.group(1):
+            season = int(episode_match.group(1))
+            episode = int(episode_match.group(2))
+            title = episode_match.group(4).strip()
+            return (0, season, episode, title.lower())
+        # Fall: Nummer am Anfang Format
+        number = int(episode_match.group(3) or 0)
+        title = episode_match.group(4).strip()
+        return (1, number, title.lower())
+    
+    # 2. Erkennung von Filmreihen: "Titel 2 (Jahr)" oder "Titel: Teil II (Jahr)"
+    year_match = YEAR_PATTERN.search(name_without_ext)
+    year = int(year_match.group(1)) if year_match else 9999  # 9999 für Filme ohne Jahr
+    name_without_year = YEAR_STRIP_PATTERN.sub('', name_without_ext)
+    
+    # Teilnummer: arabisch am Ende, sonst römisch (mit oder ohne "Teil", "Part")
+    arabic_match = PART_NUMBER_PATTERN.search(name_without_year.strip())
+    if arabic_match:
+        part_num = int(arabic_match.group(1))
+        base_name = PART_NUMBER_STRIP_PATTERN.sub('', name_without_year).strip()
+    else:
+        roman_match = ROMAN_PATTERN.search(name_without_year)
+        if roman_match:
+            part_num = ROMAN_NUMERALS[roman_match.group(1).upper()]
+            base_name = name_without_year[:roman_match.start()].strip()
+        else:
+            # Keine explizite Teilnummer -> Teil 1
+            part_num = 1
+            base_name = name_without_year.strip()
+    
+    # Entferne Doppelpunkte und andere Trennzeichen vom Anfang des Basisnamens
+    base_name = LEADING_SEPARATOR_PATTERN.sub('', base_name)
+    
+    return (2, base_name.lower(), part_num, year)
+
+
+def natural_sort_keys(filenames):
+    """Berechnet die Sortierschlüssel einer ganzen Verzeichnisliste auf einmal."""
+    return list(map(natural_sort_key, filenames))
+
+
+def sort_naturally(filenames):
+    """
+    Sortiert eine Verzeichnisliste natürlich. Jeder Schlüssel wird genau einmal
+    berechnet; gleiche Schlüssel behalten ihre Listing-Reihenfolge (stabil).
+    """
+    filenames = list(filenames)
+    keys = natural_sort_keys(filenames)
+    order = sorted(range(len(filenames)), key=keys.__getitem__)
+    return [filenames[i] for i in order]
+
+
+# Storyline-Abgleich
+STORYLINE_NUMBER_PATTERN = re.compile(r'^\d+[\.\-\s]*')
+STORYLINE_MIN_SCORE = 3
+STORYLINE_START_BONUS = 5
+
+
+@lru_cache(maxsize=SORT_KEY_CACHE_SIZE)
+def prepare_text_for_matching(text):
+    """Entfernt Nummerierungen (wie '1.', '23.') und Jahreszahlen, konvertiert zu Kleinbuchstaben."""
+    # Entferne führende Nummern mit Punkt/Dash (z.B. "1. ", "23 - ")
+    text = STORYLINE_NUMBER_PATTERN.sub('', text)
+    # Entferne Jahreszahlen in Klammern
+    text = YEAR_STRIP_PATTERN.sub('', text)
+    # Konvertiere zu Kleinbuchstaben und entferne überflüssige Leerzeichen
+    return text.strip().lower()
+
+
+class StorylineMatcher:
+    """
+    Aho-Corasick-Automat über die bereinigten Storyline-Einträge.
+    
+    Ordnet einen bereinigten Dateinamen in einem einzigen Durchlauf dem besten Eintrag zu,
+    mit derselben Bewertung wie der frühere Vergleich gegen jeden Eintrag: Länge des
+    enthaltenen Eintrags, +5 am Namensanfang, mindestens 3 Punkte, bei Gleichstand
+    gewinnt der frühere Eintrag.
+    """
+    
+    def __init__(self, cleaned_entries):
+        # Gleiche bereinigte Einträge: nur der erste kann je gewinnen
+        first_index = {}
+        for idx, cleaned in enumerate(cleaned_entries):
+            first_index.setdefault(cleaned, idx)
+        # Ein leerer Eintrag ist in jedem Namen "enthalten" und steht immer am Anfang
+        self.empty_index = first_index.pop('', None)
+        
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [()]  # Pro Zustand: (Länge, Index) aller hier endenden Einträge
+        for cleaned, idx in first_index.items():
+            state = 0
+            for char in cleaned:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(())
+                state = next_state
+            self.output[state] = ((len(cleaned), idx),)
+        
+        # Fehlerübergänge in Breitensuche; Ausgaben der Suffix-Zustände werden übernommen
+        pending = list(self.goto[0].values())
+        for state in pending:
+            for char, next_state in self.goto[state].items():
+                pending.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+    
+    def match(self, cleaned_filename):
+        """Gibt den Index des besten Storyline-Eintrags zurück oder None."""
+        best_score = 0
+        best_index = None
+        if self.empty_index is not None:
+            best_score = STORYLINE_START_BONUS
+            best_index = self.empty_index
+        
+        goto = self.goto
+        fail = self.fail
+        output = self.output
+        state = 0
+        for position, char in enumerate(cleaned_filename):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, idx in output[state]:
+                score = length + STORYLINE_START_BONUS if position + 1 == length else length
+                if score > best_score or (score == best_score and idx < best_index):
+                    best_score = score
+                    best_index = idx
+        
+        if best_index is not None and best_score >= STORYLINE_MIN_SCORE:
+            return best_index
+        return None
+
+
+class DirectoryNode:
+    """Ein Ordner im In-Memory-Index der Mediathek."""
+    
+    __slots__ = ('path', 'name', 'parent', 'children', 'media_files', 'media_entries',
+                 'playlists', 'storyline_entry', 'entry_count', 'pruned', 'is_link')
+    
+    def __init__(self, path, parent=None, pruned=False, is_link=False):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.parent = parent
+        self.children = []          # Unterordner in Listing-Reihenfolge (wie os.walk)
+        self.media_files = []       # Namen der Mediendateien in Listing-Reihenfolge
+        self.media_entries = []     # Zugehörige DirEntry-Objekte (gecachte Typ-/stat-Infos)
+        self.playlists = set()      # Vorhandene .xspf/.m3u Dateien in diesem Ordner
+        self.storyline_entry = None
+        self.entry_count = 0
+        self.pruned = pruned        # Liegt in/unter einem übersprungenen Ordner (extras, bonus, ...)
+        self.is_link = is_link      # Symlink auf einen Ordner: wird wie bei os.walk nicht betreten
+
+
+def walk_nodes(start, topdown=True, include_pruned=True):
+    """
+    Durchläuft einen Index-Teilbaum in derselben Reihenfolge wie os.walk
+    (Symlink-Ordner werden wie bei os.walk nicht betreten).
+    """
+    def visible_children(node):
+        return [c for c in node.children if not c.is_link and (include_pruned or not c.pruned)]
+    
+    if topdown:
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(visible_children(node)))
+    else:
+        stack = [(start, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if expanded:
+                yield node
+            else:
+                stack.append((node, True))
+                stack.extend((c, False) for c in reversed(visible_children(node)))
+
+
+def parse_ignore_rules(lines):
+    """
+    Liest Muster im Format von .playlistignore: eines pro Zeile, leere Zeilen und Zeilen mit #
+    werden übersprungen (ein Name, der mit # beginnt, wird als \\# geschrieben).
+    """
+    patterns = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        patterns.append(line[1:] if line.startswith('\\#') else line)
+    return patterns
+
+
+class IgnoreRules:
+    """
+    Ignorier-Regeln für das Einlesen: Glob-Muster (fnmatch) oder mit re: eingeleitete
+    reguläre Ausdrücke, jeweils auf den Namen eines Eintrags; ein abschließender /
+    beschränkt das Muster auf Ordner. Alle Muster werden einmal zu je einem Ausdruck
+    für Ordner und für Dateien zusammengefasst, ein Eintrag kostet einen match-Aufruf.
+    Ungültige reguläre Ausdrücke landen mit Fehlermeldung in invalid.
+    """
+    
+    def __init__(self, patterns=()):
+        self.patterns = []
+        self.invalid = []  # [(Muster, Fehlermeldung)]
+        directories = []
+        files = []
+        for pattern in patterns:
+            directory_only = pattern.endswith('/')
+            body = pattern.rstrip('/')
+            if not body:
+                continue
+            if body.startswith('re:'):
+                regex = f'(?:{body[3:]})'
+                try:
+                    re.compile(regex)
+                except re.error as e:
+                    self.invalid.append((pattern, str(e)))
+                    continue
+            else:
+                regex = fnmatch.translate(body)
+            self.patterns.append(pattern)
+            directories.append(regex)
+            if not directory_only:
+                files.append(regex)
+        # Wie fnmatch: ohne Groß-/Kleinschreibung nur auf Dateisystemen, die sie nicht unterscheiden
+        flags = re.IGNORECASE if os.path.normcase('A') == 'a' else 0
+        self._directories = re.compile('|'.join(directories), flags) if directories else None
+        self._files = re.compile('|'.join(files), flags) if files else None
+    
+    def ignores(self, name, is_dir):
+        pattern = self._directories if is_dir else self._files
+        return pattern is not None and pattern.match(name) is not None
+
+
+class LibraryIndex:
+    """
+    Verzeichnisbaum der Mediathek, einmal per os.scandir eingelesen.
+    Alle Phasen lesen aus diesem Index statt das Dateisystem erneut abzufragen.
+    Einträge, die ignore_rules ausschließen, kommen nicht in den Index (gezählt in ignored).
+    """
+    
+    def __init__(self, root, ignore_rules=None):
+        self.root = root
+        self.root_node = DirectoryNode(root)
+        self.nodes = {root: self.root_node}
+        self.ignore_rules = ignore_rules
+        self.ignored = Counter()  # directories/files, die ignore_rules ausgeschlossen haben
+    
+    def add_child(self, parent, name, is_link=False):
+        pruned = parent.pruned or name.lower() in SKIP_DIRS
+        child = DirectoryNode(os.path.join(parent.path, name), parent, pruned, is_link)
+        parent.children.append(child)
+        self.nodes[child.path] = child
+        return child
+    
+    def walk(self, start=None, topdown=True, include_pruned=True):
+        """Durchläuft den Baum in derselben Reihenfolge wie os.walk."""
+        return walk_nodes(start or self.root_node, topdown, include_pruned)
+    
+    def estimate_legacy_io(self, with_storyline, with_combined):
+        """
+        Schätzt die listdir/stat-Aufrufe des früheren Ablaufs (mehrere os.walk,
+        os.listdir + os.path.isfile pro Eintrag, os.path.exists pro Unterordner).
+        """
+        listdir = 0
+        stat = 0
+        all_nodes = list(self.walk())
+        listdir += len(all_nodes)  # delete_old_playlists
+        listdir += sum(1 for _ in self.walk(include_pruned=False))  # Zähl-Durchlauf
+        for node in self.walk(include_pruned=False):
+            if not node.media_files:
+                continue
+            listdir += 2
+            stat += 2 * node.entry_count
+            if with_storyline:
+                stat += 1
+                if node.storyline_entry is not None:
+                    listdir += sum(1 for _ in self.walk(node))
+        if with_combined:
+            listdir += len(all_nodes)
+            stat += sum(len(node.children) for node in all_nodes)
+        return listdir, stat
+
+
+class TrackStore:
+    """
+    Zentrale Track-Tabelle eines Laufs. Jede Mediendatei wird genau einmal als
+    (Ordner-ID, Dateiname) abgelegt; die Dateinamen sind dieselben str-Objekte wie im Index.
+    Die Tracks eines Ordners bilden einen zusammenhängenden ID-Block in natürlicher Sortierung.
+    Pfade und URLs entstehen erst beim Schreiben: das Präfix wird je Ordner einmal kodiert,
+    der Dateiname beim ersten Schreiben (danach aus encoded_names).
+    Mit identify erkennt die Tabelle dieselbe Datei unter verschiedenen Pfaden (Hardlink,
+    Symlink, Kopie): spätere Track-IDs verweisen in aliases auf die erste.
+    """
+    
+    __slots__ = ('media_info', 'identify', 'path_prefixes', 'url_prefixes', 'directory_of', 'names',
+                 'encoded_names', 'aliases', 'alias_ids', '_first_by_identity', '_blocks', '_lock')
+    
+    def __init__(self, media_info=None, identify=None):
+        self.media_info = media_info if media_info is not None else {}  # Pfad -> (Titel, Dauer, Tracknummer)
+        self.identify = identify        # (Ordner, sortierte Dateinamen) -> Identitäten (None = unbekannt)
+        self.path_prefixes = []         # Ordner-ID -> Pfad mit abschließendem Trenner
+        self.url_prefixes = []          # Ordner-ID -> kodierte file:///-URL des Ordners
+        self.directory_of = array('I')  # Track-ID -> Ordner-ID
+        self.names = []                 # Track-ID -> Dateiname
+        self.encoded_names = []         # Track-ID -> URL-kodierter Dateiname (None bis zum ersten Schreiben)
+        self.aliases = {}               # Track-ID -> erste Track-ID derselben Datei
+        self.alias_ids = array('I')     # Schlüssel von aliases (nur angehängt, daher ohne Sperre lesbar)
+        self._first_by_identity = {}
+        self._blocks = {}               # Ordner -> (erste Track-ID, Ende)
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self.names)
+    
+    def block(self, directory, media_files):
+        """ID-Bereich (start, stop) der Mediendateien eines Ordners; beim ersten Aufruf sortiert angelegt."""
+        block = self._blocks.get(directory)
+        if block is not None:
+            return block
+        names = sort_naturally(media_files)
+        identities = self.identify(directory, names) if self.identify is not None else None
+        with self._lock:
+            block = self._blocks.get(directory)
+            if block is None:
+                prefix = os.path.join(directory, '')
+                self.path_prefixes.append(prefix)
+                self.url_prefixes.append(path_to_file_url(prefix))
+                start = len(self.names)
+                self.names.extend(names)
+                self.encoded_names.extend(repeat(None, len(names)))
+                self.directory_of.extend(repeat(len(self.path_prefixes) - 1, len(names)))
+                block = self._blocks[directory] = (start, len(self.names))
+                if identities is not None:
+                    for track_id, identity in enumerate(identities, start):
+                        if identity is None:
+                            continue
+                        first = self._first_by_identity.setdefault(identity, track_id)
+                        if first != track_id:
+                            self.aliases[track_id] = first
+                            self.alias_ids.append(track_id)
+        return block
+    
+    def path(self, track_id):
+        return self.path_prefixes[self.directory_of[track_id]] + self.names[track_id]
+    
+    def tracks(self, runs):
+        """Erzeugt die Track-Tupel zu den Läufen [start, stop, ...] (URL-Kodierung erst hier)."""
+        path_prefixes, url_prefixes = self.path_prefixes, self.url_prefixes
+        directory_of, names, encoded_names = self.directory_of, self.names, self.encoded_names
+        media_info = self.media_info
+        for i in range(0, len(runs), 2):
+            for track_id in range(runs[i], runs[i + 1]):
+                directory_id = directory_of[track_id]
+                path = path_prefixes[directory_id] + names[track_id]
+                encoded = encoded_names[track_id]
+                if encoded is None:
+                    encoded = encoded_names[track_id] = quote(names[track_id].replace('\\', '/'), safe=":/")
+                info = media_info.get(path) if media_info else None
+                yield Track(path, url_prefixes[directory_id] + encoded, *(info or NO_TRACK_INFO))
+
+
+class TrackList:
+    """
+    Track-Folge einer Playlist als Läufe aufeinanderfolgender Track-IDs, flach in einem
+    array('I') [start, stop, start, stop, ...]. Kombinierte Playlists übernehmen die Läufe
+    ihrer Unterordner, statt deren Tracks zu kopieren. Iteriert werden Track-Tupel.
+    """
+    
+    __slots__ = ('store', 'runs')
+    
+    def __init__(self, store):
+        self.store = store
+        self.runs = array('I')
+    
+    def __len__(self):
+        runs = self.runs
+        return sum(runs[i + 1] - runs[i] for i in range(0, len(runs), 2))
+    
+    def __iter__(self):
+        return self.store.tracks(self.runs)
+    
+    def append_run(self, start, stop):
+        """Hängt die Track-IDs start..stop-1 an (angrenzende Läufe werden zusammengefasst)."""
+        if start >= stop:
+            return
+        runs = self.runs
+        if runs and runs[-1] == start:
+            runs[-1] = stop
+        else:
+            runs.append(start)
+            runs.append(stop)
+    
+    def extend(self, other):
+        runs = other.runs
+        for i in range(0, len(runs), 2):
+            self.append_run(runs[i], runs[i + 1])
+    
+    def ids(self):
+        runs = self.runs
+        for i in range(0, len(runs), 2):
+            yield from range(runs[i], runs[i + 1])
+    
+    def deduplicated(self, counts=None):
+        """
+        Entfernt doppelte Tracks, das erste Vorkommen bleibt (keine Neu-Sortierung). Doppelt sind
+        gleiche Track-IDs und dieselbe Datei unter anderem Pfad (store.aliases); letztere zählt
+        counts['identity']. Überschneiden sich die Läufe nicht und enthält die Liste keinen Alias,
+        gibt es nichts zu tun (Normalfall).
+        """
+        runs = sorted(zip(self.runs[0::2], self.runs[1::2]))
+        aliases = self.store.aliases
+        if all(runs[i][0] >= runs[i - 1][1] for i in range(1, len(runs))):
+            starts = [run[0] for run in runs]
+            if not any(
+                (i := bisect_right(starts, track_id) - 1) >= 0 and track_id < runs[i][1]
+                for track_id in self.store.alias_ids
+            ):
+                return self
+        unique = TrackList(self.store)
+        seen = set()
+        seen_ids = set()
+        collapsed = 0
+        for track_id in self.ids():
+            identity = aliases.get(track_id, track_id)
+            if identity in seen:
+                if track_id not in seen_ids:
+                    collapsed += 1
+                    seen_ids.add(track_id)
+                continue
+            seen.add(identity)
+            seen_ids.add(track_id)
+            unique.append_run(track_id, track_id + 1)
+        if counts is not None:
+            counts['identity'] += collapsed
+        return unique
+
+
+# Medienkatalog (SQLite, opt-in): eine Zeile je Mediendatei mit den Feldern des Sortierschlüssels,
+# Grundlage für Smart-Playlists, die per SQL-Bedingung definiert werden
+CATALOG_FILENAME = '.vlcplaylists-catalog.sqlite'
+CATALOG_VERSION = 1
+SMART_PLAYLISTS_FILENAME = 'SmartPlaylists.txt'
+SMART_PLAYLIST_SUFFIX = ' (Smart)'
+SMART_DEFAULT_ORDER = ('directory, kind, season, episode, number, base_name, part, '
+                       'CASE WHEN kind = 2 THEN coalesce(year, 9999) END, title_key, name')
+FILENAME_UNSAFE_PATTERN = re.compile(r'[<>:"/\\|?*]')
+ORDER_BY_PATTERN = re.compile(r'\s+ORDER\s+BY\s+', re.IGNORECASE)
+
+CATALOG_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS directories (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    directory_id INTEGER NOT NULL REFERENCES directories(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    kind INTEGER NOT NULL,
+    season INTEGER,
+    episode INTEGER,
+    number INTEGER,
+    base_name TEXT,
+    part INTEGER,
+    year INTEGER,
+    title_key TEXT,
+    title TEXT,
+    duration REAL,
+    track_number INTEGER,
+    UNIQUE (directory_id, name)
+);
+CREATE INDEX IF NOT EXISTS files_episode ON files (season, episode);
+CREATE INDEX IF NOT EXISTS files_year ON files (year);
+CREATE INDEX IF NOT EXISTS files_series ON files (base_name, part);
+CREATE TABLE IF NOT EXISTS storyline (
+    directory_id INTEGER NOT NULL REFERENCES directories(id) ON DELETE CASCADE,
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    entry TEXT NOT NULL,
+    PRIMARY KEY (directory_id, file_id)
+);
+CREATE INDEX IF NOT EXISTS storyline_file ON storyline (file_id);
+CREATE VIEW IF NOT EXISTS media AS
+    SELECT f.*, d.path AS directory,
+           (SELECT s.entry FROM storyline s JOIN directories sd ON sd.id = s.directory_id
+            WHERE s.file_id = f.id ORDER BY length(sd.path) DESC LIMIT 1) AS storyline,
+           (SELECT s.position FROM storyline s JOIN directories sd ON sd.id = s.directory_id
+            WHERE s.file_id = f.id ORDER BY length(sd.path) DESC LIMIT 1) AS storyline_position
+    FROM files f JOIN directories d ON d.id = f.directory_id;
+'''
+
+
+def catalog_fields(filename):
+    """
+    Zerlegt den Sortierschlüssel eines Dateinamens in die Katalog-Spalten
+    (kind, season, episode, number, base_name, part, year, title_key).
+    kind: 0 = S01E01, 1 = "01 - Titel", 2 = Film/Reihe. Das Jahr wird für alle Arten erfasst.
+    """
+    key = natural_sort_key(filename)
+    kind = key[0]
+    year_match = YEAR_PATTERN.search(os.path.splitext(filename)[0])
+    year = int(year_match.group(1)) if year_match else None
+    if kind == 0:
+        return (0, key[1], key[2], None, None, None, year, key[3])
+    if kind == 1:
+        return (1, None, None, key[1], None, None, year, key[2])
+    return (2, None, None, None, key[1], key[2], year, None)
+
+
+def parse_smart_playlists(lines):
+    """
+    Liest Smart-Playlist-Definitionen der Form "Titel: SQL-Bedingung [ORDER BY ...]".
+    Leere Zeilen und Zeilen mit # werden übersprungen. Gibt [(Titel, Bedingung), ...] zurück.
+    """
+    definitions = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        title, separator, condition = line.partition(':')
+        if separator and title.strip() and condition.strip():
+            definitions.append((title.strip(), condition.strip()))
+    return definitions
+
+
+class MediaCatalog:
+    """
+    Medienkatalog in SQLite (im Wurzelordner der Mediathek, Pfade relativ dazu).
+    
+    Tabellen: directories (path), files (Name, Größe, mtime, Felder des Sortierschlüssels,
+    Titel/Dauer/Tracknummer der Medien-Analyse) und storyline (Zuordnung zu Storyline-Einträgen).
+    Abfragen laufen über die Sicht media, die zusätzlich directory, storyline und
+    storyline_position (nächstgelegene Storyline.txt) enthält.
+    """
+    
+    def __init__(self, path):
+        import sqlite3
+        
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        tables = self.connection.execute("SELECT count(*) FROM sqlite_master WHERE type = 'table'").fetchone()[0]
+        if version != CATALOG_VERSION and tables:
+            # Anderes Schema: der Katalog wird aus dem nächsten Lauf neu aufgebaut
+            self.connection.executescript(
+                'DROP VIEW IF EXISTS media; DROP TABLE IF EXISTS storyline; '
+                'DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS directories;'
+            )
+            tables = 0
+        self.is_new = not tables
+        self.connection.executescript(CATALOG_SCHEMA)
+        self.connection.execute(f'PRAGMA user_version = {CATALOG_VERSION}')
+        self.connection.commit()
+    
+    def close(self):
+        self.connection.close()
+    
+    def sync(self, root, nodes, present, media_info):
+        """
+        Gleicht die Ordner nodes mit dem Katalog ab: neue Dateien und solche mit geänderter
+        Größe, mtime oder Medien-Analyse werden eingetragen, verschwundene entfernt.
+        Ordner, deren relativer Pfad nicht in present liegt, fallen samt Dateien heraus.
+        Gibt die Anzahl eingetragener und entfernter Dateien sowie der stat-Aufrufe zurück.
+        """
+        db = self.connection
+        removed = stats = 0
+        with db:
+            directory_ids = dict(db.execute('SELECT path, id FROM directories'))
+            for rel in set(directory_ids) - present:
+                directory_id = directory_ids.pop(rel)
+                removed += db.execute('SELECT count(*) FROM files WHERE directory_id = ?', (directory_id,)).fetchone()[0]
+                db.execute('DELETE FROM directories WHERE id = ?', (directory_id,))
+            
+            inserts = []
+            updates = []
+            deletes = []
+            for node in nodes:
+                rel = os.path.relpath(node.path, root)
+                if rel not in present:
+                    continue
+                directory_id = directory_ids.get(rel)
+                if directory_id is None:
+                    directory_id = db.execute('INSERT INTO directories (path) VALUES (?)', (rel,)).lastrowid
+                    directory_ids[rel] = directory_id
+                existing = {
+                    row[1]: row for row in db.execute(
+                        'SELECT id, name, size, mtime_ns, title, duration, track_number '
+                        'FROM files WHERE directory_id = ?', (directory_id,)
+                    )
+                }
+                for entry in node.media_entries:
+                    try:
+                        stats += 1
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    info = media_info.get(entry.path) or NO_TRACK_INFO
+                    row = existing.pop(entry.name, None)
+                    if row is not None and row[2:] == (stat.st_size, stat.st_mtime_ns, *info):
+                        continue
+                    values = (stat.st_size, stat.st_mtime_ns, *catalog_fields(entry.name), *info)
+                    if row is None:
+                        inserts.append((directory_id, entry.name, *values))
+                    else:
+                        updates.append((*values, row[0]))
+                deletes.extend((row[0],) for row in existing.values())
+            
+            db.executemany(
+                'INSERT INTO files (directory_id, name, size, mtime_ns, kind, season, episode, number, '
+                'base_name, part, year, title_key, title, duration, track_number) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', inserts
+            )
+            db.executemany(
+                'UPDATE files SET size = ?, mtime_ns = ?, kind = ?, season = ?, episode = ?, number = ?, '
+                'base_name = ?, part = ?, year = ?, title_key = ?, title = ?, duration = ?, track_number = ? '
+                'WHERE id = ?', updates
+            )
+            db.executemany('DELETE FROM files WHERE id = ?', deletes)
+        return len(inserts) + len(updates), removed + len(deletes), stats
+    
+    def replace_storylines(self, root, directories, assignments):
+        """
+        Ersetzt die Storyline-Zuordnungen der Ordner directories durch
+        assignments (Ordner -> [(Dateipfad, Position, Eintrag), ...]).
+        """
+        db = self.connection
+        with db:
+            directory_ids = dict(db.execute('SELECT path, id FROM directories'))
+            file_ids = {}  # Ordner-ID -> {Name: Datei-ID}
+            
+            def file_id(file_path):
+                directory_id = directory_ids.get(os.path.relpath(os.path.dirname(file_path), root))
+                if directory_id is None:
+                    return None
+                if directory_id not in file_ids:
+                    file_ids[directory_id] = dict(
+                        db.execute('SELECT name, id FROM files WHERE directory_id = ?', (directory_id,))
+                    )
+                return file_ids[directory_id].get(os.path.basename(file_path))
+            
+            for directory in directories:
+                directory_id = directory_ids.get(os.path.relpath(directory, root))
+                if directory_id is None:
+                    continue
+                db.execute('DELETE FROM storyline WHERE directory_id = ?', (directory_id,))
+                rows = []
+                for file_path, position, entry in assignments.get(directory, ()):
+                    target = file_id(file_path)
+                    if target is not None:
+                        rows.append((directory_id, target, position, entry))
+                db.executemany(
+                    'INSERT OR REPLACE INTO storyline (directory_id, file_id, position, entry) VALUES (?, ?, ?, ?)', rows
+                )
+    
+    def query(self, condition):
+        """
+        Dateien zur SQL-Bedingung über die Sicht media als (Ordner, Name, Titel, Dauer, Tracknummer).
+        Ohne eigenes ORDER BY gilt die natürliche Sortierung je Ordner. Die Abfrage läuft
+        schreibgeschützt (PRAGMA query_only).
+        """
+        parts = ORDER_BY_PATTERN.split(f' {condition}', maxsplit=1)
+        where = parts[0].strip()
+        order = parts[1].strip() if len(parts) > 1 else SMART_DEFAULT_ORDER
+        db = self.connection
+        db.execute('PRAGMA query_only = ON')
+        try:
+            return db.execute(
+                f'SELECT directory, name, title, duration, track_number FROM media '
+                f'WHERE {where or "1"} ORDER BY {order}'
+            ).fetchall()
+        finally:
+            db.execute('PRAGMA query_only = OFF')
+
+
+class RunMetrics:
+    """
+    Strukturierte Kennzahlen eines Laufs: Wandzeit je Phase, Zähler, I/O-Aufrufe
+    und die langsamsten Ordner. Darf aus Worker-Threads befüllt werden.
+    
+    Phasen: scan, delete, fingerprint, directories (Phase 1; storyline ist darin
+    enthalten), combined, parallel (Phase 1 und 2 mit jobs > 1), pipeline (Einlesen,
+    Phase 1 und 2 überlappend), reconcile, manifest sowie run für
+    create_playlists_recursively insgesamt.
+    """
+    
+    def __init__(self, top_count=METRICS_TOP_COUNT):
+        self.seconds = Counter()            # Phase -> Sekunden
+        self.counters = Counter()           # z.B. playlists_written, bytes_written, tracks_deduplicated
+        self.io = {}                        # listdir/stat-Aufrufe, am Ende aus io_stats übernommen
+        self.directory_seconds = Counter()  # Ordner -> Sekunden für eigene, Storyline- und kombinierte Playlist
+        self.formats = {}                   # Format -> Dateien, Bytes und Schreibzeit
+        self.top_count = top_count
+        self.memory = None                  # tracemalloc-Auswertung (optional)
+        self.pipeline = None                # PipelineStats (Pipeline-Modus)
+        self.profile_path = None            # cProfile-Ausgabe (optional)
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def phase(self, name):
+        """Misst die Wandzeit eines Abschnitts."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+    
+    def add_time(self, name, seconds):
+        with self._lock:
+            self.seconds[name] += seconds
+    
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+    
+    def add_directory_time(self, path, seconds):
+        with self._lock:
+            self.directory_seconds[path] += seconds
+    
+    def add_format_write(self, playlist_format, size, seconds):
+        with self._lock:
+            stats = self.formats.setdefault(playlist_format, {'files': 0, 'bytes': 0, 'seconds': 0.0})
+            stats['files'] += 1
+            stats['bytes'] += size
+            stats['seconds'] += seconds
+    
+    def record_memory(self):
+        """Übernimmt Spitzenwert und größte Verursacher aus dem laufenden tracemalloc."""
+        import tracemalloc
+        
+        current, peak = tracemalloc.get_traced_memory()
+        top = tracemalloc.take_snapshot().statistics('lineno')[:self.top_count]
+        self.memory = {
+            'current_bytes': current,
+            'peak_bytes': peak,
+            'top': [{'location': str(stat.traceback[0]), 'bytes': stat.size, 'count': stat.count} for stat in top],
+        }
+    
+    def slowest_directories(self):
+        return self.directory_seconds.most_common(self.top_count)
+    
+    def to_dict(self):
+        data = {
+            'seconds': {name: round(value, 4) for name, value in self.seconds.items()},
+            'counters': dict(self.counters),
+            'io': dict(self.io),
+            'slowest_directories': [
+                {'path': path, 'seconds': round(seconds, 4)} for path, seconds in self.slowest_directories()
+            ],
+            'formats': {
+                name: dict(stats, seconds=round(stats['seconds'], 4)) for name, stats in self.formats.items()
+            },
+        }
+        if self.memory is not None:
+            data['memory'] = self.memory
+        if self.pipeline is not None:
+            data['pipeline'] = self.pipeline.to_dict()
+        if self.profile_path:
+            data['profile'] = self.profile_path
+        return data
+    
+    def save(self, path):
+        """Exportiert die Kennzahlen als JSON."""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+    
+    def summary(self):
+        """Einzeilige Zusammenfassung für die Fortschrittsanzeige."""
+        phases = ', '.join(f'{name} {seconds:.2f} s' for name, seconds in self.seconds.items())
+        return f"Laufzeit je Phase: {phases}"
+    
+    def format_summary(self):
+        """Größe und Schreibzeit je Ausgabeformat für die Fortschrittsanzeige."""
+        return "Formate: " + ", ".join(
+            f"{name} {stats['files']} Dateien, {stats['bytes'] / 1024:.0f} KiB in {stats['seconds'] * 1000:.0f} ms"
+            for name, stats in self.formats.items()
+        )
+
+
+class PipelineStats:
+    """
+    Kennzahlen des Pipeline-Modus: Auslastung je Stufe (beschäftigte Worker-Zeit im Verhältnis
+    zu Wandzeit x Worker) und Tiefe der Warteschlangen vor den Stufen. Stufen: scan (Listings)
+    und write (Sortieren, Storyline-Abgleich, Serialisieren und Schreiben). Beschäftigte Zeit
+    darf aus Worker-Threads gemeldet werden, Stichproben nur aus dem aufrufenden Thread.
+    """
+    
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.workers = {}         # Stufe -> Anzahl Worker
+        self.busy = Counter()     # Stufe -> beschäftigte Sekunden aller Worker
+        self.seconds = {}         # Stufe -> Wandzeit seit Beginn der Pipeline
+        self.depths = {}          # Warteschlange -> [Maximum, Summe, Stichproben]
+        self.first_output = None  # Sekunden bis zur ersten geschriebenen Playlist
+        self._lock = threading.Lock()
+    
+    def add_busy(self, stage, seconds):
+        with self._lock:
+            self.busy[stage] += seconds
+    
+    def mark_output(self):
+        with self._lock:
+            if self.first_output is None:
+                self.first_output = time.perf_counter() - self.start
+    
+    def sample(self, queue, depth):
+        stats = self.depths.setdefault(queue, [0, 0, 0])
+        stats[0] = max(stats[0], depth)
+        stats[1] += depth
+        stats[2] += 1
+    
+    def finish(self, stage):
+        """Vermerkt das Ende einer Stufe."""
+        self.seconds[stage] = time.perf_counter() - self.start
+    
+    def utilization(self, stage):
+        capacity = self.seconds.get(stage, 0.0) * self.workers.get(stage, 1)
+        return self.busy[stage] / capacity if capacity > 0 else 0.0
+    
+    def to_dict(self):
+        return {
+            'first_output_seconds': None if self.first_output is None else round(self.first_output, 4),
+            'stages': {
+                stage: {
+                    'workers': workers,
+                    'seconds': round(self.seconds.get(stage, 0.0), 4),
+                    'busy_seconds': round(self.busy[stage], 4),
+                    'utilization': round(self.utilization(stage), 3),
+                }
+                for stage, workers in self.workers.items()
+            },
+            'queues': {
+                name: {'max': maximum, 'mean': round(total / samples, 2) if samples else 0.0}
+                for name, (maximum, total, samples) in self.depths.items()
+            },
+        }
+    
+    def summary(self):
+        """Einzeilige Zusammenfassung für die Fortschrittsanzeige."""
+        first = "keine" if self.first_output is None else f"nach {self.first_output:.2f} s"
+        stages = ', '.join(
+            f"{stage} {self.utilization(stage):.0%} ({workers} Worker, {self.seconds.get(stage, 0.0):.2f} s)"
+            for stage, workers in self.workers.items()
+        )
+        queues = ', '.join(
+            f"{name} max {maximum} (Ø {total / samples if samples else 0:.1f})"
+            for name, (maximum, total, samples) in self.depths.items()
+        )
+        return f"Pipeline: erste Playlist {first}; Auslastung {stages}; Warteschlangen {queues}"
+
+
+class BatchExecutor:
+    """
+    Sicht eines Wurzelordners auf den BatchScheduler mit der Schnittstelle von
+    ThreadPoolExecutor (submit, map, with-Block), PlaylistCreator._executor liefert das eine oder andere.
+    Das Verlassen des with-Blocks wartet wie shutdown(wait=True) auf die eigenen Aufgaben.
+    """
+    
+    def __init__(self, scheduler, key):
+        self.scheduler = scheduler
+        self.key = key
+        self._futures = set()
+    
+    def submit(self, fn, *args, **kwargs):
+        future = self.scheduler.submit(self.key, fn, *args, **kwargs)
+        self._futures.add(future)
+        return future
+    
+    def map(self, fn, *iterables):
+        futures = [self.submit(fn, *args) for args in zip(*iterables)]
+        return (future.result() for future in futures)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        from concurrent.futures import wait
+        wait(self._futures)
+        self._futures.clear()
+        return False
+
+
+class BatchScheduler:
+    """
+    Gemeinsamer Worker-Pool für Batch-Läufe über mehrere Wurzelordner.
+    
+    Jeder Wurzelordner reicht seine Aufgaben (Listings, Phase 1, kombinierte Playlists,
+    Medien-Analyse) über executor() ein. Der Scheduler startet höchstens workers Aufgaben
+    gleichzeitig und höchstens device_workers je Laufwerk (st_dev des Wurzelordners), damit
+    sich zwei Wurzeln auf derselben Platte nicht gegenseitig ausbremsen. Freie Worker gehen
+    reihum an die Wurzeln mit wartenden Aufgaben; nicht gestartete Aufgaben lassen sich abbrechen.
+    """
+    
+    def __init__(self, workers=BATCH_WORKERS, device_workers=BATCH_DEVICE_WORKERS):
+        from concurrent.futures import ThreadPoolExecutor
+        
+        self.workers = max(1, workers)
+        self.device_workers = max(1, device_workers)
+        self.devices = {}              # Schlüssel -> Laufwerk
+        self.tasks = Counter()         # Schlüssel -> gestartete Aufgaben
+        self.busy = Counter()          # Schlüssel -> Sekunden in Aufgaben
+        self.queued = Counter()        # Schlüssel -> Sekunden in der Warteschlange
+        self.device_peak = Counter()   # Laufwerk -> höchste Zahl gleichzeitiger Aufgaben
+        self.start = time.perf_counter()
+        self._pending = {}             # Schlüssel -> deque[(Future, Funktion, Argumente, Einreihzeit)]
+        self._order = deque()          # Reihum-Reihenfolge der Schlüssel
+        self._in_flight = Counter()    # Laufwerk -> laufende Aufgaben
+        self._running = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers)
+    
+    def register(self, key, root):
+        """Meldet einen Wurzelordner an; sein Laufwerk bestimmt die Obergrenze seiner Aufgaben."""
+        try:
+            device = os.stat(root).st_dev
+        except OSError:
+            device = None
+        with self._lock:
+            self.devices[key] = device
+            self._pending[key] = deque()
+            self._order.append(key)
+    
+    def executor(self, key):
+        return BatchExecutor(self, key)
+    
+    def submit(self, key, fn, *args, **kwargs):
+        from concurrent.futures import Future
+        
+        future = Future()
+        with self._lock:
+            self._pending[key].append((future, fn, args, kwargs, time.perf_counter()))
+            self._dispatch()
+        return future
+    
+    def _dispatch(self):
+        # Reihum je Wurzel eine Aufgabe starten, solange Worker und Laufwerke frei sind
+        started = True
+        while started and self._running < self.workers:
+            started = False
+            for _ in range(len(self._order)):
+                key = self._order[0]
+                self._order.rotate(-1)
+                pending = self._pending[key]
+                device = self.devices[key]
+                if not pending or self._in_flight[device] >= self.device_workers:
+                    continue
+                future, fn, args, kwargs, queued = pending.popleft()
+                started = True
+                if not future.set_running_or_notify_cancel():
+                    continue
+                self._in_flight[device] += 1
+                self._running += 1
+                self.device_peak[device] = max(self.device_peak[device], self._in_flight[device])
+                self.tasks[key] += 1
+                self.queued[key] += time.perf_counter() - queued
+                self._pool.submit(self._run, key, device, future, fn, args, kwargs)
+                if self._running >= self.workers:
+                    return
+    
+    def _run(self, key, device, future, fn, args, kwargs):
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            error = e
+        else:
+            error = None
+        with self._lock:
+            self.busy[key] += time.perf_counter() - start
+            self._in_flight[device] -= 1
+            self._running -= 1
+            self._dispatch()
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+    
+    def utilization(self):
+        capacity = (time.perf_counter() - self.start) * self.workers
+        return sum(self.busy.values()) / capacity if capacity > 0 else 0.0
+    
+    def to_dict(self):
+        return {
+            'workers': self.workers,
+            'device_workers': self.device_workers,
+            'utilization': round(self.utilization(), 3),
+            'devices': {
+                str(device): {
+                    'roots': sum(1 for other in self.devices.values() if other == device),
+                    'peak': self.device_peak[device],
+                }
+                for device in dict.fromkeys(self.devices.values())
+            },
+            'roots': {
+                key: {
+                    'tasks': self.tasks[key],
+                    'busy_seconds': round(self.busy[key], 3),
+                    'queued_seconds': round(self.queued[key], 3),
+                }
+                for key in self.devices
+            },
+        }
 
 
 class PlaylistCreator:
     def __init__(self, progress_callback=None):
         # Verwende normale Python-Booleans statt BooleanVar
         self.create_combined_playlists = True
+        self.nested_combined = False  # Kombinierte Playlists verweisen auf die Unterordner-Playlists statt deren Tracks zu kopieren
         self.create_storyline_playlists = True
         self.save_in_parent_dir = True
         self.progress_callback = progress_callback  # Callback für Fortschrittsanzeige
+        self.library_index = None  # Gemeinsamer Verzeichnis-Index für alle Phasen eines Laufs
+        self.io_stats = Counter()  # Gezählte listdir/stat-Aufrufe
+        self.incremental = False  # Nur geänderte Ordner neu erzeugen (Manifest im Wurzelordner)
+        self.jobs = 1  # Anzahl paralleler Worker (1 = seriell wie bisher)
+        self.scan_workers = 1  # Gleichzeitige Verzeichnis-Listings beim Einlesen (1 = seriell wie bisher)
+        self.scan_workers_by_mount = {}  # Pfad eines Laufwerks/Mounts -> eigene Obergrenze (z.B. für SMB/NFS)
+        self.ignore_patterns = []  # Zusätzliche Ignorier-Muster (wie Zeilen in .playlistignore)
+        self.ignore_rules = None  # IgnoreRules der zuletzt eingelesenen Mediathek
+        self.keep_index = False  # Watch-Modus: Index und Manifest bleiben über Läufe hinweg erhalten
+        self.pipeline = False  # Opt-in: Einlesen und Schreiben überlappen (nur vollständige Läufe)
+        self._pipeline_delete = False  # delete_old_playlists hat das Löschen an die Pipeline übergeben
+        self.reconcile = False  # Abgleich: nur geänderte Playlists schreiben, veraltete erst am Ende löschen
+        self.playlist_formats = DEFAULT_PLAYLIST_FORMATS  # Ausgabeformate; das erste bestimmt die Kombinations-Logik
+        self.probe_media = False  # Opt-in: Titel, Dauer und Tracknummer aus den Mediendateien lesen
+        self._probe_cache = None  # Relativer Pfad -> [Größe, mtime_ns, Titel, Dauer, Tracknummer]
+        self._probe_cache_dirty = False
+        self._media_info = {}  # Pfad -> (Titel, Dauer, Tracknummer) für die Tracks dieses Laufs
+        self.track_store = None  # TrackStore des laufenden Laufs
+        self.dedup = DEFAULT_DEDUP_MODE  # Duplikate in kombinierten Playlists: path, inode oder content
+        self._content_keys = {}  # Pfad -> ('content', Größe, Digest) für Dateien mit gleich großen Gegenstücken
+        self.use_catalog = False  # Opt-in: Medienkatalog (SQLite) pflegen und Smart-Playlists erstellen
+        self.smart_playlists = []  # Zusätzliche Smart-Playlist-Definitionen [(Titel, Bedingung), ...]
+        self.catalog = None  # MediaCatalog des laufenden Laufs (Watch-Modus: über Läufe hinweg geöffnet)
+        self._storyline_assignments = {}  # Ordner -> [(Dateipfad, Position, Eintrag)] für den Katalog
+        self.reconcile_stats = Counter()  # geschrieben/unverändert/gelöscht und Bytes im Abgleich-Modus
+        self._reconcile_candidates = set()  # Vor dem Lauf vorhandene Playlists (Abgleich-Modus)
+        self._deferred_writes = {}  # Ordner -> zurückgestellte eigene Playlist (Abgleich-Modus)
+        self._stats_lock = threading.Lock()
+        self.metrics = None  # RunMetrics des laufenden Laufs
+        self.profile_path = None  # Opt-in: cProfile-Ausgabe für create_playlists_recursively
+        self.scheduler = None  # Batch-Modus: gemeinsamer BatchScheduler statt eigener Worker-Pools
+        self.scheduler_key = None
+        self.trace_memory = False  # Opt-in: Speicherverbrauch per tracemalloc aufzeichnen
+        self._progress_lock = threading.Lock()
+        self.manifest = None  # Manifest des letzten inkrementellen Laufs
+        self._outputs = {}  # Verzeichnis -> in diesem Lauf geschriebene Playlists
+        self._playlist_tracks = {}  # Playlist-Pfad -> TrackList (für kombinierte Playlists)
         
+    def _metrics(self):
+        """Kennzahlen des laufenden Laufs (werden bei Bedarf angelegt)."""
+        if self.metrics is None:
+            self.metrics = RunMetrics()
+        return self.metrics
+    
     def update_progress(self, message, current=None, total=None):
-        """Aktualisiert die Fortschrittsanzeige, wenn Callback vorhanden."""
+        """Aktualisiert die Fortschrittsanzeige, wenn Callback vorhanden (auch aus Worker-Threads)."""
         if self.progress_callback:
-            self.progress_callback(message, current, total)
+            with self._progress_lock:
+                self.progress_callback(message, current, total)
+    
+    def robust_natural_sort_key(self, s):
+        """
+        Robuste natürliche Sortierung für alle Dateinamen-Formate.
+        """
+        # Wenn es eine URL ist, extrahiere den Dateinamen
+        if isinstance(s, str) and s.startswith('file:///'):
+            filename = os.path.basename(file_url_to_path(s))
+        else:
+            filename = str(s)
+        return natural_sort_key(filename)
+    
+    def extract_sort_key_from_path(self, filepath):
+        """
+        Extrahiert Sortierschlüssel aus einem Dateipfad.
+        """
+        if filepath.startswith('file:///'):
+            full_path = file_url_to_path(filepath)
+        else:
+            full_path = filepath
+        
+        # Get sort key from filename
+        sort_key = natural_sort_key(os.path.basename(full_path))
+        
+        # Für bessere Gruppierung: füge Verzeichnispfad hinzu (ohne Dateiname)
+        dir_path = os.path.dirname(full_path)
+        
+        # Rückgabe: Sortierschlüssel + Verzeichnispfad für stabile Sortierung
+        return (*sort_key, dir_path.lower())
+    
+    def scan_library(self, directory):
+        """
+        Liest den gesamten Verzeichnisbaum mit genau einem os.scandir pro Ordner ein.
+        Mediendateien, vorhandene Playlists und Storyline.txt werden im Index vermerkt.
+        """
+        self.io_stats = Counter()
+        index = self._new_index(directory)
+        metrics = self._metrics()
+        start = time.perf_counter()
+        with metrics.phase('scan'):
+            self._crawl(index, [index.root_node])
+        elapsed = time.perf_counter() - start
+        
+        self.library_index = index
+        rate = len(index.nodes) / elapsed if elapsed > 0 else 0.0
+        metrics.counters['scan_directories_per_second'] = round(rate)
+        parallel = f", bis zu {self._scan_limit(directory)} parallel" if self._crawls_in_parallel() else ""
+        self.update_progress(
+            f"Verzeichnisindex erstellt: {len(index.nodes)} Ordner, {self.io_stats['listdir']} Verzeichnis-Listings "
+            f"({rate:.0f} Ordner/s{parallel})"
+        )
+        self._report_exclusions(index)
+        return index
+    
+    def load_ignore_rules(self, directory):
+        """
+        Ignorier-Regeln für die Mediathek directory: DEFAULT_IGNORE_PATTERNS, .playlistignore
+        im Wurzelordner und self.ignore_patterns. Ungültige Muster werden gemeldet und übergangen.
+        """
+        patterns = list(DEFAULT_IGNORE_PATTERNS)
+        try:
+            with open(os.path.join(directory, IGNORE_FILENAME), 'r', encoding='utf-8') as f:
+                patterns += parse_ignore_rules(f)
+        except OSError:
+            pass
+        rules = IgnoreRules(patterns + list(self.ignore_patterns))
+        for pattern, error in rules.invalid:
+            self.update_progress(f"Ungültiges Muster in {IGNORE_FILENAME} übergangen: {pattern} ({error})")
+        return rules
+    
+    def _new_index(self, directory):
+        """Leerer Index für die Mediathek directory; lädt deren Ignorier-Regeln neu."""
+        self.ignore_rules = self.load_ignore_rules(directory)
+        return LibraryIndex(directory, self.ignore_rules)
+    
+    def _report_exclusions(self, index):
+        """Meldet, wie viele Ordner und Einträge ignoriert bzw. übersprungen wurden."""
+        metrics = self._metrics()
+        pruned = sum(1 for node in index.nodes.values() if node.pruned and not node.parent.pruned)
+        metrics.counters['ignored_directories'] = index.ignored['directories']
+        metrics.counters['ignored_files'] = index.ignored['files']
+        metrics.counters['pruned_directories'] = pruned
+        if index.ignored or pruned:
+            self.update_progress(
+                f"Ausgeschlossen: {index.ignored['directories']} Ordner und {index.ignored['files']} Dateien "
+                f"per Ignorier-Regeln nicht eingelesen, {pruned} Ordner übersprungen (extras, bonus, ...)"
+            )
+    
+    def _executor(self, max_workers):
+        """Worker-Pool für parallele Aufgaben: eigener ThreadPoolExecutor, im Batch-Modus der gemeinsame."""
+        if self.scheduler is not None:
+            return self.scheduler.executor(self.scheduler_key)
+        from concurrent.futures import ThreadPoolExecutor
+        return ThreadPoolExecutor(max_workers=max_workers)
+    
+    def _crawls_in_parallel(self):
+        return self.scan_workers > 1 or bool(self.scan_workers_by_mount)
+    
+    def _scan_mount(self, path):
+        """Konfigurierter Mount, unter dem path liegt (längstes passendes Präfix), sonst None."""
+        if not self.scan_workers_by_mount:
+            return None
+        path = os.path.normcase(os.path.abspath(path))
+        best, best_length = None, -1
+        for mount in self.scan_workers_by_mount:
+            prefix = os.path.normcase(os.path.abspath(mount))
+            if (path == prefix or path.startswith(os.path.join(prefix, ''))) and len(prefix) > best_length:
+                best, best_length = mount, len(prefix)
+        return best
+    
+    def _scan_limit(self, path):
+        """Obergrenze gleichzeitiger Verzeichnis-Listings für path."""
+        mount = self._scan_mount(path)
+        limit = self.scan_workers_by_mount[mount] if mount is not None else self.scan_workers
+        return max(1, limit)
+    
+    def _crawl(self, index, starts):
+        """
+        Liest die Ordner starts samt allen Unterordnern (ohne Symlink-Ordner) in den Index ein
+        und gibt die eingelesenen Knoten zurück.
+        
+        Parallel (scan_workers > 1 oder scan_workers_by_mount) holen Worker-Threads die
+        os.scandir-Ergebnisse aus einer gemeinsamen Warteschlange je Mount; jeder freie Worker
+        übernimmt den nächsten offenen Ordner, so verteilen sich die Teilbäume von selbst.
+        Je Mount sind höchstens _scan_limit Listings gleichzeitig unterwegs. Der Index wird nur
+        im aufrufenden Thread verändert; da jeder Knoten seine Unterordner in Listing-Reihenfolge
+        führt, ist die Durchlauf-Reihenfolge dieselbe wie beim seriellen Einlesen (wie os.walk).
+        """
+        scanned = list(self._iter_crawl(index, starts))
+        if not self._crawls_in_parallel():
+            return scanned
+        return [node for start in starts for node in walk_nodes(start)]
+    
+    def _iter_crawl(self, index, starts, stats=None):
+        """
+        Wie _crawl, liefert aber jeden Knoten, sobald sein Listing im Index steht (Pipeline-Modus).
+        Der Aufrufer darf zwischen zwei Knoten arbeiten; der Index wird weiterhin nur in seinem
+        Thread verändert. stats (PipelineStats) erhält Listing-Zeiten und die Zahl offener Ordner.
+        """
+        if not self._crawls_in_parallel():
+            stack = list(starts)
+            while stack:
+                node = stack.pop()
+                start = time.perf_counter()
+                self._scan_node(index, node)
+                stack.extend(child for child in node.children if not child.is_link)
+                if stats is not None:
+                    stats.add_busy('scan', time.perf_counter() - start)
+                    stats.sample('scan', len(stack))
+                yield node
+            return
+        
+        from concurrent.futures import wait, FIRST_COMPLETED
+        
+        pending = {}  # Mount -> offene Knoten (LIFO: Teilbäume werden in der Tiefe abgearbeitet)
+        limits = {}
+        in_flight = Counter()
+        
+        def enqueue(node):
+            mount = self._scan_mount(node.path)
+            if mount not in limits:
+                limits[mount] = self._scan_limit(node.path)
+            pending.setdefault(mount, deque()).append(node)
+        
+        for node in starts:
+            enqueue(node)
+        
+        def list_directory(path):
+            start = time.perf_counter()
+            entries = self._list_directory(path, True)
+            if stats is not None:
+                stats.add_busy('scan', time.perf_counter() - start)
+            return entries
+        
+        max_workers = max(1, self.scan_workers) + sum(self.scan_workers_by_mount.values())
+        with self._executor(max_workers) as executor:
+            running = {}
+            
+            def submit_pending():
+                for mount, nodes in pending.items():
+                    while nodes and in_flight[mount] < limits[mount]:
+                        node = nodes.pop()
+                        in_flight[mount] += 1
+                        running[executor.submit(list_directory, node.path)] = (node, mount)
+            
+            try:
+                submit_pending()
+                while running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        node, mount = running.pop(future)
+                        in_flight[mount] -= 1
+                        self.io_stats['listdir'] += 1
+                        entries = future.result()
+                        if entries is not None:
+                            self._add_entries(index, node, entries)
+                            for child in node.children:
+                                if not child.is_link:
+                                    enqueue(child)
+                        submit_pending()
+                        if stats is not None:
+                            stats.sample('scan', sum(len(nodes) for nodes in pending.values()))
+                        yield node
+            except BaseException:
+                for future in running:
+                    future.cancel()
+                raise
+    
+    def _list_directory(self, path, resolve_types=False):
+        """
+        os.scandir eines Ordners; None, wenn er nicht lesbar ist. Mit resolve_types (Worker-Threads)
+        wird der Typ jedes Eintrags schon hier abgefragt: ein eventuell nötiger stat-Aufruf fällt
+        dann im Worker an und DirEntry speichert das Ergebnis für _add_entries zwischen.
+        """
+        try:
+            with os.scandir(path) as it:
+                entries = list(it)
+        except OSError:
+            return None
+        if resolve_types:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        entry.is_symlink()
+                except OSError:
+                    pass
+        return entries
     
-    def robust_natural_sort_key(self, s):
+    def _scan_node(self, index, node):
+        """Liest einen einzelnen Ordner per os.scandir ein und hängt Unterordner an."""
+        self.io_stats['listdir'] += 1
+        entries = self._list_directory(node.path)
+        if entries is not None:
+            self._add_entries(index, node, entries)
+    
+    def _add_entries(self, index, node, entries):
         """
-        Robuste natürliche Sortierung für alle Dateinamen-Formate.
+        Vermerkt die Einträge eines Ordners im Index (Unterordner, Mediendateien, Playlists, Storyline).
+        Alle Durchläufe lesen über diese Methode ein; ignorierte Einträge kommen nicht in den Index.
         """
-        # Wenn es eine URL ist, extrahiere den Dateinamen
-        if isinstance(s, str) and s.startswith('file:///'):
-            path = s.replace('file:///', '')
-            path = unquote(path)
-            filename = os.path.basename(path)
+        rules = index.ignore_rules
+        for entry in entries:
+            node.entry_count += 1
+            name = entry.name
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            
+            if rules is not None and rules.ignores(name, is_dir):
+                index.ignored['directories' if is_dir else 'files'] += 1
+                continue
+            if is_dir:
+                index.add_child(node, name, is_link=entry.is_symlink())
+                continue
+            
+            if name.endswith(PLAYLIST_EXTENSIONS):
+                node.playlists.add(name)
+            if name.lower().endswith(MEDIA_EXTENSIONS):
+                if entry.is_file():
+                    node.media_files.append(name)
+                    node.media_entries.append(entry)
+            elif os.path.normcase(name) == os.path.normcase(STORYLINE_FILENAME):
+                node.storyline_entry = entry
+    
+    def rescan_directories(self, index, paths):
+        """
+        Liest die Ordner paths im bestehenden Index erneut ein (Watch-Modus).
+        Unveränderte Unterordner behalten ihren Teilbaum, neue Unterordner werden
+        vollständig eingelesen, verschwundene samt Teilbaum entfernt.
+        Gibt alle neu eingelesenen Knoten zurück.
+        """
+        rescanned = []
+        seen = set()
+        # Eltern vor Kindern, damit neu entdeckte Ordner nur einmal eingelesen werden
+        for path in sorted(paths, key=lambda p: p.count(os.sep)):
+            node = index.nodes.get(path)
+            if node is None or node.is_link or path in seen:
+                continue
+            
+            old_children = {child.name: child for child in node.children}
+            node.children = []
+            node.media_files = []
+            node.media_entries = []
+            node.playlists = set()
+            node.storyline_entry = None
+            node.entry_count = 0
+            self._scan_node(index, node)
+            seen.add(path)
+            rescanned.append(node)
+            
+            for i, child in enumerate(node.children):
+                old = old_children.pop(child.name, None)
+                if old is not None and old.is_link == child.is_link:
+                    node.children[i] = old
+                    index.nodes[old.path] = old
+                    continue
+                if old is not None:
+                    self._drop_subtree(index, old)
+                    index.nodes[child.path] = child
+                if child.is_link:
+                    continue
+                for new_node in self._crawl(index, [child]):
+                    seen.add(new_node.path)
+                    rescanned.append(new_node)
+            
+            for old in old_children.values():
+                self._drop_subtree(index, old)
+        return rescanned
+    
+    def _drop_subtree(self, index, node):
+        """Entfernt einen Knoten samt Teilbaum (auch Symlink-Ordner) aus dem Index."""
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if index.nodes.get(current.path) is current:
+                del index.nodes[current.path]
+            stack.extend(current.children)
+    
+    def get_library_index(self, directory):
+        """Gibt den Index für directory zurück und erstellt ihn nur, wenn noch keiner existiert."""
+        if self.library_index is not None and self.library_index.root == directory:
+            return self.library_index
+        return self.scan_library(directory)
+    
+    def _get_node(self, directory, recursive=True):
+        """
+        Liefert den Index-Knoten für directory. Außerhalb eines Laufs (kein Index)
+        wird nur das benötigte Verzeichnis bzw. der Teilbaum eingelesen.
+        """
+        if self.library_index is not None:
+            node = self.library_index.nodes.get(directory)
+            if node is not None:
+                return node
+        
+        rules = self.ignore_rules if self.ignore_rules is not None else self.load_ignore_rules(directory)
+        index = LibraryIndex(directory, rules)
+        if recursive:
+            self._crawl(index, [index.root_node])
         else:
-            filename = str(s)
+            self._scan_node(index, index.root_node)
+        return index.root_node
+    
+    def _playlist_exists(self, playlist_path):
+        """Prüft über den Index, ob eine Playlist existiert (stat nur außerhalb des Index)."""
+        primary_path = self._format_path(playlist_path, self.playlist_formats[0])
+        if self.library_index is not None:
+            node = self.library_index.nodes.get(os.path.dirname(playlist_path))
+            if node is not None:
+                return os.path.basename(primary_path) in node.playlists
+        # Zurückgestellte Playlists (Abgleich-Modus) liegen noch nicht auf der Platte
+        if any(deferred[0] == playlist_path for deferred in self._deferred_writes.values()):
+            return True
+        self.io_stats['stat'] += 1
+        return os.path.exists(primary_path)
+    
+    def _register_playlist(self, playlist_path, owner, tracks):
+        """
+        Vermerkt eine neu geschriebene Playlist im Index und als Ausgabe von owner.
+        Die Track-Liste bleibt für die kombinierten Playlists im Speicher.
+        """
+        paths = [self._format_path(playlist_path, playlist_format) for playlist_format in self.playlist_formats]
+        self._outputs.setdefault(owner, set()).update(paths)
+        if self.create_combined_playlists:
+            self._playlist_tracks[playlist_path] = tracks
+        if self.library_index is not None:
+            node = self.library_index.nodes.get(os.path.dirname(playlist_path))
+            if node is not None:
+                node.playlists.update(os.path.basename(path) for path in paths)
+    
+    def _format_path(self, playlist_path, playlist_format):
+        """Dateiname einer Playlist im angegebenen Format (intern werden Playlists über .xspf-Pfade geführt)."""
+        return f'{os.path.splitext(playlist_path)[0]}.{playlist_format}'
+    
+    def _write_playlist_file(self, playlist_filename, title, tracks, defer_owner=None, references=()):
+        """
+        Schreibt die Playlist in allen Ausgabeformaten aus derselben Track-Liste
+        (gepuffert über die Streaming-Writer, ohne erneutes Sortieren oder Kodieren).
+        Im Abgleich-Modus wird eine Datei nur bei geändertem Inhalt ersetzt; mit defer_owner
+        wartet die eigene Playlist eines Ordners, bis feststeht, ob die kombinierte sie überschreibt.
+        references sind (Titel, Playlist-Pfad) der Unterordner, die im verschachtelten Modus
+        nach den Tracks als Einträge im jeweils selben Format folgen.
+        """
+        if self.reconcile and defer_owner is not None:
+            self._deferred_writes[defer_owner] = (playlist_filename, title, tracks)
+            return
+        
+        metrics = self._metrics()
+        for playlist_format in self.playlist_formats:
+            path = self._format_path(playlist_filename, playlist_format)
+            writer = PLAYLIST_WRITERS[playlist_format]
+            entries = chain(tracks, self._reference_tracks(references, playlist_format)) if references else tracks
+            start = time.perf_counter()
+            if self.reconcile:
+                size = self._replace_if_changed(path, writer, title, entries)
+            else:
+                with open(path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+                    writer(f, title, entries)
+                    size = f.tell()
+                metrics.count('playlists_written')
+                metrics.count('bytes_written', size)
+            metrics.add_format_write(playlist_format, size, time.perf_counter() - start)
+    
+    def _reference_tracks(self, references, playlist_format):
+        """Einträge, die auf die Playlists der Unterordner im angegebenen Format verweisen (VLC lädt sie bei Bedarf)."""
+        for title, playlist_path in references:
+            path = self._format_path(playlist_path, playlist_format)
+            yield Track(path, path_to_file_url(path), title)
+    
+    def _replace_if_changed(self, playlist_filename, writer, title, tracks):
+        """
+        Abgleich: ersetzt die Datei atomar (temporäre Datei + Umbenennen), aber nur bei geändertem Inhalt.
+        Gibt die Größe des erzeugten Inhalts zurück.
+        """
+        buffer = io.StringIO()
+        writer(buffer, title, tracks)
+        text = buffer.getvalue()
+        if os.linesep != '\n':
+            text = text.replace('\n', os.linesep)  # wie beim Schreiben im Textmodus
+        data = text.encode('utf-8')
         
-        # Entferne Dateierweiterung
-        name_without_ext = os.path.splitext(filename)[0]
-        
-        # 1. Erkennung von Episodenformat: "1 - Titel" oder "01. Titel" oder "S01E01"
-        # Muster: Zahl am Anfang, gefolgt von Trennzeichen und Titel
-        episode_pattern = r'^(?:S(\d+)[Ee](\d+)|(\d+)[\.\s-]+)(.*)'
-        episode_match = re.match(episode_pattern, name_without_ext)
-        
-        if episode_match:
-            # Fall: S01E01 Format
-            if episode_match.group(1):
-                season = int(episode_match.group(1))
-                episode = int(episode_match.group(2))
-                title = episode_match.group(4).strip()
-                return (0, season, episode, title.lower())
-            # Fall: Nummer am Anfang Format
+        metrics = self._metrics()
+        unchanged = False
+        try:
+            if os.path.getsize(playlist_filename) == len(data):
+                with open(playlist_filename, 'rb') as f:
+                    unchanged = f.read() == data
+                metrics.count('playlists_parsed')
+        except OSError:
+            pass
+        
+        if not unchanged:
+            temp_path = playlist_filename + '.tmp'
+            try:
+                with open(temp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(temp_path, playlist_filename)
+            except OSError:
+                # Keine halbe .tmp-Datei in der Mediathek zurücklassen
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+                raise
+            metrics.count('playlists_written')
+            metrics.count('bytes_written', len(data))
+        
+        with self._stats_lock:
+            if unchanged:
+                self.reconcile_stats['unchanged'] += 1
+                self.reconcile_stats['bytes_avoided'] += len(data)
             else:
-                number = int(episode_match.group(3) or 0)
-                title = episode_match.group(4).strip()
-                return (1, number, title.lower())
-        
-        # 2. Erkennung von Filmreihen: "Titel 2 (Jahr)" oder "Titel: Teil II (Jahr)"
-        # Extrahiere Jahr
-        year_match = re.search(r'\((\d{4})\)', name_without_ext)
-        year = int(year_match.group(1)) if year_match else 9999  # 9999 für Filme ohne Jahr
-        
-        # Entferne Jahr aus dem Namen
-        name_without_year = re.sub(r'\s*\(\d{4}\)', '', name_without_ext)
-        
-        # Suche nach Teilnummer (arabisch oder römisch)
-        # Arabische Zahlen am Ende oder nach Leerzeichen
-        arabic_match = re.search(r'(\d+)$', name_without_year.strip())
-        
-        # Römische Zahlen
-        roman_numerals = {
-            'I': 1, 'II': 2, 'III': 3, 'IV': 4, 'V': 5,
-            'VI': 6, 'VII': 7, 'VIII': 8, 'IX': 9, 'X': 10,
-            'XI': 11, 'XII': 12, 'XIII': 13, 'XIV': 14, 'XV': 15
+                self.reconcile_stats['written'] += 1
+                self.reconcile_stats['bytes_written'] += len(data)
+        return len(data)
+    
+    def _flush_deferred_write(self, directory):
+        """Schreibt die zurückgestellte eigene Playlist eines Ordners (Abgleich-Modus)."""
+        deferred = self._deferred_writes.pop(directory, None)
+        if deferred is not None:
+            self._write_playlist_file(*deferred)
+    
+    def _finish_reconcile(self):
+        """Abgleich: schreibt Zurückgestelltes, löscht nicht mehr erzeugte Playlists und meldet die Bilanz."""
+        for directory in list(self._deferred_writes):
+            self._flush_deferred_write(directory)
+        
+        produced = {os.path.normpath(p) for paths in self._outputs.values() for p in paths}
+        for playlist_path in sorted(self._reconcile_candidates):
+            if os.path.normpath(playlist_path) in produced:
+                continue
+            try:
+                os.remove(playlist_path)
+                self.reconcile_stats['deleted'] += 1
+            except OSError:
+                pass
+        self._reconcile_candidates = set()
+        
+        stats = self.reconcile_stats
+        self.update_progress(
+            f"Abgleich: {stats['written']} Playlists geschrieben, {stats['unchanged']} unverändert, "
+            f"{stats['deleted']} gelöscht, {stats['bytes_avoided'] / 1024:.0f} KiB Schreibzugriffe vermieden"
+        )
+    
+    def _track_store(self):
+        """TrackStore des laufenden Laufs (wird bei Bedarf angelegt)."""
+        if self.track_store is None:
+            self.track_store = self._new_track_store()
+        return self.track_store
+    
+    def _new_track_store(self):
+        # Identitäten braucht nur die Duplikaterkennung kombinierter Playlists mit kopierten Tracks
+        identify = None
+        if self.dedup != 'path' and self.create_combined_playlists and not self.nested_combined:
+            identify = self._file_identities
+        return TrackStore(self._media_info, identify)
+    
+    def _file_identities(self, directory, names):
+        """
+        Identitäten der Dateien names eines Ordners für die Duplikaterkennung: (st_dev, st_ino),
+        wobei die Inode-Nummer aus dem Listing kommt (os.DirEntry.inode, unter POSIX ohne
+        stat-Aufruf) und st_dev aus einem stat des Ordners; Symlinks werden aufgelöst.
+        Dateien mit Inhalts-Kennung (dedup = 'content') werden über diese erkannt.
+        """
+        node = self.library_index.nodes.get(directory) if self.library_index is not None else None
+        if node is None:
+            return None
+        try:
+            self.io_stats['stat'] += 1
+            device = os.stat(directory).st_dev
+        except OSError:
+            return None
+        entries = dict(zip(node.media_files, node.media_entries))
+        content_keys = self._content_keys
+        identities = []
+        for name in names:
+            entry = entries.get(name)
+            identity = content_keys.get(entry.path) if entry is not None else None
+            if entry is not None and identity is None:
+                try:
+                    if entry.is_symlink():
+                        self.io_stats['stat'] += 1
+                        stat = entry.stat()
+                        identity = (stat.st_dev, stat.st_ino)
+                    elif entry.inode():
+                        identity = (device, entry.inode())
+                except OSError:
+                    pass
+            identities.append(identity)
+        return identities
+    
+    def load_hash_cache(self, directory):
+        """Lädt den Cache der Inhalts-Kennungen (relativer Pfad -> [Größe, mtime_ns, Digest])."""
+        try:
+            with open(os.path.join(directory, HASH_CACHE_FILENAME), 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(cache, dict) or cache.get('version') != HASH_CACHE_VERSION:
+            return {}
+        files = cache.get('files')
+        return files if isinstance(files, dict) else {}
+    
+    def save_hash_cache(self, directory, files):
+        """Schreibt den Cache der Inhalts-Kennungen atomar (temporäre Datei + Umbenennen)."""
+        cache_path = os.path.join(directory, HASH_CACHE_FILENAME)
+        temp_path = cache_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': HASH_CACHE_VERSION, 'files': files}, f, ensure_ascii=False)
+        os.replace(temp_path, cache_path)
+    
+    def hash_library(self, index):
+        """
+        Inhalts-Kennungen für dedup = 'content'. Gelesen werden nur Dateien, deren Größe bei
+        einer anderen Datei (anderer Inode) wieder vorkommt (leere Dateien zählen nie als
+        Kopien), je Inode einmal und nur in
+        Stichproben (sample_file_hash), in einem Worker-Pool. Unveränderte Dateien (Größe und
+        mtime) kommen aus dem Cache im Wurzelordner und werden nicht geöffnet.
+        """
+        by_size = {}
+        for node in index.walk(include_pruned=False):
+            for entry in node.media_entries:
+                try:
+                    self.io_stats['stat'] += 1
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                by_size.setdefault(stat.st_size, {}).setdefault((stat.st_dev, stat.st_ino), []).append(
+                    (entry.path, stat.st_mtime_ns)
+                )
+        
+        cache = self.load_hash_cache(index.root)
+        digests = {}  # (st_dev, st_ino) -> Digest
+        seen = {}
+        misses = []   # (Inode, relativer Pfad, Pfad, Größe, mtime_ns)
+        by_size.pop(0, None)
+        for size, inodes in by_size.items():
+            if len(inodes) < 2:
+                continue
+            for inode, files in inodes.items():
+                path, mtime = files[0]
+                rel = os.path.relpath(path, index.root)
+                cached = cache.get(rel)
+                if cached and cached[0] == size and cached[1] == mtime:
+                    digests[inode] = cached[2]
+                    seen[rel] = cached
+                else:
+                    misses.append((inode, rel, path, size, mtime))
+        
+        bytes_read = 0
+        start = time.perf_counter()
+        if misses:
+            with self._executor(PROBE_WORKERS) as executor:
+                results = executor.map(lambda miss: sample_file_hash(miss[2], miss[3]), misses)
+                for (inode, rel, path, size, mtime), (digest, read) in zip(misses, results):
+                    bytes_read += read
+                    if digest is not None:
+                        digests[inode] = digest
+                        seen[rel] = [size, mtime, digest]
+        read_time = time.perf_counter() - start
+        
+        self._content_keys = {
+            path: ('content', size, digests[inode])
+            for size, inodes in by_size.items() if len(inodes) > 1
+            for inode, files in inodes.items() if inode in digests
+            for path, _ in files
         }
+        if seen != cache:
+            try:
+                self.save_hash_cache(index.root, seen)
+            except OSError as e:
+                self.update_progress(f"Cache des Inhaltsvergleichs konnte nicht gespeichert werden: {e}")
         
-        # Suche nach römischen Zahlen (mit oder ohne "Teil", "Part", etc.)
-        roman_match = None
-        for roman in roman_numerals:
-            if re.search(fr'\s*(?:Teil|Part|Teil\s+)?{roman}\s*$', name_without_year, re.IGNORECASE):
-                roman_match = roman
-                break
+        full_size = sum(miss[3] for miss in misses)
+        metrics = self._metrics()
+        metrics.count('hash_candidates', len(self._content_keys))
+        metrics.count('hash_cached', len(seen) - len(misses))
+        metrics.count('hash_read', len(misses))
+        metrics.count('hash_bytes_read', bytes_read)
+        metrics.count('hash_bytes_saved', full_size - bytes_read)
+        self.update_progress(
+            f"Inhaltsvergleich: {len(self._content_keys)} Dateien mit gleich großen Gegenstücken, "
+            f"{len(seen) - len(misses)} aus dem Cache, {len(misses)} per Stichprobe gelesen: "
+            f"{bytes_read / 2**20:.1f} MiB statt {full_size / 2**20:.1f} MiB in {read_time:.2f} s"
+        )
+    
+    def _directory_tracks(self, directory, media_files):
+        """Eigene Tracks eines Ordners als TrackList (ein zusammenhängender ID-Block)."""
+        store = self._track_store()
+        tracks = TrackList(store)
+        tracks.append_run(*store.block(directory, media_files))
+        return tracks
+    
+    def load_probe_cache(self, directory):
+        """
+        Lädt den Cache der Medien-Analyse (relative Pfade, daher auch nach Umzug der Mediathek gültig).
+        Gibt ein leeres Dict zurück, wenn keiner existiert oder er unlesbar ist.
+        """
+        cache_path = os.path.join(directory, PROBE_CACHE_FILENAME)
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(cache, dict) or cache.get('version') != PROBE_CACHE_VERSION:
+            return {}
+        files = cache.get('files')
+        return files if isinstance(files, dict) else {}
+    
+    def save_probe_cache(self, directory, files):
+        """Schreibt den Cache der Medien-Analyse atomar (temporäre Datei + Umbenennen)."""
+        cache_path = os.path.join(directory, PROBE_CACHE_FILENAME)
+        temp_path = cache_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': PROBE_CACHE_VERSION, 'files': files}, f, ensure_ascii=False)
+        os.replace(temp_path, cache_path)
+    
+    def probe_library(self, index, nodes=None):
+        """
+        Medien-Analyse: liest Titel, Dauer und Tracknummer aller Mediendateien (nur Kopf-/Endbereiche)
+        in einem Worker-Pool. Dateien mit unveränderter Größe und mtime kommen aus dem Cache und
+        werden nicht geöffnet. Mit nodes (Watch-Modus) werden nur diese Ordner geprüft.
+        """
+        if self._probe_cache is None:
+            self._probe_cache = self.load_probe_cache(index.root)
+        cache = self._probe_cache
+        seen = {}
+        misses = []  # (relativer Pfad, Pfad, Größe, mtime_ns)
+        for node in (index.walk() if nodes is None else nodes):
+            for entry in node.media_entries:
+                rel = os.path.relpath(entry.path, index.root)
+                try:
+                    self.io_stats['stat'] += 1
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                cached = cache.get(rel)
+                if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+                    seen[rel] = cached
+                    if any(value is not None for value in cached[2:]):
+                        self._media_info[entry.path] = tuple(cached[2:])
+                else:
+                    misses.append((rel, entry.path, stat.st_size, stat.st_mtime_ns))
+        
+        unknown = 0
+        start = time.perf_counter()
+        if misses:
+            with self._executor(PROBE_WORKERS) as executor:
+                results = executor.map(lambda miss: probe_media_file(miss[1], miss[2]), misses)
+                for (rel, path, size, mtime), info in zip(misses, results):
+                    seen[rel] = [size, mtime, *info]
+                    if any(value is not None for value in info):
+                        self._media_info[path] = info
+                    else:
+                        unknown += 1
+        read_time = time.perf_counter() - start
         
-        if arabic_match:
-            part_num = int(arabic_match.group(1))
-            base_name = re.sub(r'\s*\d+$', '', name_without_year).strip()
-        elif roman_match:
-            part_num = roman_numerals[roman_match]
-            base_name = re.sub(fr'\s*(?:Teil|Part|Teil\s+)?{roman_match}\s*$', '', name_without_year, flags=re.IGNORECASE).strip()
+        if nodes is None:
+            # Vollständiger Lauf: verschwundene Dateien fallen aus dem Cache
+            self._probe_cache_dirty = self._probe_cache_dirty or bool(misses) or len(seen) != len(cache)
+            self._probe_cache = seen
         else:
-            # Keine explizite Teilnummer -> Teil 1
-            part_num = 1
-            base_name = name_without_year.strip()
+            self._probe_cache_dirty = self._probe_cache_dirty or bool(misses)
+            cache.update(seen)
+        
+        metrics = self._metrics()
+        metrics.count('probe_cached', len(seen) - len(misses))
+        metrics.count('probe_read', len(misses))
+        metrics.count('probe_unknown', unknown)
+        rate = len(misses) / read_time if read_time > 0 else 0
+        self.update_progress(
+            f"Medien-Analyse: {len(seen)} Dateien, {len(seen) - len(misses)} aus dem Cache, "
+            f"{len(misses)} gelesen ({unknown} ohne Angaben) in {read_time:.2f} s ({rate:.0f} Dateien/s)"
+        )
+    
+    def _open_catalog(self, directory):
+        """Öffnet den Medienkatalog im Wurzelordner (bzw. gibt den bereits geöffneten zurück)."""
+        catalog_path = os.path.join(directory, CATALOG_FILENAME)
+        if self.catalog is not None and self.catalog.path != catalog_path:
+            self.close_catalog()
+        if self.catalog is None:
+            self.catalog = MediaCatalog(catalog_path)
+        return self.catalog
+    
+    def close_catalog(self):
+        if self.catalog is not None:
+            self.catalog.close()
+            self.catalog = None
+    
+    def update_catalog(self, index, changed=None, processed=()):
+        """
+        Gleicht den Medienkatalog mit dem Index ab (mit changed nur diese Ordner, verschwundene
+        Ordner immer) und übernimmt die Storyline-Zuordnungen der in diesem Lauf verarbeiteten Ordner.
+        Erfasst werden dieselben Dateien wie in den Playlists (ohne extras, bonus, ...).
+        """
+        catalog = self._open_catalog(index.root)
+        present = {
+            os.path.relpath(node.path, index.root) for node in index.walk(include_pruned=False) if node.media_files
+        }
+        nodes = index.walk(include_pruned=False) if changed is None else changed
+        written, removed, stats = catalog.sync(index.root, nodes, present, self._media_info)
+        if not self.probe_media:
+            self.io_stats['stat'] += stats  # nach der Medien-Analyse liefert DirEntry das stat-Ergebnis aus dem Cache
+        catalog.replace_storylines(index.root, processed, self._storyline_assignments)
+        self._storyline_assignments = {}
         
-        # Entferne Doppelpunkte und andere Trennzeichen vom Anfang des Basisnamens
-        base_name = re.sub(r'^[:\-\s]+', '', base_name)
+        metrics = self._metrics()
+        metrics.count('catalog_written', written)
+        metrics.count('catalog_removed', removed)
+        self.update_progress(
+            f"Medienkatalog: {len(present)} Ordner, {written} Dateien eingetragen oder aktualisiert, {removed} entfernt"
+        )
+    
+    def load_smart_playlists(self, directory):
+        """Smart-Playlist-Definitionen aus SmartPlaylists.txt im Wurzelordner und self.smart_playlists."""
+        definitions = []
+        try:
+            with open(os.path.join(directory, SMART_PLAYLISTS_FILENAME), 'r', encoding='utf-8') as f:
+                definitions = parse_smart_playlists(f)
+        except OSError:
+            pass
+        return definitions + list(self.smart_playlists)
+    
+    def create_smart_playlists(self, directory):
+        """
+        Schreibt die Smart-Playlists ("Titel (Smart).xspf" im Wurzelordner) allein aus dem Katalog,
+        ohne das Dateisystem abzufragen. Titel, Dauer und Tracknummer kommen ebenfalls aus dem Katalog.
+        Gibt (Anzahl Playlists, Anzahl Dateien) zurück.
+        """
+        import sqlite3
         
-        return (2, base_name.lower(), part_num, year)
+        catalog = self._open_catalog(directory)
+        playlists = 0
+        files = 0
+        for title, condition in self.load_smart_playlists(directory):
+            start = time.perf_counter()
+            try:
+                rows = catalog.query(condition)
+            except sqlite3.Error as e:
+                self.update_progress(f"Smart-Playlist '{title}' übersprungen: {e}")
+                continue
+            query_time = time.perf_counter() - start
+            if not rows:
+                self.update_progress(f"Smart-Playlist '{title}': keine passenden Dateien")
+                continue
+            
+            tracks = []
+            for directory_rel, name, track_title, duration, number in rows:
+                path = os.path.join(directory, name) if directory_rel == '.' else os.path.join(directory, directory_rel, name)
+                tracks.append(Track(path, path_to_file_url(path), track_title, duration, number))
+            
+            playlist_filename = os.path.join(
+                directory, f'{FILENAME_UNSAFE_PATTERN.sub("_", title)}{SMART_PLAYLIST_SUFFIX}.xspf'
+            )
+            self._write_playlist_file(playlist_filename, title, tracks)
+            self._register_playlist(playlist_filename, directory, tracks)
+            playlists += 1
+            files += len(tracks)
+            self.update_progress(
+                f"Smart-Playlist erstellt: {os.path.basename(playlist_filename)} "
+                f"({len(tracks)} Dateien, Abfrage {query_time * 1000:.1f} ms)"
+            )
+        return playlists, files
     
-    def extract_sort_key_from_path(self, filepath):
+    def create_smart_playlists_from_catalog(self, directory):
         """
-        Extrahiert Sortierschlüssel aus einem Dateipfad.
+        Erstellt nur die Smart-Playlists aus einem vorhandenen Katalog (ohne Einlesen der Mediathek).
+        Gibt (Anzahl Playlists, Anzahl Dateien) zurück.
         """
-        if filepath.startswith('file:///'):
-            path = filepath.replace('file:///', '')
-            path = unquote(path)
-            filename = os.path.basename(path)
-            full_path = path
+        if not os.path.exists(os.path.join(directory, CATALOG_FILENAME)):
+            raise FileNotFoundError(
+                f"Kein Medienkatalog in {directory} – zuerst einen Lauf mit --catalog ausführen"
+            )
+        self.metrics = RunMetrics()
+        try:
+            with self.metrics.phase('smart'):
+                return self.create_smart_playlists(directory)
+        finally:
+            self.close_catalog()
+    
+    def validate_playlists(self, directory):
+        """
+        Prüfmodus: sucht in allen Playlists unter directory (.xspf, .m3u, .m3u8; auch ältere oder
+        von Hand gepflegte) tote, doppelte und nicht natürlich sortierte Einträge.
+        
+        Die Playlists werden als Datenstrom gelesen (iter_playlist_locations). Statt eines stat
+        je Eintrag werden die referenzierten Pfade nach Ordnern gruppiert und jeder Ordner genau
+        einmal gelistet (parallel mit scan_workers). Als nicht sortiert gelten Mediendateien, die
+        innerhalb eines Ordnerblocks vor ihrem Vorgänger einsortiert wären; Storyline-Playlists
+        sind davon ausgenommen. Gibt die Zusammenfassung als dict zurück.
+        """
+        self.metrics = RunMetrics()
+        index = self.scan_library(directory)
+        start = time.perf_counter()
+        
+        refs = {}                 # (Ordner, Name) -> Referenz-ID
+        ref_keys = []             # Referenz-ID -> (Ordner, Name)
+        ref_sort_keys = []        # Referenz-ID -> Sortierschlüssel (None: keine Mediendatei)
+        locations = {}            # file:///-URL -> Referenz-ID (kombinierte Playlists wiederholen sie)
+        playlists = []            # (Pfad, Referenz-IDs, doppelte, nicht sortierte, andere URLs, Fehler)
+        with self.metrics.phase('parse'):
+            for node in index.walk():
+                for name in sorted(node.playlists):
+                    playlist_path = os.path.join(node.path, name)
+                    check_order = os.path.splitext(name)[0].lower() != 'storyline'
+                    ids = array('I')
+                    seen = set()
+                    duplicates = out_of_order = remote = 0
+                    previous = None   # (Ordner, Sortierschlüssel) des vorigen Eintrags
+                    error = None
+                    try:
+                        for location in iter_playlist_locations(playlist_path):
+                            ref = locations.get(location)
+                            if ref is None:
+                                path = playlist_location_to_path(location, node.path)
+                                if path is None:
+                                    remote += 1
+                                    continue
+                                key = (os.path.dirname(path), os.path.basename(path))
+                                ref = refs.get(key)
+                                if ref is None:
+                                    ref = refs[key] = len(ref_keys)
+                                    ref_keys.append(key)
+                                    ref_sort_keys.append(
+                                        natural_sort_key(key[1]) if key[1].lower().endswith(MEDIA_EXTENSIONS)
+                                        else None
+                                    )
+                                if location.startswith('file://'):
+                                    locations[location] = ref
+                            ids.append(ref)
+                            if ref in seen:
+                                duplicates += 1
+                            seen.add(ref)
+                            sort_key = ref_sort_keys[ref]
+                            if check_order and sort_key is not None:
+                                folder = ref_keys[ref][0]
+                                if previous is not None and previous[0] == folder and sort_key < previous[1]:
+                                    out_of_order += 1
+                                previous = (folder, sort_key)
+                    except (OSError, SyntaxError) as e:  # ParseError ist ein SyntaxError
+                        error = str(e)
+                    playlists.append((playlist_path, ids, duplicates, out_of_order, remote, error))
+        
+        # Jeder referenzierte Ordner wird genau einmal gelistet
+        directories = list(dict.fromkeys(folder for folder, _ in ref_keys))
+        
+        def list_names(folder):
+            try:
+                with os.scandir(folder) as it:
+                    return {os.path.normcase(entry.name) for entry in it}
+            except OSError:
+                return None
+        
+        with self.metrics.phase('listing'):
+            with self._executor(max(1, self.scan_workers)) as executor:
+                listings = dict(zip(directories, executor.map(list_names, directories)))
+        self.io_stats['listdir'] += len(directories)
+        dead_refs = {
+            ref for ref, (folder, name) in enumerate(ref_keys)
+            if listings[folder] is None or os.path.normcase(name) not in listings[folder]
+        }
+        
+        totals = Counter()
+        problems = []
+        for playlist_path, ids, duplicates, out_of_order, remote, error in playlists:
+            dead = [ref for ref in ids if ref in dead_refs]
+            totals['playlists'] += 1
+            totals['entries'] += len(ids) + remote
+            totals['dead'] += len(dead)
+            totals['duplicates'] += duplicates
+            totals['out_of_order'] += out_of_order
+            totals['remote'] += remote
+            if not (dead or duplicates or out_of_order or error):
+                continue
+            totals['unreadable' if error else 'with_problems'] += 1
+            dead_paths = [os.path.join(*ref_keys[ref]) for ref in dict.fromkeys(dead)]
+            problem = {
+                'playlist': playlist_path,
+                'entries': len(ids) + remote,
+                'dead': len(dead),
+                'dead_examples': dead_paths[:VALIDATE_REPORT_LIMIT],
+                'duplicates': duplicates,
+                'out_of_order': out_of_order,
+            }
+            if error:
+                problem['error'] = error
+            problems.append(problem)
+            details = f"{len(dead)} tote, {duplicates} doppelte, {out_of_order} nicht sortierte Einträge"
+            if error:
+                details += f"; nicht vollständig lesbar: {error}"
+            self.update_progress(f"{os.path.relpath(playlist_path, directory)}: {details}")
+            for path in dead_paths[:VALIDATE_REPORT_LIMIT]:
+                self.update_progress(f"  fehlt: {path}")
+        
+        elapsed = time.perf_counter() - start
+        self.metrics.counters.update(totals)
+        self.metrics.counters['referenced_directories'] = len(directories)
+        self.update_progress(
+            f"Prüfung: {totals['playlists']} Playlists mit {totals['entries']} Einträgen, "
+            f"{totals['dead']} tote, {totals['duplicates']} doppelte und {totals['out_of_order']} "
+            f"nicht sortierte Einträge in {totals['with_problems'] + totals['unreadable']} Playlists; "
+            f"{len(directories)} Ordner je einmal gelistet statt je eines stat für {len(ref_keys)} Pfade "
+            f"({elapsed:.2f} s)"
+        )
+        return {
+            'playlists': totals['playlists'],
+            'entries': totals['entries'],
+            'dead': totals['dead'],
+            'duplicates': totals['duplicates'],
+            'out_of_order': totals['out_of_order'],
+            'remote': totals['remote'],
+            'unreadable': totals['unreadable'],
+            'directories': len(directories),
+            'problems': problems,
+        }
+    
+    def _tracks_for_playlist(self, directory, playlist_path):
+        """
+        Track-Liste der Playlist eines Ordners, ohne die Datei zu lesen: entweder
+        in diesem Lauf geschrieben oder (unveränderter Ordner) aus dem Index zusammengesetzt.
+        """
+        tracks = self._playlist_tracks.get(playlist_path)
+        if tracks is None:
+            tracks = self._compose_directory_tracks(self._get_node(directory))
+            self._playlist_tracks[playlist_path] = tracks
+        return tracks
+    
+    def _compose_directory_tracks(self, node):
+        """
+        Setzt den Inhalt der Playlist eines Ordners aus dem Index zusammen, so wie ihn
+        Phase 1 und die kombinierte Phase schreiben würden (eigene Dateien zuerst).
+        """
+        if node.media_files and not node.pruned:
+            all_tracks = self._directory_tracks(node.path, node.media_files)
         else:
-            filename = os.path.basename(filepath)
-            full_path = filepath
+            all_tracks = TrackList(self._track_store())
+        if not self.create_combined_playlists or self.nested_combined:
+            return all_tracks
         
-        # Get sort key from filename
-        sort_key = self.robust_natural_sort_key(filename)
+        for child in sorted(node.children, key=lambda c: c.name.lower()):
+            if self.save_in_parent_dir:
+                playlist_path = os.path.join(node.path, f'{child.name}.xspf')
+            else:
+                playlist_path = os.path.join(child.path, f'{child.name}.xspf')
+            if self._playlist_exists(playlist_path):
+                all_tracks.extend(self._tracks_for_playlist(child.path, playlist_path))
+        return all_tracks.deduplicated()
+    
+    def _unregister_playlist(self, playlist_path):
+        """Entfernt eine gelöschte Playlist aus dem Index."""
+        self._playlist_tracks.pop(playlist_path, None)
+        if self.library_index is not None:
+            node = self.library_index.nodes.get(os.path.dirname(playlist_path))
+            if node is not None:
+                node.playlists.discard(os.path.basename(playlist_path))
+    
+    def _options_fingerprint(self):
+        """Optionen, die den Inhalt bzw. Speicherort der Playlists bestimmen."""
+        return [self.create_combined_playlists, self.create_storyline_playlists, self.save_in_parent_dir,
+                list(self.playlist_formats), self.probe_media, self.nested_combined, self.dedup]
+    
+    def load_manifest(self, directory):
+        """
+        Lädt das Manifest des letzten inkrementellen Laufs.
+        Gibt None zurück, wenn keines existiert oder es zu anderen Optionen gehört.
+        """
+        manifest_path = os.path.join(directory, MANIFEST_FILENAME)
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
         
-        # Für bessere Gruppierung: füge Verzeichnispfad hinzu (ohne Dateiname)
-        dir_path = os.path.dirname(full_path) if 'full_path' in locals() else os.path.dirname(filepath)
+        if (not isinstance(manifest, dict)
+                or manifest.get('version') != MANIFEST_VERSION
+                or manifest.get('root') != directory
+                or manifest.get('options') != self._options_fingerprint()):
+            return None
+        return manifest
+    
+    def save_manifest(self, directory, dirs):
+        """Schreibt das Manifest atomar (temporäre Datei + Umbenennen) und gibt es zurück."""
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'root': directory,
+            'options': self._options_fingerprint(),
+            'dirs': dirs,
+        }
+        manifest_path = os.path.join(directory, MANIFEST_FILENAME)
+        temp_path = manifest_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, manifest_path)
+        return manifest
+    
+    def _directory_fingerprint(self, node, previous):
+        """
+        Fingerabdruck eines Ordners: Hash der sortierten Mediendateinamen und
+        mtime/Hash der Storyline.txt (die Datei wird nur bei geänderter mtime gelesen).
+        Mit --probe stehen Tags in den Playlists; dann zählen auch Größe und mtime jeder
+        Mediendatei (derselbe Schlüssel wie im Probe-Cache, aus den gecachten DirEntry-Daten).
+        """
+        if self.probe_media:
+            items = []
+            for name, entry in sorted(zip(node.media_files, node.media_entries), key=lambda item: item[0]):
+                try:
+                    self.io_stats['stat'] += 1
+                    stat = entry.stat()
+                    items.append(f'{name}/{stat.st_size}/{stat.st_mtime_ns}')
+                except OSError:
+                    items.append(name)
+        else:
+            items = sorted(node.media_files)
+        names = '\0'.join(items).encode('utf-8', 'surrogateescape')
+        fingerprint = {'media': hashlib.sha1(names).hexdigest(), 'storyline': None}
         
-        # Rückgabe: Sortierschlüssel + Verzeichnispfad für stabile Sortierung
-        return (*sort_key, dir_path.lower())
+        if node.storyline_entry is not None:
+            try:
+                self.io_stats['stat'] += 1
+                mtime = node.storyline_entry.stat().st_mtime_ns
+                old_storyline = previous.get('storyline') if previous else None
+                if old_storyline and old_storyline[0] == mtime:
+                    fingerprint['storyline'] = old_storyline
+                else:
+                    with open(node.storyline_entry.path, 'rb') as f:
+                        fingerprint['storyline'] = [mtime, hashlib.sha1(f.read()).hexdigest()]
+            except OSError:
+                pass
+        return fingerprint
+    
+    def _find_affected_directories(self, index, changed=None):
+        """
+        Vergleicht den Index mit dem Manifest. Betroffen sind geänderte, neue und
+        verschwundene Ordner sowie alle ihre Vorfahren (Storyline- und kombinierte Playlists).
+        Mit changed (Watch-Modus) werden nur diese Knoten neu bewertet, für alle
+        anderen gilt der Fingerabdruck aus dem Manifest (kein stat, kein Lesen).
+        Gibt None zurück, wenn kein passendes Manifest existiert (alles neu erzeugen).
+        """
+        if self.manifest is None or self.manifest.get('root') != index.root:
+            self.manifest = self.load_manifest(index.root)
+        old_dirs = self.manifest['dirs'] if self.manifest else {}
+        candidates = set(changed) if changed is not None else None
+        
+        self._fingerprints = {}  # Relativer Pfad -> (Knoten, Fingerabdruck)
+        self._new_dirs = []      # Ordner, die das Manifest noch nicht kennt
+        dirty = []
+        for node in index.walk():
+            rel = os.path.relpath(node.path, index.root)
+            previous = old_dirs.get(rel)
+            if candidates is not None and previous is not None and node not in candidates:
+                fingerprint = {'media': previous.get('media'), 'storyline': previous.get('storyline')}
+            else:
+                fingerprint = self._directory_fingerprint(node, previous)
+            self._fingerprints[rel] = (node, fingerprint)
+            if previous is None:
+                self._new_dirs.append(node)
+            if (previous is None
+                    or previous.get('media') != fingerprint['media']
+                    or previous.get('storyline') != fingerprint['storyline']):
+                dirty.append(node)
+        
+        self._removed_dirs = [rel for rel in old_dirs if rel not in self._fingerprints]
+        if self.manifest is None:
+            return None
+        
+        # Verschwundene Ordner machen ihren nächsten noch existierenden Vorfahren "dirty"
+        for rel in self._removed_dirs:
+            parent = os.path.dirname(rel) or '.'
+            while parent not in self._fingerprints and parent != '.':
+                parent = os.path.dirname(parent) or '.'
+            dirty.append(self._fingerprints[parent][0])
+        
+        affected = set()
+        for node in dirty:
+            while node is not None and node.path not in affected:
+                affected.add(node.path)
+                node = node.parent
+        return affected
+    
+    def _remove_stale_outputs(self, index, owners, include_removed=True):
+        """
+        Löscht Playlists, die die Ordner owners bzw. verschwundene Ordner im letzten Lauf
+        erzeugt haben und die in diesem Lauf (bisher) nicht erneut geschrieben wurden.
+        """
+        old_dirs = self.manifest['dirs']
+        removed = 0
+        candidates = [(os.path.relpath(owner, index.root), owner) for owner in owners]
+        if include_removed:
+            candidates += [(rel, None) for rel in self._removed_dirs]
+        for rel, owner in candidates:
+            produced = {os.path.normpath(p) for p in self._outputs.get(owner, ())}
+            for output in old_dirs.get(rel, {}).get('outputs', []):
+                playlist_path = os.path.normpath(os.path.join(index.root, output))
+                if playlist_path in produced:
+                    continue
+                try:
+                    os.remove(playlist_path)
+                    removed += 1
+                except OSError:
+                    pass
+                self._unregister_playlist(playlist_path)
+        return removed
+    
+    def _update_manifest(self, index, affected):
+        """Schreibt Fingerabdrücke und erzeugte Playlists aller Ordner ins Manifest."""
+        old_dirs = self.manifest['dirs'] if self.manifest else {}
+        dirs = {}
+        for rel, (node, fingerprint) in self._fingerprints.items():
+            if affected is None or node.path in affected:
+                outputs = sorted(os.path.relpath(p, index.root) for p in self._outputs.get(node.path, ()))
+            else:
+                outputs = old_dirs.get(rel, {}).get('outputs', [])
+            dirs[rel] = dict(fingerprint, outputs=outputs)
+        try:
+            self.manifest = self.save_manifest(index.root, dirs)
+        except OSError as e:
+            self.update_progress(f"Manifest konnte nicht gespeichert werden: {e}")
     
     def delete_old_playlists(self, directory):
         """
         Löscht alte Playlist-Dateien.
+        Im inkrementellen Modus bleiben sie erhalten, sofern ein passendes Manifest existiert.
         """
         deleted_count = 0
+        self._reconcile_candidates = set()
+        self.metrics = RunMetrics()  # Beginn eines neuen Laufs
+        
+        if self.incremental:
+            self.manifest = self.load_manifest(directory)
+            if self.manifest is not None:
+                self.update_progress("Inkrementeller Modus: vorhandene Playlists bleiben erhalten")
+                return deleted_count
+        
+        if self.reconcile:
+            # Die Dateien bleiben bis zum Abgleich am Ende stehen, der Index sieht sie bereits als gelöscht
+            index = self.get_library_index(directory)
+            with self.metrics.phase('delete'):
+                for node in index.walk():
+                    self._reconcile_candidates.update(os.path.join(node.path, file) for file in node.playlists)
+                    node.playlists.clear()
+            self.update_progress(
+                f"Abgleich-Modus: {len(self._reconcile_candidates)} vorhandene Playlists werden am Ende abgeglichen"
+            )
+            return deleted_count
+        
+        if self._uses_pipeline(directory):
+            # Jeder Ordner wird beim Einlesen geleert, bevor seine neuen Playlists entstehen
+            self._pipeline_delete = True
+            self.update_progress("Pipeline-Modus: alte Playlists werden beim Einlesen gelöscht")
+            return deleted_count
+        
         self.update_progress(f"Lösche alte Playlists in: {directory}")
         
-        for root, dirs, files in os.walk(directory):
-            for file in files:
-                if file.endswith('.xspf') or file.endswith('.m3u'):
-                    try:
-                        os.remove(os.path.join(root, file))
-                        deleted_count += 1
-                    except:
-                        pass
+        index = self.get_library_index(directory)
+        with self.metrics.phase('delete'):
+            for node in index.walk():
+                deleted_count += self._delete_node_playlists(node)
         
         self.update_progress(f"{deleted_count} alte Playlists gelöscht")
         return deleted_count
     
+    def _delete_node_playlists(self, node):
+        """Löscht alle im Index vermerkten .xspf/.m3u/.m3u8 Dateien eines Ordners."""
+        deleted_count = 0
+        for file in sorted(node.playlists):
+            try:
+                os.remove(os.path.join(node.path, file))
+                node.playlists.discard(file)
+                deleted_count += 1
+            except:
+                pass
+        return deleted_count
+    
     def create_playlist_for_directory(self, directory, playlist_name=None):
         """
         Erstellt eine Playlist für ein spezifisches Verzeichnis.
         """
-        media_files = []
-        
-        # Sammle alle Medien-Dateien im Verzeichnis
-        for item in os.listdir(directory):
-            item_path = os.path.join(directory, item)
-            if os.path.isfile(item_path) and item.lower().endswith(('.mp4', '.mp3', '.mkv', '.avi', '.flac', '.wav', '.m4a')):
-                media_files.append(item)
+        # Mediendateien des Verzeichnisses kommen aus dem Index (kein erneutes listdir/isfile)
+        media_files = list(self._get_node(directory, recursive=False).media_files)
         
         if not media_files:
             return 0
         
-        # Sortiere Dateien
-        media_files.sort(key=self.robust_natural_sort_key)
+        # Sortierte Dateien als ID-Block im TrackStore
+        tracks = self._directory_tracks(directory, media_files)
         
         # Erstelle Playlist
-        playlist = Element('playlist', {'version': '1', 'xmlns': 'http://xspf.org/ns/0/'})
-        title = SubElement(playlist, 'title')
-        
         if playlist_name:
-            title.text = playlist_name
+            title = playlist_name
         else:
-            title.text = os.path.basename(directory) if directory != '.' else 'Playlist'
-        
-        track_list = SubElement(playlist, 'trackList')
-        
-        for media_file in media_files:
-            track = SubElement(track_list, 'track')
-            location = SubElement(track, 'location')
-            file_path = os.path.join(directory, media_file).replace('\\', '/')
-            encoded_path = quote(file_path, safe=":/")
-            location.text = f'file:///{encoded_path}'
-        
-        xml_string = tostring(playlist, 'utf-8')
-        pretty_xml = minidom.parseString(xml_string).toprettyxml(indent='  ')
+            title = os.path.basename(directory) if directory != '.' else 'Playlist'
         
         # Bestimme, wo die Playlist gespeichert werden soll
         if self.save_in_parent_dir:
@@ -192,8 +3055,10 @@ class PlaylistCreator:
             else:
                 playlist_filename = os.path.join(directory, f'{os.path.basename(directory) if directory != "." else "Playlist"}.xspf')
         
-        with open(playlist_filename, 'w', encoding='utf-8') as f:
-            f.write(pretty_xml)
+        # Die kombinierte Playlist kann diese Datei später überschreiben (Abgleich: erst dann schreiben)
+        defer_owner = directory if self.create_combined_playlists else None
+        self._write_playlist_file(playlist_filename, title, tracks, defer_owner)
+        self._register_playlist(playlist_filename, directory, tracks)
         
         self.update_progress(f"Playlist erstellt: {os.path.basename(playlist_filename)} ({len(media_files)} Dateien)")
         return len(media_files)
@@ -207,7 +3072,8 @@ class PlaylistCreator:
         """
         self.update_progress(f"Erstelle kombinierte Playlist für: {os.path.basename(directory)}")
         
-        all_tracks = []
+        all_tracks = TrackList(self._track_store())
+        references = []  # Verschachtelter Modus: (Titel, Pfad) der Unterordner-Playlists
         
         # SCHRITT 1: Prüfe ob es eine eigene Playlist für dieses Verzeichnis gibt
         # (für Mediendateien die direkt im Genre-Ordner liegen)
@@ -218,19 +3084,9 @@ class PlaylistCreator:
             directory_playlist_path = os.path.join(directory, f'{os.path.basename(directory)}.xspf')
         
         # Wenn es eine Playlist für dieses Verzeichnis selbst gibt, füge deren Tracks ZUERST hinzu
-        if os.path.exists(directory_playlist_path):
-            try:
-                with open(directory_playlist_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    xml_tree = minidom.parseString(content)
-                    track_list = xml_tree.getElementsByTagName('trackList')[0]
-                    tracks = track_list.getElementsByTagName('track')
-                    
-                    for track in tracks:
-                        location = track.getElementsByTagName('location')[0]
-                        all_tracks.append(location.firstChild.data)
-            except:
-                pass
+        # (Track-Listen kommen aus dem Speicher, die geschriebene XSPF wird nicht erneut geparst)
+        if self._playlist_exists(directory_playlist_path):
+            all_tracks.extend(self._tracks_for_playlist(directory, directory_playlist_path))
         
         # SCHRITT 2: Sortiere die Unterverzeichnisse nach Namen (für konsistente Reihenfolge)
         if subdirs_with_playlists:
@@ -249,49 +3105,37 @@ class PlaylistCreator:
                 # Wenn im aktuellen Ordner gespeichert wird, suche Playlist im Unterordner
                 playlist_path = os.path.join(subdir, f'{os.path.basename(subdir)}.xspf')
             
-            if os.path.exists(playlist_path):
-                try:
-                    with open(playlist_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        xml_tree = minidom.parseString(content)
-                        track_list = xml_tree.getElementsByTagName('trackList')[0]
-                        tracks = track_list.getElementsByTagName('track')
-                        
-                        # Füge alle Tracks DIESER Playlist in der Original-Reihenfolge hinzu
-                        for track in tracks:
-                            location = track.getElementsByTagName('location')[0]
-                            all_tracks.append(location.firstChild.data)
-                except:
-                    continue
+            if not self._playlist_exists(playlist_path):
+                continue
+            if self.nested_combined:
+                # Verschachtelt: nur ein Verweis auf die Playlist des Unterordners (Größe O(Unterordner))
+                references.append((os.path.basename(subdir), playlist_path))
+            else:
+                # Füge alle Tracks DIESER Playlist in der Original-Reihenfolge hinzu
+                all_tracks.extend(self._tracks_for_playlist(subdir, playlist_path))
+            # Die Liste des Unterordners wird nur von diesem Elternordner gebraucht
+            self._playlist_tracks.pop(playlist_path, None)
         
-        if not all_tracks:
+        if not all_tracks and not references:
             return 0
         
         # WICHTIG: Entferne nur Duplikate, aber KEINE Neu-Sortierung!
-        # dict.fromkeys() behält die Einfüge-Reihenfolge bei (Python 3.7+)
-        unique_tracks = list(dict.fromkeys(all_tracks))
+        # Die Läufe der Unterordner werden übernommen, nicht kopiert (erstes Vorkommen bleibt)
+        counts = Counter()
+        unique_tracks = all_tracks.deduplicated(counts)
+        self._metrics().count('tracks_deduplicated', len(all_tracks) - len(unique_tracks))
+        if counts['identity']:
+            self._metrics().count('duplicates_collapsed', counts['identity'])
         
         # ENTFERNT: unique_tracks.sort(key=self.extract_sort_key_from_path)
         # Die Reihenfolge bleibt so wie sie aus den Playlists kommt!
         
         # Erstelle kombinierte Playlist
-        playlist = Element('playlist', {'version': '1', 'xmlns': 'http://xspf.org/ns/0/'})
-        title = SubElement(playlist, 'title')
         # Wenn kombinierte Playlists aktiv sind, KEIN "(Kombiniert)" im Namen
         if self.create_combined_playlists:
-            title.text = f'{os.path.basename(directory)}'
+            title = f'{os.path.basename(directory)}'
         else:
-            title.text = f'{os.path.basename(directory)} (Kombiniert)'
-        
-        track_list = SubElement(playlist, 'trackList')
-        
-        for track_path in unique_tracks:
-            track = SubElement(track_list, 'track')
-            location = SubElement(track, 'location')
-            location.text = track_path
-        
-        xml_string = tostring(playlist, 'utf-8')
-        pretty_xml = minidom.parseString(xml_string).toprettyxml(indent='  ')
+            title = f'{os.path.basename(directory)} (Kombiniert)'
         
         # Bestimme, wo die kombinierte Playlist gespeichert werden soll
         if self.save_in_parent_dir:
@@ -308,98 +3152,520 @@ class PlaylistCreator:
             if self.create_combined_playlists:
                 combined_playlist_filename = os.path.join(directory, f'{os.path.basename(directory)}.xspf')
             else:
-                combined_playlist_filename = os.path.join(directory, f'{os.path.basename(directory)} (Kombiniert).xspf')
+                combined_playlist_filename = os.path.join(directory, f'{os.path.basename(directory)} (Kombiniert).xspf')
+        
+        # Abgleich: ersetzt die zurückgestellte eigene Playlist am selben Pfad
+        deferred = self._deferred_writes.get(directory)
+        if deferred is not None and deferred[0] == combined_playlist_filename:
+            del self._deferred_writes[directory]
+        
+        self._write_playlist_file(combined_playlist_filename, title, unique_tracks, references=references)
+        self._register_playlist(combined_playlist_filename, directory, unique_tracks)
+        
+        if references:
+            self._metrics().count('playlists_referenced', len(references))
+            self.update_progress(
+                f"Kombinierte Playlist erstellt: {os.path.basename(combined_playlist_filename)} "
+                f"({len(unique_tracks)} Dateien, {len(references)} Unterordner-Playlists)"
+            )
+        else:
+            self.update_progress(f"Kombinierte Playlist erstellt: {os.path.basename(combined_playlist_filename)} ({len(unique_tracks)} Dateien)")
+        return len(unique_tracks) + len(references)
+    
+    def create_playlists_recursively(self, directory, changed=None):
+        """
+        Erstellt Playlists rekursiv für die gesamte Verzeichnisstruktur.
+        Im inkrementellen Modus nur für geänderte Ordner und deren Vorfahren;
+        changed schränkt dort die zu prüfenden Ordner auf neu eingelesene Knoten ein (Watch-Modus).
+        Gibt (Anzahl Playlists, Anzahl Dateien, RunMetrics) zurück. Mit profile_path bzw.
+        trace_memory wird der Lauf zusätzlich per cProfile bzw. tracemalloc aufgezeichnet.
+        """
+        metrics = self._metrics()
+        profiler = None
+        if self.profile_path:
+            import cProfile
+            profiler = cProfile.Profile()
+        tracing = False
+        if self.trace_memory:
+            import tracemalloc
+            tracing = not tracemalloc.is_tracing()
+            if tracing:
+                tracemalloc.start()
+        
+        try:
+            with metrics.phase('run'):
+                if profiler is not None:
+                    total_playlists, total_files = profiler.runcall(self._create_playlists, directory, changed)
+                else:
+                    total_playlists, total_files = self._create_playlists(directory, changed)
+        finally:
+            if profiler is not None:
+                profiler.dump_stats(self.profile_path)
+                metrics.profile_path = self.profile_path
+            if self.trace_memory:
+                metrics.record_memory()
+                if tracing:
+                    tracemalloc.stop()
+            metrics.io = dict(self.io_stats)
+            self.metrics = None  # Der nächste Lauf beginnt mit neuen Kennzahlen
+        
+        self.update_progress(metrics.summary())
+        slowest = metrics.slowest_directories()
+        if slowest:
+            self.update_progress("Langsamste Ordner: " + ", ".join(
+                f"{os.path.basename(path) or path} ({seconds * 1000:.0f} ms)" for path, seconds in slowest[:3]
+            ))
+        return total_playlists, total_files, metrics
+    
+    def _create_playlists(self, directory, changed):
+        """Ablauf von create_playlists_recursively; gibt (Anzahl Playlists, Anzahl Dateien) zurück."""
+        metrics = self._metrics()
+        total_playlists = 0
+        total_files = 0
+        self._outputs = {}
+        self._playlist_tracks = {}
+        self._deferred_writes = {}
+        self.reconcile_stats = Counter()
+        self.track_store = self._new_track_store()
+        self._content_keys = {}
+        self._storyline_assignments = {}
+        
+        # Ein einziger scandir-Durchlauf liefert alle Ordner mit Mediendateien.
+        # Übersprungene Ordner (extras, bonus, ...) sind im Index als "pruned" markiert.
+        pipelined = self._uses_pipeline(directory)
+        if pipelined:
+            with metrics.phase('pipeline'):
+                index, dirs_to_process, total_playlists, total_files = self._run_pipeline(directory)
+        else:
+            index = self.get_library_index(directory)
+            dirs_to_process = [node.path for node in index.walk(include_pruned=False) if node.media_files]
+        metrics.counters['directories_indexed'] = len(index.nodes)
+        
+        # Inkrementeller Modus: nur betroffene Ordner (None = alles neu erzeugen)
+        affected = None
+        if self.incremental:
+            with metrics.phase('fingerprint'):
+                affected = self._find_affected_directories(index, changed)
+            if affected is not None and self.use_catalog and self._open_catalog(index.root).is_new:
+                # Die Storyline-Zuordnungen entstehen beim Erzeugen der Playlists: einmal alles verarbeiten
+                self.update_progress("Medienkatalog neu angelegt: alle Ordner werden verarbeitet")
+                affected = None
+            if affected is not None:
+                unchanged = len(dirs_to_process)
+                dirs_to_process = [root for root in dirs_to_process if root in affected]
+                unchanged -= len(dirs_to_process)
+                self.update_progress(
+                    f"Inkrementeller Modus: {len(affected)} Ordner betroffen, "
+                    f"{unchanged} unveränderte Ordner übersprungen"
+                )
+                # Neue (z.B. umbenannte oder hineinkopierte) Ordner werden wie beim
+                # vollständigen Lauf zuerst von mitgebrachten Playlists befreit
+                foreign = sum(self._delete_node_playlists(node) for node in self._new_dirs)
+                if foreign:
+                    self.update_progress(f"{foreign} alte Playlists in neuen Ordnern gelöscht")
+        
+        # Medien-Analyse vor dem Schreiben: alle Formate übernehmen Titel, Dauer und Tracknummer
+        if self.probe_media and (affected is None or affected):
+            with metrics.phase('probe'):
+                self.probe_library(index, changed)
+        if self._dedups_by_content() and (affected is None or affected):
+            with metrics.phase('hash'):
+                self.hash_library(index)
+        
+        total_dirs = len(dirs_to_process)
+        if not pipelined:
+            self.update_progress(f"Starte Playlist-Erstellung in {directory}", 0, total_dirs)
+        
+        if pipelined:
+            # Einlesen, eigene und kombinierte Playlists liefen bereits überlappend
+            self.update_progress(metrics.pipeline.summary())
+        elif self.jobs > 1:
+            with metrics.phase('parallel'):
+                total_playlists, total_files = self._run_parallel(index, dirs_to_process, affected)
+        else:
+            # Phase 1: Erstelle Playlists für alle Verzeichnisse mit Mediendateien
+            with metrics.phase('directories'):
+                for i, root in enumerate(dirs_to_process):
+                    self.update_progress(f"Verarbeite Ordner {i+1}/{total_dirs}: {os.path.basename(root)}", i+1, total_dirs)
+                    playlists, files = self._process_directory(root)
+                    total_playlists += playlists
+                    total_files += files
+            
+            # Playlists, die betroffene Ordner nicht mehr erzeugen, vor dem Kombinieren entfernen
+            if affected is not None:
+                stale = self._remove_stale_outputs(index, affected)
+                if stale:
+                    self.update_progress(f"{stale} veraltete Playlists entfernt")
+            
+            # Phase 2: Kombinierte Playlists (optional)
+            if self.create_combined_playlists:
+                self.update_progress("Erstelle kombinierte Playlists...")
+                
+                # Gehe von unten nach oben durch die Verzeichnisstruktur (aus dem Index)
+                with metrics.phase('combined'):
+                    for node in index.walk(topdown=False):
+                        if affected is not None and node.path not in affected:
+                            continue
+                        total_playlists += self._combine_directory(node)
+        
+        if self.use_catalog:
+            with metrics.phase('catalog'):
+                self.update_catalog(index, changed, dirs_to_process)
+            with metrics.phase('smart'):
+                playlists, files = self.create_smart_playlists(index.root)
+            total_playlists += playlists
+            total_files += files
+        
+        if self.reconcile:
+            with metrics.phase('reconcile'):
+                self._finish_reconcile()
+        
+        if changed is None:
+            legacy_listdir, legacy_stat = index.estimate_legacy_io(
+                self.create_storyline_playlists, self.create_combined_playlists
+            )
+            self.update_progress(
+                f"I/O-Bilanz: {self.io_stats['listdir']} Verzeichnis-Listings, {self.io_stats['stat']} stat-Aufrufe "
+                f"(bisheriges Verfahren: ca. {legacy_listdir} Listings, {legacy_stat} stat-Aufrufe)"
+            )
+        if metrics.formats:
+            self.update_progress(metrics.format_summary())
+        metrics.counters['duplicate_files'] = len(self.track_store.aliases)
+        if self.track_store.aliases:
+            self.update_progress(
+                f"Duplikate: {len(self.track_store.aliases)} Dateien sind Hardlinks, Symlinks oder Kopien "
+                f"anderer Dateien, {metrics.counters['duplicates_collapsed']} Einträge in kombinierten "
+                f"Playlists zusammengefasst"
+            )
+        
+        # Ohne betroffene Ordner wäre das Manifest unverändert
+        if self.incremental and (affected is None or affected):
+            with metrics.phase('manifest'):
+                self._update_manifest(index, affected)
+        
+        if self._probe_cache_dirty:
+            try:
+                self.save_probe_cache(index.root, self._probe_cache)
+                self._probe_cache_dirty = False
+            except OSError as e:
+                self.update_progress(f"Cache der Medien-Analyse konnte nicht gespeichert werden: {e}")
+        
+        # Index, Manifest und Track-Listen gelten nur für diesen Lauf; der nächste Lauf liest neu ein
+        # (im Watch-Modus führt der Aufrufer Index und Manifest weiter)
+        if not self.keep_index:
+            self.library_index = None
+            self.manifest = None
+            self._probe_cache = None
+            self._media_info = {}
+            self.close_catalog()
+        self._playlist_tracks = {}
+        metrics.counters['tracks_stored'] = len(self.track_store)
+        self.track_store = None
+        
+        self.update_progress("Playlist-Erstellung abgeschlossen!", total_dirs, total_dirs)
+        return total_playlists, total_files
+    
+    def _process_directory(self, root):
+        """
+        Phase 1 für einen Ordner: eigene Playlist und (optional) Storyline-Playlist.
+        Gibt (Anzahl Playlists, Anzahl Dateien) zurück.
+        """
+        playlists = 0
+        files = 0
+        metrics = self._metrics()
+        start = time.perf_counter()
+        
+        files_added = self.create_playlist_for_directory(root)
+        if files_added > 0:
+            playlists += 1
+            files += files_added
+        
+        # Storyline Playlists (optional)
+        if self.create_storyline_playlists:
+            with metrics.phase('storyline'):
+                storyline_files = self.create_storyline_playlist(root)
+            if storyline_files > 0:
+                playlists += 1
+                files += storyline_files
+        
+        metrics.count('directories_processed')
+        metrics.add_directory_time(root, time.perf_counter() - start)
+        return playlists, files
+    
+    def _combine_directory(self, node):
+        """Phase 2 für einen Ordner: kombinierte Playlist, falls Unterordner Playlists haben."""
+        root = node.path
+        start = time.perf_counter()
+        # Finde Unterverzeichnisse, die Playlists haben
+        subdirs_with_playlists = []
+        for child in node.children:
+            d = child.name
+            subdir = child.path
+            
+            # Prüfe, ob dieses Unterverzeichnis eine Playlist hat
+            if self.save_in_parent_dir:
+                # Wenn im übergeordneten Ordner gespeichert wird, suche Playlist im übergeordneten Ordner
+                parent_of_subdir = os.path.dirname(subdir)
+                playlist_file = os.path.join(parent_of_subdir, f'{d}.xspf')
+            else:
+                # Wenn im aktuellen Ordner gespeichert wird, suche Playlist im Unterordner
+                playlist_file = os.path.join(subdir, f'{d}.xspf')
+            
+            if self._playlist_exists(playlist_file):
+                subdirs_with_playlists.append(subdir)
         
-        with open(combined_playlist_filename, 'w', encoding='utf-8') as f:
-            f.write(pretty_xml)
+        # Wenn dieses Verzeichnis Unterordner mit Playlists hat, erstelle kombinierte Playlist
+        created = 0
+        if subdirs_with_playlists:
+            self.update_progress(f"Erstelle kombinierte Playlist für {os.path.basename(root)}...")
+            combined_files = self.create_combined_playlist(root, subdirs_with_playlists)
+            if combined_files > 0:
+                created = 1
+        self._flush_deferred_write(root)
         
-        self.update_progress(f"Kombinierte Playlist erstellt: {os.path.basename(combined_playlist_filename)} ({len(unique_tracks)} Dateien)")
-        return len(unique_tracks)
+        metrics = self._metrics()
+        metrics.count('directories_combined')
+        metrics.add_directory_time(root, time.perf_counter() - start)
+        return created
     
-    def create_playlists_recursively(self, directory):
+    def _run_parallel(self, index, dirs_to_process, affected):
         """
-        Erstellt Playlists rekursiv für die gesamte Verzeichnisstruktur.
+        Führt Phase 1 und Phase 2 mit self.jobs Worker-Threads aus.
+        
+        Phase 1 läuft für alle Ordner gleichzeitig. Die kombinierte Playlist eines
+        Ordners startet, sobald seine eigene Phase 1 und die kombinierten Playlists
+        aller Unterordner fertig sind (Abhängigkeitsgraph statt zweitem Durchlauf).
+        Jeder Ordner schreibt nur seine eigenen Dateien, daher ist das Ergebnis
+        identisch mit dem seriellen Lauf. Fortschrittszähler meldet nur der aufrufende Thread.
         """
+        from concurrent.futures import wait, FIRST_COMPLETED
+        
         total_playlists = 0
         total_files = 0
+        total_dirs = len(dirs_to_process)
+        combine = self.create_combined_playlists
         
-        # Zähle zuerst alle Verzeichnisse mit Mediendateien für die Fortschrittsanzeige
-        dirs_to_process = []
-        for root, dirs, files in os.walk(directory):
-            # Überspringe Verzeichnisse, die keine Mediendateien enthalten sollten
-            skip_dirs = {'extras', 'bonus', 'trailer', 'sample', 'backup'}
-            dirs[:] = [d for d in dirs if d.lower() not in skip_dirs]
-            
-            # Prüfe, ob dieses Verzeichnis Mediendateien enthält
-            media_in_current_dir = any(
-                f.lower().endswith(('.mp4', '.mp3', '.mkv', '.avi', '.flac', '.wav', '.m4a'))
-                for f in files
-            )
-            
-            if media_in_current_dir:
-                dirs_to_process.append(root)
+        # Anzahl offener Voraussetzungen der kombinierten Playlist je Ordner
+        waiting = {}
+        if combine:
+            phase1_dirs = set(dirs_to_process)
+            for node in index.walk(topdown=False):
+                waiting[node] = (node.path in phase1_dirs) + sum(
+                    1 for child in node.children if not child.is_link
+                )
+            if affected is not None:
+                stale = self._remove_stale_outputs(index, (), include_removed=True)
+                if stale:
+                    self.update_progress(f"{stale} veraltete Playlists entfernt")
         
-        total_dirs = len(dirs_to_process)
-        self.update_progress(f"Starte Playlist-Erstellung in {directory}", 0, total_dirs)
+        def combine_task(node):
+            if affected is not None and node.path not in affected:
+                return 0
+            if affected is not None:
+                self._remove_stale_outputs(index, (node.path,), include_removed=False)
+            return self._combine_directory(node)
         
-        # Phase 1: Erstelle Playlists für alle Verzeichnisse mit Mediendateien
-        for i, root in enumerate(dirs_to_process):
-            self.update_progress(f"Verarbeite Ordner {i+1}/{total_dirs}: {os.path.basename(root)}", i+1, total_dirs)
+        processed = 0
+        with self._executor(self.jobs) as executor:
+            running = {}
             
-            # Prüfe, ob dieses Verzeichnis Mediendateien enthält
-            files = [f for f in os.listdir(root) if os.path.isfile(os.path.join(root, f))]
-            media_in_current_dir = any(
-                f.lower().endswith(('.mp4', '.mp3', '.mkv', '.avi', '.flac', '.wav', '.m4a'))
-                for f in files
-            )
+            def resolve(node):
+                waiting[node] -= 1
+                if waiting[node] == 0:
+                    running[executor.submit(combine_task, node)] = ('combine', node)
             
-            if media_in_current_dir:
-                files_added = self.create_playlist_for_directory(root)
-                if files_added > 0:
-                    total_playlists += 1
-                    total_files += files_added
+            for root in dirs_to_process:
+                running[executor.submit(self._process_directory, root)] = ('process', index.nodes[root])
+            for node, count in waiting.items():
+                if count == 0:
+                    running[executor.submit(combine_task, node)] = ('combine', node)
             
-            # Storyline Playlists (optional)
-            if self.create_storyline_playlists:
-                storyline_files = self.create_storyline_playlist(root)
-                if storyline_files > 0:
-                    total_playlists += 1
-                    total_files += storyline_files
+            try:
+                while running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        kind, node = running.pop(future)
+                        if kind == 'process':
+                            playlists, files = future.result()
+                            total_playlists += playlists
+                            total_files += files
+                            processed += 1
+                            self.update_progress(
+                                f"Verarbeite Ordner {processed}/{total_dirs}: {node.name}", processed, total_dirs
+                            )
+                            if combine:
+                                resolve(node)
+                        else:
+                            total_playlists += future.result()
+                            if node is not index.root_node:
+                                resolve(node.parent)
+            except BaseException:
+                for future in running:
+                    future.cancel()
+                raise
         
-        # Phase 2: Kombinierte Playlists (optional)
-        if self.create_combined_playlists:
-            self.update_progress("Erstelle kombinierte Playlists...")
-            combined_count = 0
-            
-            # Gehe von unten nach oben durch die Verzeichnisstruktur
-            for root, dirs, files in os.walk(directory, topdown=False):
-                # Finde Unterverzeichnisse, die Playlists haben
-                subdirs_with_playlists = []
-                for d in dirs:
-                    subdir = os.path.join(root, d)
-                    
-                    # Prüfe, ob dieses Unterverzeichnis eine Playlist hat
-                    if self.save_in_parent_dir:
-                        # Wenn im übergeordneten Ordner gespeichert wird, suche Playlist im übergeordneten Ordner
-                        parent_of_subdir = os.path.dirname(subdir)
-                        playlist_file = os.path.join(parent_of_subdir, f'{d}.xspf')
-                    else:
-                        # Wenn im aktuellen Ordner gespeichert wird, suche Playlist im Unterordner
-                        playlist_file = os.path.join(subdir, f'{d}.xspf')
+        if affected is not None and not combine:
+            stale = self._remove_stale_outputs(index, affected)
+            if stale:
+                self.update_progress(f"{stale} veraltete Playlists entfernt")
+        return total_playlists, total_files
+    
+    def _uses_pipeline(self, directory):
+        """
+        Pipeline-Modus nur für vollständige Läufe: der inkrementelle Modus, der Abgleich, die
+        Medien-Analyse und der Inhaltsvergleich brauchen den vollständigen Index, bevor die erste
+        Playlist entsteht.
+        """
+        if not self.pipeline or self.incremental or self.reconcile or self.probe_media or self.keep_index:
+            return False
+        if self._dedups_by_content():
+            return False
+        return self.library_index is None or self.library_index.root != directory
+    
+    def _dedups_by_content(self):
+        return self.dedup == 'content' and self.create_combined_playlists and not self.nested_combined
+    
+    def _run_pipeline(self, directory):
+        """
+        Liest directory ein und erstellt dabei schon die Playlists (Pipeline-Modus).
+        
+        Der Crawler (_iter_crawl) liefert jeden Ordner, sobald sein Listing vorliegt. Der
+        aufrufende Thread löscht dann dessen alte Playlists (falls delete_old_playlists das
+        Löschen übergeben hat) und reiht die Phase 1 des Ordners ein; Ordner mit Storyline.txt
+        warten, bis ihr Teilbaum eingelesen ist. Kombinierte Playlists folgen demselben
+        Abhängigkeitsgraph wie in _run_parallel, daher ist das Ergebnis identisch mit dem
+        seriellen Lauf. Bereite Aufgaben warten in einer Warteschlange auf die jobs Worker;
+        enthält sie PIPELINE_QUEUE_SIZE Aufgaben, pausiert das Einlesen. Der Fortschritt
+        schätzt die Gesamtzahl aus dem Anteil der Ordner mit Mediendateien unter den bisher
+        eingelesenen. Gibt (Index, verarbeitete Ordner, Anzahl Playlists, Anzahl Dateien) zurück.
+        """
+        from concurrent.futures import wait, FIRST_COMPLETED
+        
+        self.io_stats = Counter()
+        index = self._new_index(directory)
+        self.library_index = index
+        metrics = self._metrics()
+        stats = metrics.pipeline = PipelineStats()
+        workers = max(1, self.jobs)
+        stats.workers['scan'] = self._scan_limit(directory) if self._crawls_in_parallel() else 1
+        stats.workers['write'] = workers
+        delete = self._pipeline_delete
+        self._pipeline_delete = False
+        combine = self.create_combined_playlists
+        self.update_progress(f"Starte Playlist-Erstellung in {directory} (Pipeline)", 0, None)
+        
+        unscanned = {}    # Knoten -> Unterordner, deren Teilbaum noch nicht vollständig eingelesen ist
+        storyline = set()  # Ordner mit Storyline.txt, deren Phase 1 auf den Teilbaum wartet
+        waiting = {}      # Knoten -> offene Voraussetzungen der kombinierten Playlist
+        ready = deque()   # (Art, Knoten), bereit für einen Worker
+        running = {}
+        processed = []
+        totals = Counter()
+        
+        def task(kind, node):
+            start = time.perf_counter()
+            result = self._process_directory(node.path) if kind == 'process' else self._combine_directory(node)
+            stats.add_busy('write', time.perf_counter() - start)
+            if (result[0] if kind == 'process' else result):
+                stats.mark_output()
+            return result
+        
+        def subtree_scanned(node):
+            while True:
+                if node in storyline:
+                    storyline.discard(node)
+                    ready.append(('process', node))
+                if node is index.root_node:
+                    return
+                node = node.parent
+                unscanned[node] -= 1
+                if unscanned[node]:
+                    return
+        
+        def resolve(node):
+            waiting[node] -= 1
+            if waiting[node] == 0:
+                ready.append(('combine', node))
+        
+        def pump(executor, block):
+            while ready and len(running) < workers:
+                kind, node = ready.popleft()
+                running[executor.submit(task, kind, node)] = (kind, node)
+            stats.sample('write', len(ready))
+            if not running:
+                return
+            done, _ = wait(running, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind, node = running.pop(future)
+                if kind == 'process':
+                    playlists, files = future.result()
+                    totals['playlists'] += playlists
+                    totals['files'] += files
+                    processed.append(node.path)
+                    # Noch nicht eingelesene Ordner zählen mit dem bisherigen Anteil an Medienordnern
+                    pending = totals['discovered'] - totals['scanned']
+                    estimate = totals['media'] + round(pending * totals['media'] / totals['scanned'])
+                    self.update_progress(
+                        f"Verarbeite Ordner {len(processed)}/~{estimate}: {node.name}", len(processed), estimate
+                    )
+                    if combine:
+                        resolve(node)
+                else:
+                    totals['playlists'] += future.result()
+                    if node is not index.root_node:
+                        resolve(node.parent)
+        
+        totals['discovered'] = 1
+        with self._executor(workers) as executor:
+            try:
+                for node in self._iter_crawl(index, [index.root_node], stats):
+                    if delete:
+                        totals['deleted'] += self._delete_node_playlists(node)
+                    children = sum(1 for child in node.children if not child.is_link)
+                    totals['scanned'] += 1
+                    totals['discovered'] += children
+                    has_media = bool(node.media_files) and not node.pruned
+                    if has_media:
+                        totals['media'] += 1
+                        if self.create_storyline_playlists and node.storyline_entry is not None:
+                            storyline.add(node)
+                        else:
+                            ready.append(('process', node))
+                    if combine:
+                        waiting[node] = has_media + children
+                        if waiting[node] == 0:
+                            ready.append(('combine', node))
+                    unscanned[node] = children
+                    if not children:
+                        subtree_scanned(node)
                     
-                    if os.path.exists(playlist_file):
-                        subdirs_with_playlists.append(subdir)
+                    pump(executor, block=False)
+                    while len(ready) >= PIPELINE_QUEUE_SIZE:
+                        pump(executor, block=True)
+                stats.finish('scan')
                 
-                # Wenn dieses Verzeichnis Unterordner mit Playlists hat, erstelle kombinierte Playlist
-                if subdirs_with_playlists:
-                    combined_count += 1
-                    self.update_progress(f"Erstelle kombinierte Playlist für {os.path.basename(root)}...")
-                    combined_files = self.create_combined_playlist(root, subdirs_with_playlists)
-                    if combined_files > 0:
-                        total_playlists += 1
+                while ready or running:
+                    pump(executor, block=True)
+            except BaseException:
+                for future in running:
+                    future.cancel()
+                raise
+        stats.finish('write')
         
-        self.update_progress("Playlist-Erstellung abgeschlossen!", total_dirs, total_dirs)
-        return total_playlists, total_files
+        scan_seconds = stats.seconds['scan']
+        metrics.counters['scan_directories_per_second'] = round(len(index.nodes) / scan_seconds) if scan_seconds > 0 else 0
+        metrics.counters['pipeline_deleted'] = totals['deleted']
+        if delete:
+            self.update_progress(f"{totals['deleted']} alte Playlists beim Einlesen gelöscht")
+        self.update_progress(
+            f"Verzeichnisindex erstellt: {len(index.nodes)} Ordner, {self.io_stats['listdir']} Verzeichnis-Listings"
+        )
+        self._report_exclusions(index)
+        
+        # Dieselbe Reihenfolge wie beim Lauf ohne Pipeline (Katalog, Fortschritt)
+        processed = set(processed)
+        dirs_to_process = [node.path for node in index.walk(include_pruned=False) if node.path in processed]
+        return index, dirs_to_process, totals['playlists'], totals['files']
     
     def remove_brackets(self, term):
         return term.replace("(", "").replace(")", "").replace("[", "").replace("]", "")
@@ -409,10 +3675,37 @@ class PlaylistCreator:
         Erstellt eine Storyline-Playlist basierend auf einer Storyline.txt Datei.
         KORRIGIERTE VERSION: Ordnet Dateien Storyline-Einträgen zu und sortiert danach.
         """
-        storyline_file = os.path.join(directory, "Storyline.txt")
-        
-        if not os.path.exists(storyline_file):
+        result = self.storyline_tracks(directory)
+        if result is None:
             return 0
+        tracks, media_count, unmatched_files = result
+        
+        # KORREKTUR: Immer im selben Verzeichnis wie die Storyline.txt speichern
+        playlist_filename = os.path.join(directory, 'Storyline.xspf')
+        
+        self._write_playlist_file(playlist_filename, 'Storyline Playlist', tracks)
+        self._register_playlist(playlist_filename, directory, tracks)
+        
+        # Informative Statusmeldung
+        self.update_progress(
+            f"Storyline-Playlist erstellt: {len(tracks)} von {media_count} Dateien zugeordnet. "
+            f"({len(unmatched_files)} nicht zugeordnet)"
+        )
+        if unmatched_files:
+            self.update_progress(f"Nicht zugeordnete Dateien (erste 5): {unmatched_files[:5]}")
+        
+        return len(tracks)
+    
+    def storyline_tracks(self, directory):
+        """
+        Track-Liste der Storyline-Playlist eines Ordners in der Reihenfolge der Storyline.txt
+        (ohne sie zu schreiben, auch für den Server-Modus).
+        Gibt (TrackList, Anzahl Mediendateien, nicht zugeordnete Dateien) zurück, None ohne Storyline.
+        """
+        node = self._get_node(directory)
+        if node.storyline_entry is None:
+            return None
+        storyline_file = node.storyline_entry.path
         
         try:
             with open(storyline_file, "r", encoding="utf-8") as f:
@@ -420,45 +3713,39 @@ class PlaylistCreator:
                 original_storyline_entries = [line.strip() for line in f if line.strip()]
         except Exception as e:
             self.update_progress(f"Fehler beim Lesen der Storyline: {e}")
-            return 0
+            return None
         
         if not original_storyline_entries:
-            return 0
+            return None
         
         self.update_progress(f"Erstelle Storyline-Playlist für {os.path.basename(directory)}")
         
-        # 1. Sammle alle Medien-Dateien im Verzeichnis und allen Unterverzeichnissen
+        # 1. Sammle alle Medien-Dateien im Verzeichnis und allen Unterverzeichnissen (aus dem Index)
+        #    samt ihrer Track-ID im TrackStore
+        store = self._track_store()
         media_files = []
-        for root, _, files in os.walk(directory):
-            for file in files:
-                if file.lower().endswith(('.mp4', '.mp3', '.mkv', '.avi', '.flac', '.wav', '.m4a')):
-                    full_path = os.path.join(root, file)
-                    media_files.append(full_path)
+        track_ids = {}
+        for sub_node in walk_nodes(node):
+            if not sub_node.media_files:
+                continue
+            start, stop = store.block(sub_node.path, sub_node.media_files)
+            offsets = {store.names[track_id]: track_id for track_id in range(start, stop)}
+            for file in sub_node.media_files:
+                file_path = os.path.join(sub_node.path, file)
+                media_files.append(file_path)
+                track_ids[file_path] = offsets[file]
         
         if not media_files:
             self.update_progress("Keine Mediendateien im Verzeichnis gefunden.")
-            return 0
+            return None
         
         # 2. Vorbereitung der Storyline-Einträge für den Vergleich
-        #    Wir erstellen eine "gesäuberte" Version jedes Eintrags für besseres Matching.
-        def prepare_text_for_matching(text):
-            """Entfernt Nummerierungen (wie '1.', '23.') und Jahreszahlen, konvertiert zu Kleinbuchstaben."""
-            # Entferne führende Nummern mit Punkt/Dash (z.B. "1. ", "23 - ")
-            text = re.sub(r'^\d+[\.\-\s]*', '', text)
-            # Entferne Jahreszahlen in Klammern
-            text = re.sub(r'\s*\(\d{4}\)', '', text)
-            # Konvertiere zu Kleinbuchstaben und entferne überflüssige Leerzeichen
-            return text.strip().lower()
-        
-        # Struktur: Liste von Tupeln (Original-Eintrag, bereinigter Eintrag)
-        storyline_entries = []
-        for entry in original_storyline_entries:
-            cleaned = prepare_text_for_matching(entry)
-            storyline_entries.append((entry, cleaned))
+        #    Die "gesäuberten" Einträge werden einmal zu einem Automaten zusammengefasst.
+        match_start = time.perf_counter()
+        matcher = StorylineMatcher([prepare_text_for_matching(entry) for entry in original_storyline_entries])
         
         # 3. JEDER Mediendatei einen Storyline-Eintrag zuordnen (oder nicht)
-        #    Wir nutzen eine einfache, aber verbesserte Logik: Suche nach dem bereinigten
-        #    Storyline-Text im bereinigten Dateinamen.
+        #    Ein Durchlauf pro bereinigtem Dateinamen statt eines Vergleichs mit jedem Eintrag.
         matched_files = []  # Wird Tupele enthalten: (Storyline-Index, Dateipfad)
         unmatched_files = []  # Dateien, die keinem Eintrag zugeordnet werden konnten
         
@@ -466,34 +3753,30 @@ class PlaylistCreator:
             filename = os.path.basename(file_path)
             # Entferne Erweiterung und bereinige den Dateinamen für den Vergleich
             name_without_ext = os.path.splitext(filename)[0]
-            cleaned_filename = prepare_text_for_matching(name_without_ext)
-            
-            best_match_index = None
-            best_match_score = 0
-            
-            # Durchsuche alle Storyline-Einträge, um den besten Treffer zu finden
-            for idx, (original_entry, cleaned_entry) in enumerate(storyline_entries):
-                # Einfacher, aber effektiver Score: Ist der bereinigte Storyline-Eintrag
-                # im bereinigten Dateinamen enthalten?
-                if cleaned_entry in cleaned_filename:
-                    score = len(cleaned_entry)  # Länge des übereinstimmenden Textes
-                    # Bonus, wenn der Eintrag am Anfang des Dateinamens steht
-                    if cleaned_filename.startswith(cleaned_entry):
-                        score += 5
-                    if score > best_match_score:
-                        best_match_score = score
-                        best_match_index = idx
+            best_match_index = matcher.match(prepare_text_for_matching(name_without_ext))
             
             # Nur zuordnen, wenn ein ausreichend guter Treffer gefunden wurde
-            if best_match_index is not None and best_match_score >= 3:
+            if best_match_index is not None:
                 matched_files.append((best_match_index, file_path))
             else:
                 unmatched_files.append(file_path)
         
+        match_time = time.perf_counter() - match_start
+        self.update_progress(
+            f"Storyline-Abgleich: {len(original_storyline_entries)} Einträge, {len(media_files)} Dateien, "
+            f"{len(unmatched_files)} nicht zugeordnet ({match_time * 1000:.1f} ms)"
+        )
+        
         # 4. Sortiere die zugeordneten Dateien NACH DEM INDEX im Storyline-Eintrag
         #    Dadurch wird die exakte Reihenfolge der Storyline.txt eingehalten.
         matched_files.sort(key=lambda x: x[0])
         
+        if self.use_catalog:
+            with self._stats_lock:
+                self._storyline_assignments[directory] = [
+                    (file_path, index, original_storyline_entries[index]) for index, file_path in matched_files
+                ]
+        
         # 5. Erstelle die finale Liste der Dateien in der richtigen Reihenfolge
         final_file_list = [file_path for _, file_path in matched_files]
         
@@ -502,51 +3785,666 @@ class PlaylistCreator:
         
         if not final_file_list:
             self.update_progress("Keine passenden Dateien für Storyline gefunden")
-            return 0
+            return None
         
-        # 6. Erstelle die Playlist
-        playlist = Element('playlist', {'version': '1', 'xmlns': 'http://xspf.org/ns/0/'})
-        title = SubElement(playlist, 'title')
-        title.text = 'Storyline Playlist'
+        # 6. Erstelle die Track-Liste der Playlist
+        tracks = TrackList(store)
+        for media_file in final_file_list:
+            track_id = track_ids[media_file]
+            tracks.append_run(track_id, track_id + 1)
+        return tracks, len(media_files), unmatched_files
+
+
+def is_watched_name(name):
+    """Ob eine Dateiänderung die Playlists beeinflusst (eigene Playlists, Manifest und Protokoll nicht)."""
+    return (name.lower().endswith(MEDIA_EXTENSIONS)
+            or os.path.normcase(name) == os.path.normcase(STORYLINE_FILENAME))
+
+
+class InotifyBackend:
+    """Änderungsquelle über Linux-inotify (per ctypes, ohne Zusatzpakete)."""
+    
+    name = 'inotify'
+    
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_DONT_FOLLOW = 0x02000000
+    IN_ISDIR = 0x40000000
+    WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+                  | IN_ONLYDIR | IN_DONT_FOLLOW)
+    EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+    
+    def __init__(self):
+        if not sys.platform.startswith('linux'):
+            raise OSError(errno.ENOSYS, 'inotify gibt es nur unter Linux')
+        import ctypes
+        import ctypes.util
         
-        track_list = SubElement(playlist, 'trackList')
+        self._ctypes = ctypes
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.paths = {}    # Watch-Deskriptor -> Ordner
+        self.watches = {}  # Ordner -> Watch-Deskriptor
+    
+    def sync(self, index):
+        """Gleicht die überwachten Ordner mit dem Index ab (neue hinzu, verschwundene weg)."""
+        current = {node.path for node in index.walk()}
+        for path in [path for path in self.watches if path not in current]:
+            wd = self.watches.pop(path)
+            if self.paths.get(wd) == path:
+                del self.paths[wd]
+            self._libc.inotify_rm_watch(self.fd, wd)
         
-        for media_file in final_file_list:
-            track = SubElement(track_list, 'track')
-            location = SubElement(track, 'location')
-            file_path = media_file.replace('\\', '/')
-            encoded_path = quote(file_path, safe=":/")
-            location.text = f'file:///{encoded_path}'
+        for path in current.difference(self.watches):
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), self.WATCH_MASK)
+            if wd < 0:
+                error = self._ctypes.get_errno()
+                if error == errno.ENOSPC:
+                    raise OSError(error, 'inotify-Limit erreicht (fs.inotify.max_user_watches)')
+                continue  # Ordner ist inzwischen verschwunden
+            self.watches[path] = wd
+            self.paths[wd] = path
+    
+    def poll(self, timeout):
+        """Wartet höchstens timeout Sekunden und liefert die Ordner mit relevanten Änderungen."""
+        changed = set()
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return changed
+        
+        while True:
+            try:
+                data = os.read(self.fd, 1 << 16)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+                offset += self.EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+                
+                if mask & self.IN_Q_OVERFLOW:
+                    # Ereignisse verloren: alle Ordner neu einlesen
+                    changed.update(self.watches)
+                    continue
+                if mask & self.IN_IGNORED:
+                    path = self.paths.pop(wd, None)
+                    if path is not None and self.watches.get(path) == wd:
+                        del self.watches[path]
+                    continue
+                path = self.paths.get(wd)
+                if path is not None and (mask & self.IN_ISDIR or is_watched_name(name)):
+                    changed.add(path)
+        return changed
+    
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingBackend:
+    """
+    Änderungsquelle per stat-Schnappschuss: mtime jedes Ordners und jeder Storyline.txt.
+    Funktioniert überall, auch auf Netzlaufwerken, an denen inotify nichts meldet.
+    """
+    
+    name = 'polling'
+    
+    def __init__(self, interval=WATCH_POLL_INTERVAL):
+        self.interval = interval
+        self.storylines = {}  # Ordner -> Pfad der Storyline.txt (oder None)
+        self.snapshot = {}    # Ordner -> (mtime Ordner, mtime Storyline.txt)
+        self.next_poll = time.monotonic() + interval
+    
+    def _signature(self, path):
+        try:
+            dir_mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        storyline_mtime = None
+        if self.storylines.get(path):
+            try:
+                storyline_mtime = os.stat(self.storylines[path]).st_mtime_ns
+            except OSError:
+                pass
+        return dir_mtime, storyline_mtime
+    
+    def sync(self, index):
+        """
+        Übernimmt neue und entfernt verschwundene Ordner. Bekannte Schnappschüsse
+        bleiben stehen, damit Änderungen während eines Laufs nicht verloren gehen.
+        """
+        self.storylines = {
+            node.path: node.storyline_entry.path if node.storyline_entry is not None else None
+            for node in index.walk()
+        }
+        self.snapshot = {
+            path: self.snapshot[path] if path in self.snapshot else self._signature(path)
+            for path in self.storylines
+        }
+    
+    def poll(self, timeout):
+        """Vergleicht den Schnappschuss alle interval Sekunden (wartet höchstens timeout Sekunden)."""
+        wait = self.next_poll - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return set()
+        if wait > 0:
+            time.sleep(wait)
+        self.next_poll = time.monotonic() + self.interval
         
-        xml_string = tostring(playlist, 'utf-8')
-        pretty_xml = minidom.parseString(xml_string).toprettyxml(indent='  ')
+        changed = set()
+        for path, old_signature in self.snapshot.items():
+            signature = self._signature(path)
+            if signature != old_signature:
+                self.snapshot[path] = signature
+                changed.add(path)
+        return changed
+    
+    def close(self):
+        pass
+
+
+class LibraryWatcher:
+    """
+    Watch-Modus: hält Index und Manifest im Speicher und erzeugt bei Änderungen nur
+    die Playlists der betroffenen Ordner, deren Storyline-Playlists und die
+    kombinierten Playlists der Vorfahren neu. Änderungen werden per inotify
+    (sonst stat-Polling) erkannt und gebündelt, bis debounce Sekunden Ruhe herrscht.
+    """
+    
+    def __init__(self, creator, directory, debounce=WATCH_DEBOUNCE_SECONDS, poll_interval=None):
+        self.creator = creator
+        self.directory = directory
+        self.debounce = debounce
+        self.poll_interval = poll_interval  # None: inotify, falls verfügbar
+        self.backend = None
+        self.index = None
+        self.totals = Counter()  # Summen über alle verarbeiteten Änderungen
+        self._pending = set()    # Ordner eines fehlgeschlagenen Stapels (kommen zum nächsten hinzu)
+        self._stop = threading.Event()
+    
+    def start(self):
+        """Erster (inkrementeller) Lauf und Aufbau der Überwachung."""
+        creator = self.creator
+        creator.incremental = True
+        creator.keep_index = True
+        creator.delete_old_playlists(self.directory)
+        result = creator.create_playlists_recursively(self.directory)
+        self.index = creator.get_library_index(self.directory)
+        self._start_backend()
+        creator.update_progress(f"Überwache {len(self.index.nodes)} Ordner ({self.backend.name})")
+        return result
+    
+    def _start_backend(self):
+        """Richtet die Änderungsquelle für den Index ein (inotify, sonst Polling)."""
+        if self.poll_interval is None:
+            try:
+                self.backend = InotifyBackend()
+            except OSError as e:
+                self.creator.update_progress(f"inotify nicht verfügbar ({e}), verwende Polling")
+        if self.backend is None:
+            self.backend = PollingBackend(self.poll_interval or WATCH_POLL_INTERVAL)
+        self._sync_backend()
+    
+    def _sync_backend(self):
+        try:
+            self.backend.sync(self.index)
+        except OSError as e:
+            if isinstance(self.backend, PollingBackend):
+                raise
+            self.backend.close()
+            self.creator.update_progress(f"{e}, wechsle zu Polling")
+            self.backend = PollingBackend(self.poll_interval or WATCH_POLL_INTERVAL)
+            self.backend.sync(self.index)
+    
+    def wait_for_batch(self):
+        """
+        Wartet auf die erste Änderung und sammelt weitere, bis debounce Sekunden
+        nichts mehr passiert (höchstens WATCH_MAX_DELAY Sekunden).
+        Gibt (Ordner, Zeitpunkt der Erkennung) zurück, (None, None) nach stop().
+        """
+        changed = set()
+        while not changed:
+            if self._stop.is_set():
+                return None, None
+            changed = self.backend.poll(1.0)
         
-        # KORREKTUR: Immer im selben Verzeichnis wie die Storyline.txt speichern
-        playlist_filename = os.path.join(directory, 'Storyline.xspf')
+        detected = time.perf_counter()
+        deadline = detected + WATCH_MAX_DELAY
+        while not self._stop.is_set() and time.perf_counter() < deadline:
+            more = self.backend.poll(self.debounce)
+            if not more:
+                break
+            changed |= more
+        return changed | self._pending, detected
+    
+    def process_batch(self, paths, detected):
+        """Liest die gemeldeten Ordner neu ein und erzeugt nur die betroffenen Playlists."""
+        creator = self.creator
+        io_before = Counter(creator.io_stats)
+        self._pending = set(paths)
         
-        with open(playlist_filename, 'w', encoding='utf-8') as f:
-            f.write(pretty_xml)
+        rescanned = creator.rescan_directories(self.index, paths)
+        self._sync_backend()
+        playlists, files, _ = creator.create_playlists_recursively(self.directory, changed=rescanned)
+        self._pending = set()
         
-        # Informative Statusmeldung
-        self.update_progress(
-            f"Storyline-Playlist erstellt: {len(final_file_list)} von {len(media_files)} Dateien zugeordnet. "
-            f"({len(unmatched_files)} nicht zugeordnet)"
+        io = creator.io_stats - io_before
+        stats = {
+            'dirs': len(paths),
+            'rescanned': len(rescanned),
+            'playlists': playlists,
+            'files': files,
+            'listdir': io['listdir'],
+            'stat': io['stat'],
+            'latency': time.perf_counter() - detected,
+        }
+        self.totals.update(stats, batches=1)
+        creator.update_progress(
+            f"Änderung verarbeitet: {stats['dirs']} Ordner gemeldet, {stats['rescanned']} neu eingelesen, "
+            f"{playlists} Playlists geschrieben, {stats['listdir']} Listings, {stats['stat']} stat-Aufrufe, "
+            f"Latenz {stats['latency'] * 1000:.0f} ms"
         )
-        if unmatched_files:
-            self.update_progress(f"Nicht zugeordnete Dateien (erste 5): {unmatched_files[:5]}")
+        return stats
+    
+    def run(self):
+        """Überwacht die Mediathek, bis stop() aufgerufen wird."""
+        self.start()
+        try:
+            while not self._stop.is_set():
+                paths, detected = self.wait_for_batch()
+                if not paths:
+                    continue
+                try:
+                    self.process_batch(paths, detected)
+                except Exception as e:
+                    # Die Ordner werden mit dem nächsten Stapel erneut verarbeitet
+                    self.creator.update_progress(f"Fehler im Watch-Modus: {e}")
+        finally:
+            self.close()
+    
+    def stop(self):
+        self._stop.set()
+    
+    def close(self):
+        """Beendet die Überwachung und gibt Index, Manifest und Katalog frei."""
+        if self.backend is not None:
+            self.backend.close()
+            self.backend = None
+        self.creator.keep_index = False
+        self.creator.library_index = None
+        self.creator.manifest = None
+        self.creator.close_catalog()
+
+
+class PlaylistCache:
+    """
+    LRU-Cache gerenderter Playlists (Schlüssel -> (Inhalt, ETag)) mit Obergrenzen für
+    Einträge und Bytes. Zählt Treffer, Fehlgriffe, Verdrängungen und Invalidierungen.
+    
+    Einträge tragen die Index-Generation, aus der sie gerendert wurden: put() verwirft Einträge
+    einer älteren Generation als der zuletzt invalidierten, damit ein Rendern, das vor einer
+    Änderung begann, keinen veralteten Stand nach der Invalidierung zurückschreibt.
+    """
+    
+    def __init__(self, max_entries=SERVE_CACHE_ENTRIES, max_bytes=SERVE_CACHE_BYTES):
+        from collections import OrderedDict
+        
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.generation = 0
+        self.stats = Counter()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry
+    
+    def put(self, key, entry, generation=None):
+        with self._lock:
+            if generation is not None and generation < self.generation:
+                self.stats['stale'] += 1
+                return entry
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[0])
+            self._entries[key] = entry
+            self.size += len(entry[0])
+            while self._entries and (len(self._entries) > self.max_entries or self.size > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted[0])
+                self.stats['evictions'] += 1
+        return entry
+    
+    def invalidate(self, predicate, generation=None):
+        """
+        Verwirft alle Einträge, deren Schlüssel predicate erfüllt; gibt deren Anzahl zurück.
+        Mit generation werden spätere put()-Aufrufe älterer Generationen ignoriert.
+        """
+        with self._lock:
+            if generation is not None:
+                self.generation = max(self.generation, generation)
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self.size -= len(self._entries.pop(key)[0])
+            self.stats['invalidations'] += len(keys)
+        return len(keys)
+    
+    def to_dict(self):
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                'entries': len(self._entries),
+                'bytes': self.size,
+                'hits': self.stats['hits'],
+                'misses': self.stats['misses'],
+                'hit_rate': round(self.stats['hits'] / lookups, 3) if lookups else 0.0,
+                'evictions': self.stats['evictions'],
+                'invalidations': self.stats['invalidations'],
+                'stale': self.stats['stale'],
+            }
+
+
+class PlaylistServer(LibraryWatcher):
+    """
+    Server-Modus: hält den Index im Speicher und liefert Playlists per HTTP, statt sie in die
+    Mediathek zu schreiben. Adressen (Pfad relativ zum Wurzelordner, Format .xspf oder .m3u8):
+    
+        /folder/<Ordner>.xspf      eigene Dateien eines Ordners
+        /combined/<Ordner>.xspf    Ordner samt Unterordnern (wie die kombinierte Playlist)
+        /storyline/<Ordner>.xspf   Reihenfolge der Storyline.txt
+        /combined.xspf             Wurzelordner (entsprechend /folder.xspf, /storyline.xspf)
+        /stats                     Kennzahlen als JSON
+    
+    Playlists entstehen erst beim Abruf mit derselben Sortierung und demselben Storyline-Abgleich
+    wie beim Schreiben und landen in einem PlaylistCache; ETag/If-None-Match erspart erneute
+    Übertragungen. Änderungen erkennt der Watch-Mechanismus; betroffen sind die Ordner selbst
+    und (kombiniert, Storyline) ihre Vorfahren, nur deren Einträge werden verworfen.
+    """
+    
+    def __init__(self, creator, directory, host=SERVE_HOST, port=SERVE_PORT,
+                 debounce=WATCH_DEBOUNCE_SECONDS, poll_interval=None):
+        super().__init__(creator, directory, debounce, poll_interval)
+        self.host = host
+        self.port = port
+        self.cache = PlaylistCache()
+        self.requests = Counter()  # Status bzw. Art -> Anzahl
+        self.latencies = deque(maxlen=SERVE_LATENCY_SAMPLES)
+        self.render_seconds = 0.0
+        self.httpd = None
+        self._combined = {}        # Ordner -> kombinierte TrackList (bis zur nächsten Änderung)
+        self.generation = 0        # zählt verarbeitete Änderungen; nur unter _render_lock
+        self._render_lock = threading.RLock()
+        self._stats_lock = threading.Lock()
+    
+    def start(self):
+        """Liest die Mediathek ein, richtet die Überwachung ein und startet den HTTP-Server."""
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        
+        creator = self.creator
+        creator.keep_index = True
+        self.index = creator.scan_library(self.directory)
+        self._prepare_index()
+        self._start_backend()
+        
+        server = self
+        
+        class RequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.handle_request(self)
+            
+            def do_HEAD(self):
+                server.handle_request(self, send_body=False)
+            
+            def log_message(self, format, *args):
+                pass  # Abrufe landen in den Kennzahlen (/stats)
+        
+        self.httpd = ThreadingHTTPServer((self.host, self.port), RequestHandler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        creator.update_progress(
+            f"Playlist-Server läuft: http://{self.host}:{self.port}/combined.xspf "
+            f"({len(self.index.nodes)} Ordner, Überwachung per {self.backend.name})"
+        )
+    
+    def _prepare_index(self):
+        """Neuer TrackStore und (optional) Medien-Analyse bzw. Inhaltsvergleich für den aktuellen Index."""
+        creator = self.creator
+        creator.track_store = creator._new_track_store()
+        if creator.probe_media:
+            creator.probe_library(self.index)
+        if creator._dedups_by_content():
+            creator.hash_library(self.index)
+        self._combined.clear()
+    
+    def process_batch(self, paths, detected):
+        """Liest die gemeldeten Ordner neu ein und verwirft nur die betroffenen Cache-Einträge."""
+        creator = self.creator
+        with self._render_lock:
+            rescanned = creator.rescan_directories(self.index, paths)
+            self._sync_backend()
+            self._prepare_index()
+            self.generation += 1
+            generation = self.generation
+        
+        changed = set(paths) | {node.path for node in rescanned}
+        lineage = set()
+        for path in changed:
+            while path not in lineage:
+                lineage.add(path)
+                if path == self.directory or os.path.dirname(path) == path:
+                    break
+                path = os.path.dirname(path)
+        nodes = self.index.nodes
+        evicted = self.cache.invalidate(
+            lambda key: key[1] not in nodes or key[1] in (changed if key[0] == 'folder' else lineage),
+            generation
+        )
+        stats = {'dirs': len(paths), 'rescanned': len(rescanned), 'evicted': evicted,
+                 'latency': time.perf_counter() - detected}
+        self.totals.update(stats, batches=1)
+        creator.update_progress(
+            f"Änderung verarbeitet: {stats['dirs']} Ordner gemeldet, {stats['rescanned']} neu eingelesen, "
+            f"{evicted} Playlists im Cache verworfen, Latenz {stats['latency'] * 1000:.0f} ms"
+        )
+        return stats
+    
+    def resolve(self, path):
+        """Ordnet einen URL-Pfad (Art, Ordner, Format) zu; None, wenn er keine Playlist-Adresse ist."""
+        kind, _, rest = unquote(path).strip('/').partition('/')
+        name = rest if rest else kind
+        stem, extension = os.path.splitext(name)
+        playlist_format = extension[1:].lower()
+        if playlist_format in PLAYLIST_WRITERS:
+            name = stem
+        else:
+            playlist_format = 'xspf'
+        if rest:
+            rest = name
+        else:
+            kind = name
+        if kind not in SERVE_KINDS:
+            return None
+        segments = [segment for segment in rest.split('/') if segment]
+        if any(segment in ('.', '..') for segment in segments):
+            return None
+        directory = os.path.join(self.directory, *segments) if segments else self.directory
+        return kind, directory, playlist_format
+    
+    def render(self, kind, directory, playlist_format):
+        """
+        Erzeugt eine Playlist aus dem Index; gibt ((Inhalt, ETag), Generation des Index) zurück,
+        None ohne Einträge.
+        """
+        creator = self.creator
+        start = time.perf_counter()
+        with self._render_lock:
+            generation = self.generation
+            node = self.index.nodes.get(directory)
+            if node is None or node.pruned or node.is_link:
+                return None
+            title = node.name
+            if kind == 'folder':
+                tracks = creator._directory_tracks(node.path, node.media_files) if node.media_files else None
+            elif kind == 'combined':
+                tracks = self._combined_tracks(node)
+            else:
+                # Wie beim Schreiben nur für Ordner mit eigenen Mediendateien
+                result = creator.storyline_tracks(directory) if node.media_files else None
+                tracks = result[0] if result is not None else None
+                title = 'Storyline Playlist'
+            if not tracks:
+                return None
+            buffer = io.StringIO()
+            PLAYLIST_WRITERS[playlist_format](buffer, title, tracks)
+        body = buffer.getvalue().encode('utf-8')
+        etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        with self._stats_lock:
+            self.render_seconds += time.perf_counter() - start
+        return (body, etag), generation
+    
+    def _combined_tracks(self, node):
+        """Wie create_combined_playlist: eigene Dateien, dann Unterordner nach Namen, ohne Duplikate."""
+        tracks = self._combined.get(node.path)
+        if tracks is None:
+            creator = self.creator
+            tracks = TrackList(creator._track_store())
+            if node.media_files:
+                tracks.extend(creator._directory_tracks(node.path, node.media_files))
+            for child in sorted(node.children, key=lambda c: c.name.lower()):
+                if not child.is_link and not child.pruned:
+                    tracks.extend(self._combined_tracks(child))
+            tracks = tracks.deduplicated()
+            self._combined[node.path] = tracks
+        return tracks
+    
+    def handle_request(self, request, send_body=True):
+        """Beantwortet einen Abruf aus dem Cache bzw. rendert die Playlist (HTTP-Handler-Thread)."""
+        from urllib.parse import urlsplit
+        
+        start = time.perf_counter()
+        path = urlsplit(request.path).path
+        headers = {'Cache-Control': 'no-cache'}
+        if path.rstrip('/') == '/stats':
+            status, kind = 200, 'stats'
+            body = json.dumps(self.stats(), ensure_ascii=False).encode('utf-8')
+            headers['Content-Type'] = 'application/json; charset=utf-8'
+        else:
+            key = self.resolve(path)
+            entry = None
+            if key is not None:
+                entry = self.cache.get(key)
+                if entry is None:
+                    rendered = self.render(*key)
+                    if rendered is not None:
+                        entry, generation = rendered
+                        self.cache.put(key, entry, generation)
+            if entry is None:
+                status, kind, body = 404, 'not_found', b'Keine Playlist unter dieser Adresse\n'
+                headers['Content-Type'] = 'text/plain; charset=utf-8'
+            else:
+                body, etag = entry
+                kind = key[0]
+                headers['ETag'] = etag
+                headers['Content-Type'] = SERVE_CONTENT_TYPES[key[2]]
+                matches = [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]
+                if '*' in matches or etag in matches or f'W/{etag}' in matches:
+                    status, body = 304, b''
+                else:
+                    status = 200
         
-        return len(final_file_list)
+        request.send_response(status)
+        for name, value in headers.items():
+            request.send_header(name, value)
+        if status != 304:
+            request.send_header('Content-Length', str(len(body)))
+        request.end_headers()
+        if send_body and body:
+            request.wfile.write(body)
+        with self._stats_lock:
+            self.requests['total'] += 1
+            self.requests[kind] += 1
+            self.requests[status] += 1
+            self.latencies.append(time.perf_counter() - start)
+    
+    def stats(self):
+        """Kennzahlen für /stats: Abrufe, Latenz der letzten Antworten, Cache und Änderungen."""
+        with self._stats_lock:
+            latencies = sorted(self.latencies)
+            requests = dict(self.requests)
+            render_seconds = self.render_seconds
+        
+        def percentile(fraction):
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000, 3)
+        
+        return {
+            'root': self.directory,
+            'directories': len(self.index.nodes),
+            'requests': {str(key): value for key, value in requests.items()},
+            'latency_ms': {
+                'samples': len(latencies),
+                'mean': round(sum(latencies) / len(latencies) * 1000, 3),
+                'p50': percentile(0.5),
+                'p95': percentile(0.95),
+                'max': round(latencies[-1] * 1000, 3),
+            } if latencies else {'samples': 0},
+            'render_seconds': round(render_seconds, 3),
+            'cache': self.cache.to_dict(),
+            'changes': dict(self.totals),
+        }
+    
+    def close(self):
+        """Beendet HTTP-Server und Überwachung."""
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+        super().close()
 
 
 class ProgressGUI:
     """Separates Fenster für die Fortschrittsanzeige."""
     
-    def __init__(self, parent):
+    def __init__(self, parent, log_path=None):
+        # tkinter wird erst geladen, wenn die GUI tatsächlich gestartet wird
+        from tkinter import Toplevel, Frame, Label, Scrollbar, Text, Button
+        
         self.window = Toplevel(parent)
         self.window.title("Playlist-Erstellung läuft...")
         self.window.geometry("600x600")
         self.window.transient(parent)  # Macht das Fenster modal für das Hauptfenster
         self.window.grab_set()  # Blockiert das Hauptfenster
+        self.window.protocol("WM_DELETE_WINDOW", self.close_window)
+        
+        # Der Worker-Thread legt Ereignisse nur in die Queue, gezeichnet wird im UI-Thread
+        self.events = queue.Queue()
+        self.closed = False
+        self.log_file = None
+        self.log_error = None
+        if log_path:
+            try:
+                self.log_file = open(log_path, 'a', encoding='utf-8')
+            except OSError as e:
+                self.log_error = f"Protokolldatei konnte nicht geöffnet werden: {e}"
         
         # Frame für Status
         status_frame = Frame(self.window)
@@ -585,73 +4483,138 @@ class ProgressGUI:
         
         self.close_button = Button(self.button_frame, text="Schließen", command=self.close_window, state="disabled")
         self.close_button.pack()
+        
+        if self.log_error:
+            self.update_progress(self.log_error)
+        self._pump_job = self.window.after(PROGRESS_FRAME_INTERVAL_MS, self._pump)
     
     def update_progress(self, message, current=None, total=None):
-        """Aktualisiert die Fortschrittsanzeige."""
-        if current is not None and total is not None and total > 0:
+        """Meldet einen Fortschritt. Darf aus jedem Thread aufgerufen werden und blockiert nie."""
+        if not self.closed:
+            self.events.put(('progress', message, current, total))
+    
+    def show_completion(self, playlists_created, files_added):
+        """Zeigt Abschlussmeldung an."""
+        if not self.closed:
+            self.events.put(('completion', playlists_created, files_added))
+    
+    def show_error(self, error_message):
+        """Zeigt Fehlermeldung an."""
+        if not self.closed:
+            self.events.put(('error', error_message))
+    
+    def _pump(self):
+        """Leert die Queue einmal pro Frame und zeichnet nur den letzten Stand.
+        
+        Zwischenstände des Zählers werden verworfen, ins Textfeld wandern höchstens
+        PROGRESS_LOG_MAX_LINES Zeilen; die Protokolldatei erhält alle Meldungen.
+        """
+        lines = deque(maxlen=PROGRESS_LOG_MAX_LINES)
+        counter = None
+        activity = None
+        final = None
+        
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            
+            kind = event[0]
+            if kind == 'progress':
+                _, message, current, total = event
+                if current is not None and total is not None and total > 0:
+                    counter = (current, total)
+                if not message:
+                    continue
+                activity = message
+                new_lines = [message]
+            elif kind == 'completion':
+                new_lines = ["", "="*50, f"ERFOLG: {event[1]} Playlists mit {event[2]} Dateien erstellt!", "="*50]
+                final = ("Playlist-Erstellung abgeschlossen!", "Fertig!", "green")
+            else:
+                new_lines = ["", "="*50, f"FEHLER: {event[1]}", "="*50]
+                final = ("Fehler aufgetreten!", "Fehler!", "red")
+            
+            lines.extend(new_lines)
+            if self.log_file:
+                self.log_file.write("\n".join(new_lines) + "\n")
+        
+        if counter:
+            current, total = counter
             percent = (current / total) * 100
             self.progress_label.config(text=f"{current}/{total} ({percent:.1f}%)")
             self.status_label.config(text=f"Fortschritt: {percent:.1f}%")
         
-        if message:
-            self.activity_label.config(text=message[:80] + "..." if len(message) > 80 else message)
-            
-            # Füge Nachricht zum Textbereich hinzu
-            self.text_widget.config(state="normal")
-            self.text_widget.insert("end", f"{message}\n")
-            self.text_widget.see("end")  # Automatisch scrollen
-            self.text_widget.config(state="disabled")
+        if activity:
+            self.activity_label.config(text=activity[:80] + "..." if len(activity) > 80 else activity)
         
-        # GUI aktualisieren
-        self.window.update_idletasks()
-    
-    def show_completion(self, playlists_created, files_added):
-        """Zeigt Abschlussmeldung an."""
-        self.text_widget.config(state="normal")
-        self.text_widget.insert("end", "\n" + "="*50 + "\n")
-        self.text_widget.insert("end", f"ERFOLG: {playlists_created} Playlists mit {files_added} Dateien erstellt!\n")
-        self.text_widget.insert("end", "="*50 + "\n")
-        self.text_widget.config(state="disabled")
+        if lines:
+            self._append_lines(lines)
         
-        self.activity_label.config(text="Playlist-Erstellung abgeschlossen!", fg="green")
-        self.status_label.config(text="Fertig!", fg="green")
-        self.close_button.config(state="normal")
+        if final:
+            activity_text, status_text, color = final
+            self.activity_label.config(text=activity_text, fg=color)
+            self.status_label.config(text=status_text, fg=color)
+            self.close_button.config(state="normal")
+            if self.log_file:
+                self.log_file.flush()
+        
+        self._pump_job = self.window.after(PROGRESS_FRAME_INTERVAL_MS, self._pump)
     
-    def show_error(self, error_message):
-        """Zeigt Fehlermeldung an."""
+    def _append_lines(self, lines):
+        """Hängt Zeilen an das Textfeld an und verwirft die ältesten (Ringpuffer)."""
         self.text_widget.config(state="normal")
-        self.text_widget.insert("end", "\n" + "="*50 + "\n")
-        self.text_widget.insert("end", f"FEHLER: {error_message}\n")
-        self.text_widget.insert("end", "="*50 + "\n")
-        self.text_widget.config(state="disabled")
+        self.text_widget.insert("end", "\n".join(lines) + "\n")
         
-        self.activity_label.config(text="Fehler aufgetreten!", fg="red")
-        self.status_label.config(text="Fehler!", fg="red")
-        self.close_button.config(state="normal")
+        line_count = int(self.text_widget.index("end-1c").split(".")[0]) - 1
+        excess = line_count - PROGRESS_LOG_MAX_LINES
+        if excess > 0:
+            self.text_widget.delete("1.0", f"{excess + 1}.0")
+        
+        self.text_widget.see("end")  # Automatisch scrollen
+        self.text_widget.config(state="disabled")
     
     def close_window(self):
         """Schließt das Fortschrittsfenster."""
+        self.closed = True
+        self.window.after_cancel(self._pump_job)
+        if self.log_file:
+            self.log_file.close()
+            self.log_file = None
         self.window.grab_release()
         self.window.destroy()
 
 
 class PlaylistCreatorGUI:
     def __init__(self):
+        from tkinter import Tk, StringVar, BooleanVar
+        
         self.creator = PlaylistCreator()
         self.root = Tk()
         self.root.title("Erweiterter VLC Playlist Creator")
-        self.root.geometry("520x380")
+        self.root.geometry("520x605")
         
         self.folder_path = StringVar()
         
         # BooleanVar-Objekte für die Checkbuttons - ALLE DEFAULT AN
         self.combined_var = BooleanVar(value=True)      # Default an
+        self.nested_var = BooleanVar(value=False)       # Opt-in: kombinierte Playlists verweisen auf Unterordner-Playlists
+        self.content_dedup_var = BooleanVar(value=False)  # Opt-in: Kopien per Inhalts-Stichproben erkennen
         self.storyline_var = BooleanVar(value=True)     # Default an
         self.parent_dir_var = BooleanVar(value=True)    # Default an
+        self.incremental_var = BooleanVar(value=False)  # Opt-in: benötigt ein Manifest im Wurzelordner
+        self.reconcile_var = BooleanVar(value=False)    # Opt-in: nur geänderte Playlists schreiben
+        self.m3u8_var = BooleanVar(value=False)         # Opt-in: zusätzlich .m3u8 neben .xspf
+        self.probe_var = BooleanVar(value=False)        # Opt-in: Dauer und Titel aus den Mediendateien lesen
+        self.catalog_var = BooleanVar(value=False)      # Opt-in: Medienkatalog und Smart-Playlists
+        self.log_file_var = BooleanVar(value=False)     # Opt-in: vollständiges Protokoll als Datei
         
         self.setup_gui()
     
     def setup_gui(self):
+        from tkinter import Label, Frame, Button, Entry, LabelFrame, Checkbutton
+        
         # Titel
         title_label = Label(self.root, text="VLC Playlist Creator", font=("Arial", 16, "bold"))
         title_label.pack(pady=10)
@@ -676,10 +4639,26 @@ class PlaylistCreatorGUI:
         
         Checkbutton(options_frame, text="Kombinierte Playlists erstellen", 
                    variable=self.combined_var).pack(anchor="w", padx=10, pady=2)
+        Checkbutton(options_frame, text="Kombinierte Playlists verschachteln (Verweise statt Kopien)", 
+                   variable=self.nested_var).pack(anchor="w", padx=30, pady=2)
+        Checkbutton(options_frame, text="Doppelte Dateien per Inhaltsvergleich erkennen (Stichproben)", 
+                   variable=self.content_dedup_var).pack(anchor="w", padx=30, pady=2)
         Checkbutton(options_frame, text="Storyline Playlists erstellen", 
                    variable=self.storyline_var).pack(anchor="w", padx=10, pady=2)
         Checkbutton(options_frame, text="Playlists im übergeordneten Ordner speichern", 
                    variable=self.parent_dir_var).pack(anchor="w", padx=10, pady=2)
+        Checkbutton(options_frame, text="Nur geänderte Ordner neu erstellen (inkrementell)", 
+                   variable=self.incremental_var).pack(anchor="w", padx=10, pady=2)
+        Checkbutton(options_frame, text="Nur geänderte Playlists schreiben (Abgleich statt Neuanfang)", 
+                   variable=self.reconcile_var).pack(anchor="w", padx=10, pady=2)
+        Checkbutton(options_frame, text="Zusätzlich M3U8-Playlists schreiben", 
+                   variable=self.m3u8_var).pack(anchor="w", padx=10, pady=2)
+        Checkbutton(options_frame, text="Dauer, Titel und Tracknummer aus den Mediendateien lesen", 
+                   variable=self.probe_var).pack(anchor="w", padx=10, pady=2)
+        Checkbutton(options_frame, text=f"Medienkatalog pflegen und Smart-Playlists erstellen ({SMART_PLAYLISTS_FILENAME})", 
+                   variable=self.catalog_var).pack(anchor="w", padx=10, pady=2)
+        Checkbutton(options_frame, text=f"Vollständiges Protokoll speichern ({PROGRESS_LOG_FILENAME})", 
+                   variable=self.log_file_var).pack(anchor="w", padx=10, pady=2)
         
         # Status-Anzeige
         self.status_label = Label(self.root, text="Bereit", fg="gray")
@@ -700,12 +4679,16 @@ class PlaylistCreatorGUI:
         exit_button.pack(side="left", padx=10)
     
     def browse_directory(self):
+        from tkinter import filedialog
+        
         directory = filedialog.askdirectory()
         if directory:
             self.folder_path.set(directory)
             self.status_label.config(text=f"Ausgewählt: {directory}", fg="blue")
     
     def create_playlists(self):
+        from tkinter import messagebox
+        
         directory = self.folder_path.get()
         if not directory or not os.path.exists(directory):
             messagebox.showerror("Fehler", "Bitte wählen Sie ein gültiges Verzeichnis aus.")
@@ -716,15 +4699,23 @@ class PlaylistCreatorGUI:
         self.root.update()
         
         # Öffne Fortschrittsfenster
-        progress_window = ProgressGUI(self.root)
+        log_path = os.path.join(directory, PROGRESS_LOG_FILENAME) if self.log_file_var.get() else None
+        progress_window = ProgressGUI(self.root, log_path)
         
         # Funktion, die in einem separaten Thread läuft
         def create_playlists_thread():
             try:
                 # Setze die Einstellungen basierend auf den Checkbuttons
                 self.creator.create_combined_playlists = self.combined_var.get()
+                self.creator.nested_combined = self.nested_var.get()
+                self.creator.dedup = 'content' if self.content_dedup_var.get() else DEFAULT_DEDUP_MODE
                 self.creator.create_storyline_playlists = self.storyline_var.get()
                 self.creator.save_in_parent_dir = self.parent_dir_var.get()
+                self.creator.incremental = self.incremental_var.get()
+                self.creator.reconcile = self.reconcile_var.get()
+                self.creator.playlist_formats = ('xspf', 'm3u8') if self.m3u8_var.get() else DEFAULT_PLAYLIST_FORMATS
+                self.creator.probe_media = self.probe_var.get()
+                self.creator.use_catalog = self.catalog_var.get()
                 
                 # Setze den Progress-Callback
                 self.creator.progress_callback = progress_window.update_progress
@@ -734,7 +4725,7 @@ class PlaylistCreatorGUI:
                 progress_window.update_progress(f"{deleted} alte Playlists gelöscht")
                 
                 # Erstelle neue Playlists
-                playlists_created, files_added = self.creator.create_playlists_recursively(directory)
+                playlists_created, files_added, _ = self.creator.create_playlists_recursively(directory)
                 
                 # Zeige Erfolgsmeldung im Fortschrittsfenster
                 progress_window.show_completion(playlists_created, files_added)
@@ -766,10 +4757,399 @@ class PlaylistCreatorGUI:
         self.root.mainloop()
 
 
-def main():
-    app = PlaylistCreatorGUI()
-    app.run()
+def build_arg_parser():
+    """Kommandozeilen-Optionen für den Betrieb ohne GUI (z.B. per Cronjob)."""
+    import argparse
+    
+    def scan_workers(value):
+        """[PFAD=]N -> (Pfad oder None, N)"""
+        path, _, count = value.rpartition('=')
+        try:
+            count = int(count)
+        except ValueError:
+            count = 0
+        if count < 1:
+            raise argparse.ArgumentTypeError(f"ungültige Anzahl: {value!r} (erwartet N oder PFAD=N mit N >= 1)")
+        return path or None, count
+    
+    def serve_address(value):
+        """[HOST:]PORT -> (Host, Port)"""
+        host, _, port = value.rpartition(':')
+        try:
+            port = int(port)
+        except ValueError:
+            port = -1
+        if not 0 <= port <= 65535:
+            raise argparse.ArgumentTypeError(f"ungültige Adresse: {value!r} (erwartet PORT oder HOST:PORT)")
+        return host or SERVE_HOST, port
+    
+    parser = argparse.ArgumentParser(
+        prog='VLCPlaylistCreator',
+        description='Erstellt sortierte VLC-Playlists (.xspf/.m3u8) für eine Medien-Sammlung. '
+                    'Ohne Wurzelordner startet die GUI.',
+    )
+    parser.add_argument('root', nargs='?', help='Wurzelordner der Mediathek (ohne Angabe: GUI starten)')
+    parser.add_argument('--no-combined', dest='combined', action='store_false',
+                        help='keine kombinierten Playlists erstellen')
+    parser.add_argument('--nested', action='store_true',
+                        help='kombinierte Playlists verweisen auf die Playlists der Unterordner, statt deren '
+                             'Tracks zu kopieren (eigene Dateien des Ordners zuerst)')
+    parser.add_argument('--dedup', choices=DEDUP_MODES, default=DEFAULT_DEDUP_MODE,
+                        help='Duplikate in kombinierten Playlists: path (gleicher Pfad), inode (auch Hardlinks '
+                             'und Symlinks) oder content (auch Kopien, per Stichproben-Hash mit Cache in '
+                             f'{HASH_CACHE_FILENAME}; Standard: {DEFAULT_DEDUP_MODE})')
+    parser.add_argument('--no-storyline', dest='storyline', action='store_false',
+                        help='keine Storyline-Playlists erstellen')
+    parser.add_argument('--no-parent-dir', dest='parent_dir', action='store_false',
+                        help='Playlists im Ordner selbst statt im übergeordneten Ordner speichern')
+    parser.add_argument('--incremental', action='store_true',
+                        help='nur geänderte Ordner neu erstellen (Manifest im Wurzelordner)')
+    parser.add_argument('-f', '--format', dest='formats', action='append', choices=sorted(PLAYLIST_WRITERS),
+                        help='Ausgabeformat, mehrfach angebbar; alle Formate entstehen im selben Durchlauf '
+                             '(Standard: xspf)')
+    parser.add_argument('--probe', action='store_true',
+                        help='Dauer, Titel und Tracknummer aus den Kopfdaten der Mediendateien lesen '
+                             f'(Cache in {PROBE_CACHE_FILENAME})')
+    parser.add_argument('--catalog', action='store_true',
+                        help=f'Medienkatalog ({CATALOG_FILENAME}) pflegen und Smart-Playlists aus '
+                             f'{SMART_PLAYLISTS_FILENAME} im Wurzelordner erstellen')
+    parser.add_argument('--smart', action='append', metavar='"TITEL: BEDINGUNG"',
+                        help='zusätzliche Smart-Playlist als SQL-Bedingung über die Sicht media, '
+                             'z.B. "Erste Staffeln: season = 1" (mehrfach angebbar, impliziert --catalog)')
+    parser.add_argument('--smart-only', action='store_true',
+                        help='nur die Smart-Playlists aus dem vorhandenen Katalog neu schreiben, '
+                             'ohne die Mediathek einzulesen')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Anzahl paralleler Worker (Standard: 1)')
+    parser.add_argument('--scan-workers', type=scan_workers, action='append', metavar='[PFAD=]N',
+                        help='gleichzeitige Verzeichnis-Listings beim Einlesen (Standard: 1), z.B. 16 für SMB/NFS; '
+                             'mit PFAD=N eigene Obergrenze für ein Laufwerk/einen Mount, mehrfach angebbar')
+    parser.add_argument('--ignore', action='append', metavar='MUSTER',
+                        help=f'Einträge mit passendem Namen nicht einlesen, wie eine Zeile in {IGNORE_FILENAME} '
+                             '(Glob, re:REGEX, abschließender / nur für Ordner; mehrfach angebbar)')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='Playlists schon während des Einlesens schreiben (Einlesen, Sortieren und Schreiben '
+                             'überlappen; nur ohne --incremental, --reconcile und --probe)')
+    parser.add_argument('--reconcile', action='store_true',
+                        help='nur Playlists mit geändertem Inhalt schreiben und nicht mehr erzeugte '
+                             'erst am Ende löschen (statt alles zu löschen und neu zu schreiben)')
+    parser.add_argument('--watch', action='store_true',
+                        help='nach dem ersten Lauf weiterlaufen und bei Änderungen nur betroffene '
+                             'Playlists neu erstellen (impliziert --incremental, Beenden mit Strg+C)')
+    parser.add_argument('--debounce', type=float, default=WATCH_DEBOUNCE_SECONDS, metavar='SEKUNDEN',
+                        help=f'Watch-Modus: Ruhezeit, bevor Änderungen verarbeitet werden (Standard: {WATCH_DEBOUNCE_SECONDS:g})')
+    parser.add_argument('--poll', type=float, nargs='?', const=WATCH_POLL_INTERVAL, metavar='SEKUNDEN',
+                        help='Watch-Modus: stat-Polling statt inotify verwenden, z.B. für Netzlaufwerke '
+                             f'(Standard-Intervall: {WATCH_POLL_INTERVAL:g})')
+    parser.add_argument('--serve', type=serve_address, nargs='?', const=(SERVE_HOST, SERVE_PORT),
+                        metavar='[HOST:]PORT',
+                        help='nichts schreiben, sondern Playlists per HTTP aus dem Index im Speicher liefern und '
+                             f'Änderungen wie --watch verfolgen (Standard: {SERVE_HOST}:{SERVE_PORT}, Beenden mit Strg+C)')
+    parser.add_argument('--validate', action='store_true',
+                        help='nichts schreiben, sondern vorhandene Playlists auf tote, doppelte und nicht '
+                             'sortierte Einträge prüfen (Exit-Code 1 bei toten Einträgen)')
+    parser.add_argument('--batch', metavar='DATEI',
+                        help='mehrere Wurzelordner in einem Lauf: je Zeile PFAD [OPTIONEN], die Optionen '
+                             'der Kommandozeile gelten als Vorgabe; alle teilen sich einen Worker-Pool')
+    parser.add_argument('--batch-workers', type=int, default=BATCH_WORKERS, metavar='N',
+                        help=f'Batch-Modus: Größe des gemeinsamen Worker-Pools (Standard: {BATCH_WORKERS})')
+    parser.add_argument('--device-workers', type=int, default=BATCH_DEVICE_WORKERS, metavar='N',
+                        help='Batch-Modus: gleichzeitige Aufgaben je Laufwerk, z.B. 1-2 für Festplatten, '
+                             f'mehr für SSDs und NAS (Standard: {BATCH_DEVICE_WORKERS})')
+    parser.add_argument('--metrics', metavar='DATEI',
+                        help='Laufzeit-Kennzahlen (Phasen, Zähler, langsamste Ordner) als JSON speichern')
+    parser.add_argument('--profile', metavar='DATEI',
+                        help='den Lauf mit cProfile aufzeichnen (auswertbar mit python -m pstats DATEI)')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='Speicherverbrauch mit tracemalloc aufzeichnen (Spitzenwert und größte Verursacher)')
+    parser.add_argument('--json', action='store_true',
+                        help='Zusammenfassung als JSON auf stdout ausgeben')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help='keine Fortschrittsmeldungen auf stderr')
+    return parser
+
+
+def print_progress(message, current=None, total=None):
+    """Fortschritts-Callback für die Kommandozeile (stderr, damit stdout maschinenlesbar bleibt)."""
+    if current is not None and total:
+        message = f"[{current}/{total}] {message}"
+    print(message, file=sys.stderr, flush=True)
+
+
+def configure_creator(creator, args):
+    """Überträgt die Kommandozeilen-Optionen args auf creator."""
+    creator.create_combined_playlists = args.combined
+    creator.nested_combined = args.nested
+    creator.dedup = args.dedup
+    creator.create_storyline_playlists = args.storyline
+    creator.save_in_parent_dir = args.parent_dir
+    creator.incremental = args.incremental
+    creator.reconcile = args.reconcile
+    creator.playlist_formats = tuple(dict.fromkeys(args.formats)) if args.formats else DEFAULT_PLAYLIST_FORMATS
+    creator.probe_media = args.probe
+    creator.smart_playlists = parse_smart_playlists(args.smart or ())
+    creator.use_catalog = args.catalog or bool(args.smart) or args.smart_only
+    creator.jobs = max(1, args.jobs)
+    creator.pipeline = args.pipeline
+    creator.ignore_patterns = list(args.ignore or ())
+    for path, count in args.scan_workers or ():
+        if path is None:
+            creator.scan_workers = count
+        else:
+            creator.scan_workers_by_mount[path] = count
+    creator.profile_path = args.profile
+    creator.trace_memory = args.trace_memory
+
+
+def run_root(creator, args):
+    """Ein Lauf (ohne Watch-Modus) für args.root; gibt (Zusammenfassung, Exit-Code) zurück."""
+    directory = args.root
+    summary = {
+        'root': directory,
+        'options': {
+            'combined': args.combined,
+            'nested': args.nested,
+            'dedup': args.dedup,
+            'storyline': args.storyline,
+            'parent_dir': args.parent_dir,
+            'incremental': args.incremental,
+            'reconcile': args.reconcile,
+            'formats': list(creator.playlist_formats),
+            'probe': args.probe,
+            'catalog': creator.use_catalog,
+            'jobs': creator.jobs,
+            'scan_workers': creator.scan_workers,
+            'scan_workers_by_mount': creator.scan_workers_by_mount,
+            'pipeline': args.pipeline,
+            'ignore': creator.ignore_patterns,
+        },
+    }
+    start = time.perf_counter()
+    try:
+        if args.smart_only:
+            summary['deleted'] = 0
+            summary['playlists'], summary['files'] = creator.create_smart_playlists_from_catalog(directory)
+            metrics = creator.metrics
+        else:
+            summary['deleted'] = creator.delete_old_playlists(directory)
+            summary['playlists'], summary['files'], metrics = creator.create_playlists_recursively(directory)
+            summary['deleted'] += metrics.counters['pipeline_deleted']
+        summary['metrics'] = metrics.to_dict()
+        if args.metrics:
+            metrics.save(args.metrics)
+        exit_code = 0
+    except Exception as e:
+        summary['error'] = str(e)
+        exit_code = 1
+    summary['seconds'] = round(time.perf_counter() - start, 3)
+    summary['io'] = dict(creator.io_stats)
+    if args.reconcile:
+        summary['reconcile'] = dict(creator.reconcile_stats)
+    return summary, exit_code
+
+
+def run_cli(args):
+    """Führt einen Lauf ohne GUI aus und gibt den Exit-Code zurück."""
+    if args.batch:
+        return run_batch(args)
+    # Relative Pfade würden als file:///./… in den Playlists landen
+    directory = args.root = os.path.abspath(args.root)
+    if not os.path.isdir(directory):
+        print(f"Fehler: {directory} ist kein gültiges Verzeichnis.", file=sys.stderr)
+        return 2
+    
+    creator = PlaylistCreator(progress_callback=None if args.quiet else print_progress)
+    configure_creator(creator, args)
+    
+    if args.watch:
+        watcher = LibraryWatcher(creator, directory, args.debounce, args.poll)
+        try:
+            watcher.run()
+        except KeyboardInterrupt:
+            pass
+        totals = watcher.totals
+        print(f"Watch-Modus beendet: {totals['batches']} Änderungen verarbeitet, "
+              f"{totals['playlists']} Playlists neu geschrieben.", file=sys.stderr)
+        return 0
+    
+    if args.serve:
+        host, port = args.serve
+        server = PlaylistServer(creator, directory, host, port, args.debounce, args.poll)
+        try:
+            server.run()
+        except KeyboardInterrupt:
+            pass
+        except OSError as e:
+            print(f"Fehler: Server konnte nicht gestartet werden: {e}", file=sys.stderr)
+            return 2
+        cache = server.cache.to_dict()
+        print(f"Server beendet: {server.requests['total']} Abrufe, Cache-Trefferquote {cache['hit_rate']:.0%}, {server.totals['batches']} Änderungen "
+              f"verarbeitet.", file=sys.stderr)
+        return 0
+    
+    if args.validate:
+        start = time.perf_counter()
+        report = creator.validate_playlists(directory)
+        summary = {'root': directory, 'validation': report, 'seconds': round(time.perf_counter() - start, 3),
+                   'io': dict(creator.io_stats), 'metrics': creator.metrics.to_dict()}
+        if args.json:
+            print(json.dumps(summary, ensure_ascii=False))
+        else:
+            print(f"Geprüft: {report['playlists']} Playlists mit {report['entries']} Einträgen, "
+                  f"{report['dead']} tote, {report['duplicates']} doppelte, {report['out_of_order']} nicht "
+                  f"sortierte Einträge ({summary['seconds']:.1f} s).")
+        return 1 if report['dead'] else 0
+    
+    summary, exit_code = run_root(creator, args)
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False))
+    elif exit_code:
+        print(f"FEHLER: {summary['error']}", file=sys.stderr)
+    else:
+        print(f"Fertig! {summary['playlists']} Playlists mit {summary['files']} Dateien erstellt "
+              f"({summary['seconds']:.1f} s).")
+    return exit_code
+
+
+def split_batch_line(line):
+    """Zerlegt eine Zeile der Batch-Datei wie eine Shell, Backslashes (Windows-Pfade) bleiben erhalten."""
+    import shlex
+    
+    lexer = shlex.shlex(line, posix=True)
+    lexer.whitespace_split = True
+    lexer.escape = ''
+    lexer.commenters = ''
+    return list(lexer)
+
+
+def read_batch_file(path, args):
+    """
+    Liest die Batch-Datei path: je Zeile ein Wurzelordner mit eigenen Optionen wie auf der
+    Kommandozeile (PFAD [OPTIONEN]), Zeilen mit # am Anfang sind Kommentare. Die Optionen
+    der Kommandozeile (args) gelten als Vorgabe für jede Zeile.
+    Gibt die Optionen je Zeile zurück; ValueError bei ungültigen Zeilen.
+    """
+    import copy
+    
+    parser = build_arg_parser()
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        lines = f.read().splitlines()
+    entries = []
+    roots = set()
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        defaults = copy.deepcopy(args)
+        defaults.root = None
+        try:
+            entry = parser.parse_args(split_batch_line(line), namespace=defaults)
+        except SystemExit:
+            raise ValueError(f"{path}, Zeile {number}: ungültige Optionen") from None
+        if entry.root is None:
+            raise ValueError(f"{path}, Zeile {number}: kein Wurzelordner angegeben")
+        # Absolut wie in run_cli: Scheduler-Schlüssel, Zusammenfassung und Playlist-URLs
+        entry.root = os.path.abspath(entry.root)
+        if not os.path.isdir(entry.root):
+            raise ValueError(f"{path}, Zeile {number}: {entry.root} ist kein gültiges Verzeichnis")
+        if (entry.watch or entry.serve or entry.validate or entry.profile or entry.trace_memory
+                or entry.batch != args.batch):
+            raise ValueError(f"{path}, Zeile {number}: --watch, --serve, --validate, --profile, --trace-memory "
+                             "und --batch sind im Batch-Modus nicht möglich")
+        root = os.path.normcase(entry.root)
+        if root in roots:
+            raise ValueError(f"{path}, Zeile {number}: {entry.root} ist bereits eingetragen")
+        roots.add(root)
+        entries.append(entry)
+    if not entries:
+        raise ValueError(f"{path} enthält keine Wurzelordner")
+    return entries
+
+
+def run_batch(args):
+    """
+    Batch-Modus: alle Wurzelordner der Batch-Datei in einem Prozess. Jeder Wurzelordner läuft
+    in einem eigenen Koordinator-Thread mit seinen Optionen; ihre Aufgaben teilen sich einen
+    BatchScheduler (gemeinsamer Worker-Pool, Obergrenze je Laufwerk). Gibt den Exit-Code zurück.
+    """
+    if args.root is not None:
+        print("Fehler: Wurzelordner und --batch schließen sich aus (Ordner in die Batch-Datei eintragen).",
+              file=sys.stderr)
+        return 2
+    try:
+        entries = read_batch_file(args.batch, args)
+    except (OSError, ValueError) as e:
+        print(f"Fehler: {e}", file=sys.stderr)
+        return 2
+    
+    scheduler = BatchScheduler(args.batch_workers, args.device_workers)
+    runs = []
+    for entry in entries:
+        name = os.path.basename(os.path.normpath(entry.root)) or entry.root
+        
+        def progress(message, current=None, total=None, name=name):
+            print_progress(f"{name}: {message}", current, total)
+        
+        creator = PlaylistCreator(progress_callback=None if entry.quiet else progress)
+        configure_creator(creator, entry)
+        # Parallele Pfade nutzen, damit alle Aufgaben über den gemeinsamen Pool laufen
+        creator.jobs = scheduler.workers
+        if creator.scan_workers == 1 and not creator.scan_workers_by_mount:
+            creator.scan_workers = scheduler.device_workers
+        creator.scheduler = scheduler
+        creator.scheduler_key = entry.root
+        scheduler.register(entry.root, entry.root)
+        runs.append({'args': entry, 'creator': creator})
+    
+    def run(item):
+        item['summary'], item['exit_code'] = run_root(item['creator'], item['args'])
+    
+    start = time.perf_counter()
+    threads = [threading.Thread(target=run, args=(item,), daemon=True) for item in runs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    scheduler.shutdown()
+    seconds = round(time.perf_counter() - start, 3)
+    
+    summaries = [item['summary'] for item in runs]
+    for summary in summaries:
+        summary['scheduler'] = scheduler.to_dict()['roots'][summary['root']]
+    exit_code = max(item['exit_code'] for item in runs)
+    totals = {
+        'roots': len(summaries),
+        'playlists': sum(summary.get('playlists', 0) for summary in summaries),
+        'files': sum(summary.get('files', 0) for summary in summaries),
+        'deleted': sum(summary.get('deleted', 0) for summary in summaries),
+        'seconds': seconds,
+        'root_seconds': round(sum(summary['seconds'] for summary in summaries), 3),
+    }
+    
+    if args.json:
+        print(json.dumps({'batch': summaries, **totals, 'scheduler': scheduler.to_dict()}, ensure_ascii=False))
+        return exit_code
+    for summary in summaries:
+        if 'error' in summary:
+            print(f"FEHLER in {summary['root']}: {summary['error']}", file=sys.stderr)
+            continue
+        print(f"{summary['root']}: {summary['playlists']} Playlists mit {summary['files']} Dateien "
+              f"({summary['seconds']:.1f} s, {summary['scheduler']['tasks']} Aufgaben, zusammen "
+              f"{summary['scheduler']['queued_seconds']:.1f} s in der Warteschlange)")
+    print(f"Fertig! {totals['roots']} Wurzelordner, {totals['playlists']} Playlists mit {totals['files']} "
+          f"Dateien in {seconds:.1f} s (Einzelläufe zusammen {totals['root_seconds']:.1f} s, "
+          f"Pool-Auslastung {scheduler.utilization():.0%}).")
+    return exit_code
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    if args.root is None and args.batch is None:
+        app = PlaylistCreatorGUI()
+        app.run()
+        return 0
+    return run_cli(args)
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
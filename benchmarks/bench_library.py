@@ -0,0 +1,458 @@
+"""
+Benchmark-Suite für PlaylistCreator auf synthetischen Mediatheken.
+
+Erzeugt reproduzierbare Verzeichnisbäume aus leeren Dateien (Tiefe, Verzweigung,
+Dateien pro Ordner, Namensstile für alle Zweige der natürlichen Sortierung,
+optional Storyline.txt beliebiger Größe) und misst die Phasen Einlesen, Löschen,
+Sortieren, Storyline-Abgleich, Serialisierung, Schreiben und kombinierte
+Playlists getrennt, dazu in einem eigenen Lauf den Spitzenverbrauch an Speicher
+(tracemalloc). Ergebnisse gehen als JSON raus und werden auf Wunsch mit
+einer gespeicherten Baseline verglichen (Exit-Code 1 bei Regression).
+
+    python benchmarks/bench_library.py --scale 10k
+    python benchmarks/bench_library.py --scale 10k --scale 100k --output results.json --baseline baseline.json
+    python benchmarks/bench_library.py --files 5000 --depth 2 --fanout 5 --styles episode,roman --storyline-lines 200
+    python benchmarks/bench_library.py --scale 10k --scan-latency 30 --scan-workers 16
+    python benchmarks/bench_library.py --scale 10k --scan-latency 30 --scan-workers 16 --pipeline -j 4
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import VLCPlaylistCreator as vpc  # noqa: E402
+from bench_sort_keys import ROMANS, TITLES  # noqa: E402
+
+# Voreinstellungen für die Regressionsläufe: (Dateien, Tiefe, Verzweigung)
+SCALES = {
+    '10k': (10_000, 3, 6),
+    '100k': (100_000, 3, 12),
+    '1m': (1_000_000, 4, 12),
+}
+LEVEL_NAMES = ['Kategorie', 'Serie', 'Staffel', 'Teil', 'Band', 'Disc']
+EXTENSIONS = ['.mp4', '.mkv', '.avi', '.mp3', '.m4a', '.flac', '.wav']
+# Kennungen für eindeutige Namen, ohne Buchstaben, die als römische Ziffer gelesen würden
+TAG_LETTERS = 'abefghjknoprstuwyz'
+PHASES = ['scan', 'delete', 'sort', 'storyline', 'serialize', 'write', 'combined', 'other', 'total']
+PARAMS_FILENAME = '.bench-params.json'
+
+
+def tag(number):
+    letters = TAG_LETTERS[number % len(TAG_LETTERS)]
+    number //= len(TAG_LETTERS)
+    while number:
+        letters = TAG_LETTERS[number % len(TAG_LETTERS)] + letters
+        number //= len(TAG_LETTERS)
+    return letters
+
+
+# Je ein Namensstil pro Zweig von natural_sort_key; liefert den Namen ohne Endung
+STYLES = {
+    'episode': lambda rnd, i, title: f'S{rnd.randint(1, 12):02d}E{i + 1:02d} - {title}',
+    'numbered': lambda rnd, i, title: f'{i + 1:0{rnd.choice([1, 2, 3])}d}{rnd.choice([" - ", ". ", "-"])}{title}',
+    'roman': lambda rnd, i, title: f'{title} {rnd.choice(["Teil ", "Part ", ""])}{rnd.choice(ROMANS)}',
+    'arabic': lambda rnd, i, title: f'{title} {rnd.randint(1, 9)} ({rnd.randint(1950, 2030)})',
+    'year': lambda rnd, i, title: f'{title} ({rnd.randint(1950, 2030)})',
+    'plain': lambda rnd, i, title: f'{rnd.choice(["", "- ", ": "])}{title}',
+}
+
+
+def generate_library(root, files, depth, fanout, styles, storyline_ratio, storyline_lines, seed):
+    """
+    Erzeugt einen Verzeichnisbaum aus leeren Dateien. Die Mediendateien liegen
+    überwiegend in den Blättern, einige auch in inneren Ordnern (kombinierte
+    Playlists mit eigenen Dateien); jeder siebte Ordner hat einen Extras-Unterordner.
+    Gibt (Ordner, Dateien, Storyline-Dateien) zurück.
+    """
+    rnd = random.Random(seed)
+    leaves = fanout ** depth
+    per_leaf = max(1, files // leaves)
+    counts = Counter()
+
+    def write_files(directory, count):
+        style = STYLES[rnd.choice(styles)]
+        names = []
+        for i in range(count):
+            title = f'{rnd.choice(TITLES)} {tag(i)}'
+            name = style(rnd, i, title)
+            open(os.path.join(directory, name + rnd.choice(EXTENSIONS)), 'w').close()
+            names.append(title)
+        counts['files'] += count
+        return names
+
+    def write_storyline(directory, titles):
+        entries = rnd.sample(titles, min(len(titles), storyline_lines))
+        entries += [f'Nicht vorhanden {tag(i)}' for i in range(storyline_lines - len(entries))]
+        rnd.shuffle(entries)
+        with open(os.path.join(directory, vpc.STORYLINE_FILENAME), 'w', encoding='utf-8') as f:
+            for number, entry in enumerate(entries, 1):
+                f.write(f'{number}. {entry}\n')
+        counts['storylines'] += 1
+
+    def build(directory, level):
+        os.makedirs(directory)
+        counts['dirs'] += 1
+        titles = []
+        if level == depth:
+            titles += write_files(directory, per_leaf)
+        else:
+            if rnd.random() < 0.1:
+                titles += write_files(directory, max(1, per_leaf // 4))
+            for j in range(fanout):
+                titles += build(os.path.join(directory, f'{LEVEL_NAMES[level % len(LEVEL_NAMES)]} {j + 1}'), level + 1)
+                del titles[1000:]  # Stichprobe für Storyline-Einträge genügt
+        if counts['dirs'] % 7 == 0:
+            extras = os.path.join(directory, 'Extras')
+            os.makedirs(extras)
+            counts['dirs'] += 1
+            write_files(extras, 3)
+        if storyline_lines and titles and rnd.random() < storyline_ratio:
+            write_storyline(directory, titles)
+        return titles
+
+    build(root, 0)
+    return counts['dirs'], counts['files'], counts['storylines']
+
+
+def prepare_library(workdir, params, regenerate):
+    """Erzeugt den Baum nur, wenn er mit diesen Parametern noch nicht existiert."""
+    root = os.path.join(workdir, 'lib')
+    params_path = os.path.join(workdir, PARAMS_FILENAME)
+    try:
+        with open(params_path, 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        stored = None
+    if not regenerate and stored and stored['params'] == params and os.path.isdir(root):
+        return root, stored['tree']
+
+    shutil.rmtree(workdir, ignore_errors=True)
+    os.makedirs(workdir)
+    start = time.perf_counter()
+    dirs, files, storylines = generate_library(root, **params)
+    tree = {'dirs': dirs, 'files': files, 'storylines': storylines,
+            'generate_seconds': round(time.perf_counter() - start, 3)}
+    with open(params_path, 'w', encoding='utf-8') as f:
+        json.dump({'params': params, 'tree': tree}, f)
+    return root, tree
+
+
+class PhaseTimer:
+    """Misst die exklusive Zeit eingewickelter Funktionen (verschachtelte Aufrufe werden abgezogen)."""
+
+    def __init__(self):
+        self.seconds = Counter()
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def wrap(self, phase, function):
+        def timed(*args, **kwargs):
+            stack = self._local.__dict__.setdefault('stack', [])
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                children = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                with self._lock:
+                    self.seconds[phase] += elapsed - children
+                    self.calls[phase] += 1
+        return timed
+
+
+def creator_settings(args):
+    """Einstellungen des PlaylistCreator aus den Kommandozeilen-Argumenten."""
+    return {
+        'jobs': args.jobs,
+        'playlist_formats': tuple(args.formats or vpc.DEFAULT_PLAYLIST_FORMATS),
+        'nested_combined': args.nested,
+        'scan_workers': args.scan_workers,
+        'pipeline': args.pipeline,
+    }
+
+
+def make_creator(settings):
+    creator = vpc.PlaylistCreator()
+    for name, value in settings.items():
+        setattr(creator, name, value)
+    return creator
+
+
+@contextmanager
+def simulated_latency(seconds):
+    """Verzögert jedes os.scandir um seconds, wie ein Netzlaufwerk mit hoher Latenz."""
+    if not seconds:
+        yield
+        return
+    original = os.scandir
+
+    def slow_scandir(path='.'):
+        time.sleep(seconds)
+        return original(path)
+
+    os.scandir = slow_scandir
+    try:
+        yield
+    finally:
+        os.scandir = original
+
+
+def measure(root, settings, scan_latency=0.0):
+    """
+    Ein vollständiger Lauf mit getrennt gemessenen Phasen (Sekunden). Im Pipeline-Modus
+    überlappen die Phasen: scan ist dann die Wandzeit des Einlesens innerhalb des Laufs.
+    """
+    creator = make_creator(settings)
+    formats = creator.playlist_formats
+    pipelined = settings.get('pipeline', False)
+    timer = PhaseTimer()
+    written = []
+    first_output = []
+
+    def capture(playlist_filename, title, tracks, defer_owner=None, references=()):
+        if not first_output:
+            first_output.append(time.perf_counter() - run_start)
+        written.append((title, tracks, references))
+        return write(playlist_filename, title, tracks, defer_owner, references)
+
+    write = timer.wrap('write', creator._write_playlist_file)
+    creator._write_playlist_file = capture
+    creator.create_storyline_playlist = timer.wrap('storyline', creator.create_storyline_playlist)
+    creator._combine_directory = timer.wrap('combined', creator._combine_directory)
+    original_sort = vpc.sort_naturally
+    vpc.sort_naturally = timer.wrap('sort', original_sort)
+    vpc.natural_sort_key.cache_clear()
+    vpc.prepare_text_for_matching.cache_clear()
+
+    phases = {}
+    try:
+        start = run_start = time.perf_counter()
+        if not pipelined:
+            with simulated_latency(scan_latency):
+                creator.scan_library(root)
+        phases['scan'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        creator.delete_old_playlists(root)
+        phases['delete'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with simulated_latency(scan_latency if pipelined else 0.0):
+            playlists, files, metrics = creator.create_playlists_recursively(root)
+        run_time = time.perf_counter() - start
+    finally:
+        vpc.sort_naturally = original_sort
+
+    # Der Streaming-Writer serialisiert beim Schreiben; die reine Serialisierung
+    # wird im Speicher nachgemessen und vom Schreiben abgezogen.
+    start = time.perf_counter()
+    for title, tracks, references in written:
+        for playlist_format in formats:
+            entries = list(tracks) + list(creator._reference_tracks(references, playlist_format))
+            vpc.PLAYLIST_WRITERS[playlist_format](io.StringIO(), title, entries)
+    phases['serialize'] = time.perf_counter() - start
+
+    phases['sort'] = timer.seconds['sort']
+    phases['storyline'] = timer.seconds['storyline']
+    phases['write'] = max(0.0, timer.seconds['write'] - phases['serialize'])
+    phases['combined'] = timer.seconds['combined']
+    phases['other'] = max(0.0, run_time - sum(timer.seconds.values()))
+    phases['total'] = phases['scan'] + phases['delete'] + run_time
+    if pipelined:
+        phases['scan'] = metrics.pipeline.seconds['scan']
+        phases['other'] = max(0.0, phases['other'] - phases['scan'])
+    counts = {'playlists': playlists, 'files': files, 'written': len(written),
+              'listdir': creator.io_stats['listdir'], 'stat': creator.io_stats['stat'],
+              'formats': metrics.formats,
+              'first_output': round(first_output[0], 4) if first_output else None}
+    if pipelined:
+        counts['pipeline'] = metrics.pipeline.to_dict()
+    return phases, counts
+
+
+def measure_memory(root, settings):
+    """Spitzenverbrauch (Bytes, tracemalloc) eines vollständigen Laufs inklusive Index, ohne Mess-Wrapper."""
+    creator = make_creator(settings)
+    tracemalloc.start()
+    try:
+        creator.delete_old_playlists(root)
+        creator.create_playlists_recursively(root)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run_scale(label, params, args):
+    workdir = os.path.join(args.workdir, f'{label}-{params["seed"]}')
+    root, tree = prepare_library(workdir, params, args.regenerate)
+    print(f"[{label}] Baum: {tree['dirs']} Ordner, {tree['files']} Dateien, "
+          f"{tree['storylines']} Storyline.txt ({workdir})", file=sys.stderr)
+
+    settings = creator_settings(args)
+    measure(root, settings)  # Vorlauf: legt die Playlists an, die die Lösch-Phase entfernt
+    best = None
+    for _ in range(args.repeat):
+        phases, counts = measure(root, settings, args.scan_latency / 1000)
+        best = phases if best is None else {phase: min(best[phase], phases[phase]) for phase in PHASES}
+    result = {'params': params, 'tree': tree, 'counts': counts,
+              'phases': {phase: round(best[phase], 4) for phase in PHASES}}
+    if not args.no_memory:
+        result['peak_memory'] = measure_memory(root, settings)
+
+    if not args.keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return result
+
+
+def compare(results, baseline, tolerance, min_delta):
+    """Vergleicht die Phasen mit der Baseline; gibt die Liste der Regressionen zurück."""
+    regressions = []
+    for label, result in results.items():
+        reference = baseline.get('results', {}).get(label)
+        if reference is None:
+            print(f"[{label}] keine Baseline vorhanden", file=sys.stderr)
+            continue
+        if reference['params'] != result['params']:
+            print(f"[{label}] Baseline mit anderen Parametern erzeugt, Vergleich nur bedingt aussagekräftig",
+                  file=sys.stderr)
+        for phase in PHASES:
+            old = reference['phases'].get(phase)
+            new = result['phases'][phase]
+            if old is None:
+                continue
+            ratio = new / old if old else float('inf') if new else 1.0
+            marker = ''
+            if new - old > min_delta and ratio > 1 + tolerance:
+                marker = '  REGRESSION'
+                regressions.append((label, phase, old, new))
+            print(f"[{label}] {phase:<10} {old * 1000:10.1f} ms -> {new * 1000:10.1f} ms  ({ratio:5.2f}x){marker}")
+        old, new = reference.get('peak_memory'), result.get('peak_memory')
+        if old and new:
+            marker = ''
+            if new / old > 1 + tolerance:
+                marker = '  REGRESSION'
+                regressions.append((label, 'peak_memory', old, new))
+            print(f"[{label}] {'memory':<10} {old / 2**20:10.1f} MiB -> {new / 2**20:9.1f} MiB  ({new / old:5.2f}x){marker}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', action='append', choices=sorted(SCALES),
+                        help='Voreinstellung (mehrfach möglich); ohne --scale gelten --files/--depth/--fanout')
+    parser.add_argument('--files', type=int, default=10_000, help='Anzahl der Mediendateien (ungefähr)')
+    parser.add_argument('--depth', type=int, default=3, help='Tiefe des Baums')
+    parser.add_argument('--fanout', type=int, default=6, help='Unterordner pro Ordner')
+    parser.add_argument('--styles', default=','.join(STYLES),
+                        help=f'Namensstile, kommagetrennt (Standard: alle: {",".join(STYLES)})')
+    parser.add_argument('--storyline-ratio', type=float, default=0.05, help='Anteil der Ordner mit Storyline.txt')
+    parser.add_argument('--storyline-lines', type=int, default=100, help='Zeilen pro Storyline.txt (0 = keine)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3, help='Wiederholungen, je Phase zählt das Minimum')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='parallele Worker; Phasenzeiten sind dann über alle Threads summiert')
+    parser.add_argument('-f', '--format', dest='formats', action='append', choices=sorted(vpc.PLAYLIST_WRITERS),
+                        help='Ausgabeformat, mehrfach angebbar (Standard: xspf); Größe und Schreibzeit je Format '
+                             'stehen in den Zählern')
+    parser.add_argument('--scan-workers', type=int, default=1,
+                        help='gleichzeitige Verzeichnis-Listings beim Einlesen (Standard: 1)')
+    parser.add_argument('--scan-latency', type=float, default=0.0, metavar='MS',
+                        help='simulierte Latenz je os.scandir in der Einlese-Phase, z.B. 30 für ein SMB-Laufwerk')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='Pipeline-Modus messen (Einlesen und Schreiben überlappen, --scan-latency gilt dann '
+                             'für den ganzen Lauf); counts.first_output ist die Zeit bis zur ersten Playlist')
+    parser.add_argument('--nested', action='store_true',
+                        help='verschachtelte kombinierte Playlists (Verweise auf Unterordner-Playlists) messen')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='keinen zusätzlichen Lauf zur Messung des Spitzenverbrauchs (tracemalloc) ausführen')
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'vlcplaylistcreator-bench'))
+    parser.add_argument('--keep', action='store_true', help='erzeugte Bäume für weitere Läufe behalten')
+    parser.add_argument('--regenerate', action='store_true', help='Bäume auch bei gleichen Parametern neu erzeugen')
+    parser.add_argument('--output', help='Ergebnisse als JSON in diese Datei schreiben (sonst stdout)')
+    parser.add_argument('--baseline', help='Baseline-JSON zum Vergleich')
+    parser.add_argument('--save-baseline', action='store_true', help='Ergebnisse in die Baseline-Datei übernehmen')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='erlaubte Verlangsamung je Phase (0.25 = 25 %%)')
+    parser.add_argument('--min-delta', type=float, default=0.005, help='Rauschgrenze in Sekunden')
+    args = parser.parse_args(argv)
+
+    styles = [style.strip() for style in args.styles.split(',') if style.strip()]
+    unknown = [style for style in styles if style not in STYLES]
+    if unknown or not styles:
+        parser.error(f"unbekannte Namensstile: {', '.join(unknown) or '(keine)'}")
+
+    runs = {}
+    for label in args.scale or [f'{args.files}']:
+        files, depth, fanout = SCALES[label] if label in SCALES else (args.files, args.depth, args.fanout)
+        runs[label] = {
+            'files': files, 'depth': depth, 'fanout': fanout, 'styles': styles,
+            'storyline_ratio': args.storyline_ratio, 'storyline_lines': args.storyline_lines, 'seed': args.seed,
+        }
+
+    results = {label: run_scale(label, params, args) for label, params in runs.items()}
+    report = {
+        'version': 1,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'jobs': args.jobs,
+        'formats': args.formats or list(vpc.DEFAULT_PLAYLIST_FORMATS),
+        'nested': args.nested,
+        'pipeline': args.pipeline,
+        'scan_workers': args.scan_workers,
+        'scan_latency_ms': args.scan_latency,
+        'results': results,
+    }
+
+    for label, result in results.items():
+        print(f"[{label}] " + ', '.join(f"{phase} {result['phases'][phase] * 1000:.1f} ms" for phase in PHASES),
+              file=sys.stderr)
+        if 'peak_memory' in result:
+            print(f"[{label}] Spitzenverbrauch: {result['peak_memory'] / 2**20:.1f} MiB", file=sys.stderr)
+        if result['counts']['first_output'] is not None:
+            print(f"[{label}] Erste Playlist nach {result['counts']['first_output'] * 1000:.1f} ms", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    exit_code = 0
+    if args.baseline:
+        try:
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+        except (OSError, ValueError):
+            baseline = {'version': 1, 'results': {}}
+        if args.save_baseline:
+            baseline.update({key: value for key, value in report.items() if key != 'results'})
+            baseline.setdefault('results', {}).update(results)
+            with open(args.baseline, 'w', encoding='utf-8') as f:
+                json.dump(baseline, f, indent=2)
+            print(f"Baseline gespeichert: {args.baseline}", file=sys.stderr)
+        else:
+            regressions = compare(results, baseline, args.tolerance, args.min_delta)
+            if regressions:
+                print(f"{len(regressions)} Regression(en) gegenüber {args.baseline}", file=sys.stderr)
+                exit_code = 1
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Micro-Benchmark für die natürliche Sortierung.
+
+Vergleicht die vorkompilierte, gecachte Sortierschlüssel-Engine aus
+VLCPlaylistCreator mit der bisherigen Implementierung (unten als Referenz
+unverändert übernommen) und prüft, dass Schlüssel und Reihenfolgen identisch sind.
+
+    python benchmarks/bench_sort_keys.py [--files 50000] [--seed 1]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import VLCPlaylistCreator as vpc  # noqa: E402
+
+
+def legacy_robust_natural_sort_key(s):
+    """Bisherige Implementierung von PlaylistCreator.robust_natural_sort_key (Referenz)."""
+    filename = str(s)
+    name_without_ext = os.path.splitext(filename)[0]
+    episode_pattern = r'^(?:S(\d+)[Ee](\d+)|(\d+)[\.\s-]+)(.*)'
+    episode_match = re.match(episode_pattern, name_without_ext)
+    if episode_match:
+        if episode_match.group(1):
+            season = int(episode_match.group(1))
+            episode = int(episode_match.group(2))
+            title = episode_match.group(4).strip()
+            return (0, season, episode, title.lower())
+        else:
+            number = int(episode_match.group(3) or 0)
+            title = episode_match.group(4).strip()
+            return (1, number, title.lower())
+    year_match = re.search(r'\((\d{4})\)', name_without_ext)
+    year = int(year_match.group(1)) if year_match else 9999
+    name_without_year = re.sub(r'\s*\(\d{4}\)', '', name_without_ext)
+    arabic_match = re.search(r'(\d+)$', name_without_year.strip())
+    roman_numerals = {
+        'I': 1, 'II': 2, 'III': 3, 'IV': 4, 'V': 5,
+        'VI': 6, 'VII': 7, 'VIII': 8, 'IX': 9, 'X': 10,
+        'XI': 11, 'XII': 12, 'XIII': 13, 'XIV': 14, 'XV': 15
+    }
+    roman_match = None
+    for roman in roman_numerals:
+        if re.search(fr'\s*(?:Teil|Part|Teil\s+)?{roman}\s*$', name_without_year, re.IGNORECASE):
+            roman_match = roman
+            break
+    if arabic_match:
+        part_num = int(arabic_match.group(1))
+        base_name = re.sub(r'\s*\d+$', '', name_without_year).strip()
+    elif roman_match:
+        part_num = roman_numerals[roman_match]
+        base_name = re.sub(fr'\s*(?:Teil|Part|Teil\s+)?{roman_match}\s*$', '', name_without_year, flags=re.IGNORECASE).strip()
+    else:
+        part_num = 1
+        base_name = name_without_year.strip()
+    base_name = re.sub(r'^[:\-\s]+', '', base_name)
+    return (2, base_name.lower(), part_num, year)
+
+
+ROMANS = list(vpc.ROMAN_NUMERALS)
+TITLES = ['Pilot', 'Der Anfang', 'Das Ende', 'Hawaii', 'Rocky', 'Star Wars', 'Mission: Impossible',
+          'Ärger im Paradies', 'Fix', 'Max', 'Taxi', 'Kiwi']
+EXTENSIONS = ['.mp4', '.mkv', '.avi', '.mp3', '.m4a', '.flac', '.wav']
+
+
+def generate_corpus(count, seed):
+    """Erzeugt reproduzierbare Dateinamen in allen Formaten, die die Sortierung unterscheidet."""
+    rnd = random.Random(seed)
+    styles = [
+        lambda: f'S{rnd.randint(1, 12):02d}E{rnd.randint(1, 30):02d} - {rnd.choice(TITLES)}',
+        lambda: f'S{rnd.randint(1, 3)}e{rnd.randint(1, 9)}{rnd.choice(["", " ", "."])}{rnd.choice(TITLES)}',
+        lambda: f'{rnd.randint(1, 200):0{rnd.choice([1, 2, 3])}d}{rnd.choice([" - ", ". ", "-", " "])}{rnd.choice(TITLES)}',
+        lambda: f'Folge {rnd.randint(1, 150)}',
+        lambda: f'{rnd.choice(TITLES)} {rnd.choice(["Teil ", "Part ", "Teil  ", ""])}{rnd.choice(ROMANS)} ({rnd.randint(1950, 2030)})',
+        lambda: f'{rnd.choice(TITLES)}{rnd.choice([" ", ": ", " - "])}{rnd.choice(ROMANS).lower()}{rnd.choice(["", " "])}',
+        lambda: f'{rnd.choice(TITLES)} {rnd.randint(1, 9)} ({rnd.randint(1950, 2030)})',
+        lambda: f'{rnd.choice(TITLES)} ({rnd.randint(1950, 2030)}) {rnd.randint(1, 5)} ',
+        lambda: f'{rnd.choice(TITLES)} ({rnd.randint(1950, 2030)})',
+        lambda: f'- {rnd.choice(TITLES)} {rnd.randint(1, 4)}',
+        lambda: ''.join(rnd.choice('IVXivx TeilPart0123456789()-:.é') for _ in range(rnd.randint(1, 14))),
+    ]
+    return [rnd.choice(styles)() + rnd.choice(EXTENSIONS) for _ in range(count)]
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=50000, help='Anzahl der Dateinamen im Korpus')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    corpus = generate_corpus(args.files, args.seed)
+
+    # Korrektheit: identische Schlüssel für jeden Namen und identische Reihenfolge
+    mismatches = [name for name in corpus if vpc.natural_sort_key(name) != legacy_robust_natural_sort_key(name)]
+    legacy_order, legacy_time = timed(lambda: sorted(corpus, key=legacy_robust_natural_sort_key))
+
+    vpc.natural_sort_key.cache_clear()
+    new_order, cold_time = timed(lambda: vpc.sort_naturally(corpus))
+    _, warm_time = timed(lambda: vpc.sort_naturally(corpus))
+
+    print(f"Korpus: {len(corpus)} Dateinamen (seed={args.seed})")
+    print(f"Abweichende Schlüssel: {len(mismatches)}")
+    print(f"Reihenfolge identisch: {new_order == legacy_order}")
+    print(f"Bisherige Implementierung: {legacy_time * 1000:9.1f} ms")
+    print(f"Engine (kalter Cache):     {cold_time * 1000:9.1f} ms  ({legacy_time / cold_time:.1f}x)")
+    print(f"Engine (warmer Cache):     {warm_time * 1000:9.1f} ms  ({legacy_time / warm_time:.1f}x)")
+    print(f"Cache: {vpc.natural_sort_key.cache_info()}")
+    for name in mismatches[:10]:
+        print(f"  {name!r}: {vpc.natural_sort_key(name)} != {legacy_robust_natural_sort_key(name)}")
+    return 1 if mismatches or new_order != legacy_order else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())